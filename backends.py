@@ -0,0 +1,274 @@
+import time
+import numpy as np
+from detections import CameraDetections
+from metrics import NULL_METRICS
+
+# --- BACKEND SUY LUẬN ---
+# Mọi backend nhận batch frame BGR (cams, H, W, 3) đã resize sẵn, và trả về:
+#   - Item: CameraDetections (xyxy + conf + class id) cho từng frame
+#   - Slot: (obbs xyxyxyxy (S, 4, 2), confs (S,)) cho từng frame
+# FrameProcessor chỉ làm việc với CameraDetections nên không cần biết backend nào đang chạy.
+
+class InferenceBackend:
+    """Giao diện chung cho các backend (Ultralytics / ONNX Runtime)"""
+    item_names = {} # {class id: tên} của model Item (đối chiếu với cấu hình dây chuyền lúc khởi động)
+
+    def prepare(self, frames, indices):
+        """Tiền xử lý 1 lần các frame cần chạy AI, kết quả dùng chung cho cả 2 model"""
+        raise NotImplementedError
+
+    def predict_items(self, batch):
+        """-> list CameraDetections (chỉ phần item)"""
+        raise NotImplementedError
+
+    def predict_slots(self, batch, rows=None):
+        """rows: chỉ chạy trên các dòng này của batch (mặc định tất cả) -> list (obbs, confs)"""
+        raise NotImplementedError
+
+class UltralyticsBackend(InferenceBackend):
+    """Backend gốc: ultralytics.YOLO(...).predict (PyTorch, CPU hoặc GPU)"""
+    def __init__(self, item_path, slot_path, max_batch, height, width,
+                 item_conf=0.45, slot_conf=0.5, shared_preprocess=True):
+        from ultralytics import YOLO
+        self.model_items = YOLO(item_path)
+        self.model_slots = YOLO(slot_path)
+        self.item_names = self.model_items.names # {class id: tên}
+        self.item_conf, self.slot_conf = item_conf, slot_conf
+        self.preprocessor = None
+        if shared_preprocess:
+            from preprocess import BatchPreprocessor
+            self.preprocessor = BatchPreprocessor(max_batch, height, width)
+
+    def prepare(self, frames, indices):
+        if self.preprocessor is not None:
+            return self.preprocessor.build(frames, indices)
+        return [frames[i] for i in indices]
+
+    def predict_items(self, batch):
+        res = self.model_items.predict(batch, conf=self.item_conf, verbose=False, stream=False)
+        return [CameraDetections.from_results(None, r, item_conf=self.item_conf) for r in res]
+
+    def predict_slots(self, batch, rows=None):
+        if rows is not None and len(rows) != len(batch):
+            batch = batch[rows] if self.preprocessor is not None else [batch[k] for k in rows]
+        res = self.model_slots.predict(batch, conf=self.slot_conf, verbose=False, stream=False)
+        return [CameraDetections.extract_slots(r, self.slot_conf) for r in res]
+
+# --- ONNX RUNTIME (CPU) ---
+def nms_boxes(boxes, scores, iou_thres):
+    """NMS tham lam cho box xyxy (numpy), trả về index giữ lại theo conf giảm dần"""
+    order = scores.argsort()[::-1]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1: break
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+def _obb_covariance(rboxes):
+    """Ma trận hiệp phương sai Gauss của OBB xywhr -> (a, b, c)"""
+    a = rboxes[:, 2] ** 2 / 12
+    b = rboxes[:, 3] ** 2 / 12
+    cos, sin = np.cos(rboxes[:, 4]), np.sin(rboxes[:, 4])
+    return a * cos ** 2 + b * sin ** 2, a * sin ** 2 + b * cos ** 2, (a - b) * cos * sin
+
+def batch_probiou(obb1, obb2, eps=1e-7):
+    """ProbIoU giữa 2 tập OBB xywhr (N, 5) x (M, 5) -> (N, M), giống Ultralytics"""
+    x1, y1 = obb1[:, 0:1], obb1[:, 1:2]
+    x2, y2 = obb2[None, :, 0], obb2[None, :, 1]
+    a1, b1, c1 = (v[:, None] for v in _obb_covariance(obb1))
+    a2, b2, c2 = (v[None, :] for v in _obb_covariance(obb2))
+    denom = (a1 + a2) * (b1 + b2) - (c1 + c2) ** 2
+    t1 = (((a1 + a2) * (y1 - y2) ** 2 + (b1 + b2) * (x1 - x2) ** 2) / (denom + eps)) * 0.25
+    t2 = (((c1 + c2) * (x2 - x1) * (y1 - y2)) / (denom + eps)) * 0.5
+    t3 = np.log(denom / (4 * np.sqrt(np.clip(a1 * b1 - c1 ** 2, 0, None) * np.clip(a2 * b2 - c2 ** 2, 0, None)) + eps) + eps) * 0.5
+    bd = np.clip(t1 + t2 + t3, eps, 100.0)
+    hd = np.sqrt(1.0 - np.exp(-bd) + eps)
+    return 1 - hd
+
+def nms_rotated(rboxes, scores, iou_thres):
+    """Fast-NMS cho OBB (giống Ultralytics): bỏ box nếu có box conf cao hơn trùng >= iou_thres"""
+    order = scores.argsort()[::-1]
+    ious = np.triu(batch_probiou(rboxes[order], rboxes[order]), k=1)
+    return order[(ious >= iou_thres).sum(axis=0) <= 0]
+
+def regularize_rboxes(rboxes):
+    """Chuẩn hoá OBB như Ultralytics trước khi đổi sang đỉnh: w là cạnh dài, góc trong [0, pi)"""
+    w, h, angle = rboxes[:, 2], rboxes[:, 3], rboxes[:, 4]
+    swap = w <= h # Ultralytics giữ nguyên khi w > h, còn lại đổi cạnh + xoay pi/2
+    out = rboxes.copy()
+    out[:, 2], out[:, 3] = np.where(swap, h, w), np.where(swap, w, h)
+    out[:, 4] = (angle + swap * (np.pi / 2)) % np.pi
+    return out
+
+def xywhr2xyxyxyxy(rboxes):
+    """OBB (cx, cy, w, h, góc rad) -> 4 đỉnh (N, 4, 2); qua regularize_rboxes trước thì cùng thứ tự đỉnh với Ultralytics"""
+    ctr = rboxes[:, :2]
+    w, h, angle = rboxes[:, 2:3], rboxes[:, 3:4], rboxes[:, 4:5]
+    cos, sin = np.cos(angle), np.sin(angle)
+    vec1 = np.concatenate([w / 2 * cos, w / 2 * sin], axis=-1)
+    vec2 = np.concatenate([-h / 2 * sin, h / 2 * cos], axis=-1)
+    return np.stack([ctr + vec1 + vec2, ctr + vec1 - vec2, ctr - vec1 - vec2, ctr - vec1 + vec2], axis=-2)
+
+class OnnxBackend(InferenceBackend):
+    """
+    Backend CPU bằng ONNX Runtime, không cần PyTorch.
+    Model xuất từ Ultralytics với đúng kích thước PROC (không letterbox), batch động:
+        yolo export model=best.pt format=onnx imgsz=480,640 dynamic=True
+    Tự giải mã đầu ra + NMS (box thường) / NMS xoay ProbIoU (OBB) giống Ultralytics.
+    """
+    def __init__(self, item_path, slot_path, max_batch, height, width,
+                 item_conf=0.45, slot_conf=0.5, iou=0.7, max_det=300,
+                 intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads # 0 = để ORT tự chọn
+        opts.inter_op_num_threads = inter_op_threads
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ["CPUExecutionProvider"]
+        self.sess_items = ort.InferenceSession(item_path, sess_options=opts, providers=providers)
+        self.sess_slots = ort.InferenceSession(slot_path, sess_options=opts, providers=providers)
+        self.item_conf, self.slot_conf = item_conf, slot_conf
+        self.iou, self.max_det = iou, max_det
+        self.height, self.width = height, width
+        self.item_names = self._read_names(self.sess_items)
+        self.name_table = np.array([self.item_names.get(i, str(i)) for i in range(max(self.item_names) + 1)],
+                                   dtype=object) if self.item_names else np.zeros(0, dtype=object)
+        # Buffer đầu vào NCHW float32 dùng lại giữa các vòng lặp
+        self.input = np.empty((max_batch, 3, height, width), dtype=np.float32)
+
+    @staticmethod
+    def _read_names(session):
+        """Ultralytics ghi tên class vào metadata của file ONNX"""
+        import ast
+        meta = session.get_modelmeta().custom_metadata_map
+        return ast.literal_eval(meta["names"]) if "names" in meta else {}
+
+    def prepare(self, frames, indices):
+        n = 0
+        for i in indices:
+            # BGR -> RGB, HWC -> CHW, chuẩn hoá 0-1 thẳng vào buffer
+            np.multiply(frames[i][..., ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self.input[n], casting="unsafe")
+            n += 1
+        return self.input[:n]
+
+    def _run(self, session, batch):
+        name = session.get_inputs()[0].name
+        if session.get_inputs()[0].shape[0] == 1 and len(batch) > 1:
+            # Model xuất với batch cố định = 1 -> chạy từng ảnh
+            return np.concatenate([session.run(None, {name: batch[k:k+1]})[0] for k in range(len(batch))])
+        return session.run(None, {name: np.ascontiguousarray(batch)})[0]
+
+    def predict_items(self, batch):
+        preds = self._run(self.sess_items, batch)
+        dets = []
+        for pred in preds:
+            if pred.shape[-1] == 6:
+                # Model end-to-end (không cần NMS): [x1, y1, x2, y2, conf, cls]
+                x = pred[pred[:, 4] > self.item_conf]
+                boxes, confs, cls = x[:, :4], x[:, 4], x[:, 5].astype(np.int32)
+            else:
+                x = pred.T # (N, 4 + nc)
+                scores = x[:, 4:]
+                cls = scores.argmax(axis=1)
+                confs = scores[np.arange(len(x)), cls]
+                keep = confs > self.item_conf
+                x, cls, confs = x[keep], cls[keep].astype(np.int32), confs[keep]
+                cxcy, wh = x[:, :2], x[:, 2:4]
+                boxes = np.concatenate([cxcy - wh / 2, cxcy + wh / 2], axis=1)
+                if len(boxes):
+                    # NMS theo từng class (dịch box theo class như Ultralytics)
+                    keep = nms_boxes(boxes + cls[:, None] * 7680.0, confs, self.iou)[:self.max_det]
+                    boxes, confs, cls = boxes[keep], confs[keep], cls[keep]
+            boxes = boxes.copy()
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.width)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.height)
+            dets.append(CameraDetections(item_boxes=boxes.astype(np.float32), item_confs=confs.astype(np.float32),
+                                         item_cls=cls, name_table=self.name_table))
+        return dets
+
+    def predict_slots(self, batch, rows=None):
+        if rows is not None and len(rows) != len(batch): batch = batch[rows]
+        preds = self._run(self.sess_slots, batch)
+        out = []
+        for pred in preds:
+            if pred.shape[-1] == 7:
+                # Model end-to-end: [x, y, w, h, conf, cls, góc]
+                x = pred[pred[:, 4] > self.slot_conf]
+                rboxes, confs = np.concatenate([x[:, :4], x[:, 6:7]], axis=1), x[:, 4]
+            else:
+                x = pred.T # (N, 4 + nc + 1), góc ở cột cuối
+                scores = x[:, 4:-1]
+                cls = scores.argmax(axis=1)
+                confs = scores[np.arange(len(x)), cls]
+                keep = confs > self.slot_conf
+                x, cls, confs = x[keep], cls[keep], confs[keep]
+                rboxes = np.concatenate([x[:, :4], x[:, -1:]], axis=1)
+                if len(rboxes):
+                    shifted = rboxes.copy()
+                    shifted[:, :2] += cls[:, None] * 7680.0
+                    keep = nms_rotated(shifted, confs, self.iou)[:self.max_det]
+                    rboxes, confs = rboxes[keep], confs[keep]
+            out.append((xywhr2xyxyxyxy(regularize_rboxes(rboxes)).astype(np.float32), confs.astype(np.float32)))
+        return out
+
+# --- CHIA LÔ THEO SỨC TÍNH ---
+# Nhiều camera (6-12) không chạy chung 1 lô: lô quá lớn thì 1 lần predict lâu -> frame cũ, đếm giờ trễ.
+# predict_chunked chạy lần lượt từng lô <= batch_size camera; calibrate_batch_size đo để chọn batch_size.
+def predict_chunked(backend, frames, indices, batch_size, need_slots=None, on_slots=None, metrics=NULL_METRICS):
+    """
+    Chạy model Item (+ model Slot cho camera cần) trên frames[indices], mỗi lần tối đa batch_size camera.
+    need_slots(i, det) -> camera i có cần chạy model Slot không (None = luôn chạy)
+    on_slots(i, det): gọi sau khi det đã có kết quả Slot
+    -> list CameraDetections cùng thứ tự indices
+    """
+    dets = []
+    for start in range(0, len(indices), batch_size):
+        chunk = indices[start:start + batch_size]
+        # Tiền xử lý 1 lần thành batch liên tục, dùng chung cho cả 2 model (hợp lệ tới lô kế tiếp)
+        with metrics.timer("preprocess"):
+            batch_input = backend.prepare(frames, chunk)
+        with metrics.timer("item_predict"):
+            chunk_dets = backend.predict_items(batch_input)
+        slot_ks = [k for k, i in enumerate(chunk) if need_slots is None or need_slots(i, chunk_dets[k])]
+        if slot_ks:
+            with metrics.timer("slot_predict"):
+                res = backend.predict_slots(batch_input, slot_ks)
+            for j, k in enumerate(slot_ks):
+                chunk_dets[k].set_slots(*res[j])
+                if on_slots is not None: on_slots(chunk[k], chunk_dets[k])
+        dets.extend(chunk_dets)
+    return dets
+
+def calibrate_batch_size(backend, max_batch, height, width, latency_budget, repeats=3):
+    """
+    Đo 1 lô (model Item + Slot, ảnh giả) với cỡ 1, 2, 4, ..., max_batch -> (cỡ lô, {cỡ: giây/lô}).
+    Chọn cỡ cho nhiều frame/giây nhất trong các cỡ xong 1 lô trong latency_budget giây (không cỡ nào đạt -> 1).
+    """
+    frames = np.random.default_rng(0).integers(0, 255, (max_batch, height, width, 3), dtype=np.uint8)
+    sizes = sorted({1 << k for k in range(max_batch.bit_length()) if 1 << k <= max_batch} | {max_batch})
+    timings = {}
+    for n in sizes:
+        indices = list(range(n))
+        predict_chunked(backend, frames, indices, n) # Lần đầu: cấp phát / chọn kernel, không tính
+        t0 = time.perf_counter()
+        for _ in range(repeats): predict_chunked(backend, frames, indices, n)
+        timings[n] = (time.perf_counter() - t0) / repeats
+    fits = [n for n in sizes if timings[n] <= latency_budget] or [1]
+    return max(fits, key=lambda n: n / timings[n]), timings
+
+def create_backend(name, item_path, slot_path, max_batch, height, width, **kwargs):
+    """name: "ultralytics" hoặc "onnx" """
+    if name == "onnx":
+        return OnnxBackend(item_path, slot_path, max_batch, height, width, **kwargs)
+    if name == "ultralytics":
+        return UltralyticsBackend(item_path, slot_path, max_batch, height, width, **kwargs)
+    raise ValueError(f"Backend không hỗ trợ: {name}")
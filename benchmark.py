@@ -0,0 +1,553 @@
+import cv2
+cv2.setNumThreads(0)
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+from itertools import combinations
+from types import SimpleNamespace
+from config import CameraConfig, SlotTable, PACKING_RULES, CAM_ORDER
+from processor import FrameProcessor
+from slot_recovery import SlotRecovery
+from utils import GeometryUtils
+from visualizer import Visualizer
+from detections import CameraDetections
+
+# --- BENCHMARK PHẦN HÌNH HỌC / LOGIC / VẼ (KHÔNG CẦN MODEL, KHÔNG CẦN MÀN HÌNH) ---
+# Dữ liệu là khay 5 slot xoay ngẫu nhiên + box item sinh tổng hợp.
+#   python benchmark.py                          -> in bảng kết quả
+#   python benchmark.py --json out.json          -> ghi kết quả dạng JSON
+#   python benchmark.py --compare baseline.json  -> so với baseline, chậm hơn quá ngưỡng thì exit code 1
+#   python benchmark.py --filter geometry        -> chỉ chạy các case có tên chứa chuỗi này
+#   python benchmark.py --parity                 -> đối chiếu bản cũ / bản vector hoá (kết quả + tốc độ) rồi thoát
+PROC_W, PROC_H = 640, 480
+DASHBOARD_WIDTH = 350
+POOL_SIZE = 256       # Số mẫu dữ liệu khác nhau mỗi case (chạy vòng tròn)
+SAMPLE_TIME = 0.02    # Mỗi mẫu đo kéo dài ~20ms
+REPEATS = 7
+DEFAULT_TOLERANCE = 0.15 # Chậm hơn baseline > 15% (theo median) -> regression
+
+# Bố cục khay trong hệ toạ độ của khay: hàng 3 slot (S1-S3) và hàng 2 slot (S4, S5)
+TRAY_LAYOUT = np.array([[-110, -50], [0, -50], [110, -50], [-60, 60], [60, 60]], dtype=np.float32)
+SLOT_HALF = np.array([[-40, -35], [40, -35], [40, 35], [-40, 35]], dtype=np.float32)
+ITEM_NAMES = sorted({name for rules in PACKING_RULES.values() for name in rules.values()})
+NAME_TABLE = np.array(ITEM_NAMES, dtype=object)
+
+# --- SINH DỮ LIỆU TỔNG HỢP ---
+def make_tray(rng, cx=None, cy=None, angle=None, scale=None):
+    """Khay 5 slot xoay ngẫu nhiên -> (centers (5, 2), obbs (5, 4, 2)), theo thứ tự S1..S5"""
+    cx = rng.uniform(220, 420) if cx is None else cx
+    cy = rng.uniform(180, 300) if cy is None else cy
+    angle = rng.uniform(0, 2 * np.pi) if angle is None else angle
+    scale = rng.uniform(0.8, 1.1) if scale is None else scale
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+    centers = (TRAY_LAYOUT * scale) @ rot.T + [cx, cy]
+    obbs = centers[:, None, :] + (SLOT_HALF * scale) @ rot.T
+    return centers.astype(np.float32), obbs.astype(np.float32)
+
+def make_items(rng, centers, cam_name="cam_1", fill=0.8, wrong=0.1, extra=1):
+    """Box item đặt quanh tâm slot (đúng/sai loại theo PACKING_RULES) + vài box lạc -> (boxes, cls)"""
+    expected = list(PACKING_RULES.get(cam_name, {}).values())
+    boxes, cls = [], []
+    for k, c in enumerate(centers[:len(expected)]):
+        if rng.random() > fill: continue
+        name = expected[k] if rng.random() > wrong else ITEM_NAMES[rng.integers(len(ITEM_NAMES))]
+        ctr = c + rng.normal(0, 6, 2)
+        wh = rng.uniform(30, 70, 2)
+        boxes.append(np.concatenate([ctr - wh / 2, ctr + wh / 2]))
+        cls.append(ITEM_NAMES.index(name))
+    for _ in range(rng.integers(0, extra + 1)):
+        ctr = rng.uniform([40, 40], [PROC_W - 40, PROC_H - 40])
+        wh = rng.uniform(30, 70, 2)
+        boxes.append(np.concatenate([ctr - wh / 2, ctr + wh / 2]))
+        cls.append(int(rng.integers(len(ITEM_NAMES))))
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4), np.array(cls, dtype=np.int32)
+
+def make_detections(rng, cam_name="cam_1", n_slots=5, slot_pass=True):
+    """CameraDetections 1 frame: n_slots slot (bỏ ngẫu nhiên nếu < 5) + item tương ứng"""
+    centers, obbs = make_tray(rng)
+    keep = np.sort(rng.permutation(5)[:n_slots])
+    boxes, cls = make_items(rng, centers, cam_name)
+    det = CameraDetections(item_boxes=boxes, item_confs=rng.uniform(0.45, 1.0, len(boxes)).astype(np.float32),
+                           item_cls=cls, name_table=NAME_TABLE)
+    if slot_pass:
+        det.set_slots(obbs[keep] + rng.normal(0, 0.5, obbs[keep].shape).astype(np.float32),
+                      rng.uniform(0.5, 1.0, len(keep)).astype(np.float32))
+    return det
+
+def make_session(rng, num_ticks, cam_names=CAM_ORDER):
+    """Chuỗi tick (has_signal, new_indices, dets) của nhiều camera, ~30% frame thiếu slot"""
+    ticks = []
+    for _ in range(num_ticks):
+        dets = [make_detections(rng, name, n_slots=5 if rng.random() > 0.3 else int(rng.integers(2, 5)))
+                for name in cam_names]
+        ticks.append(([True] * len(cam_names), list(range(len(cam_names))), dets))
+    return ticks
+
+def _prepared_config(rng, cam_name="cam_1"):
+    """CameraConfig đã có vị trí slot + trạng thái ngẫu nhiên (để vẽ / đếm checklist)"""
+    cfg = CameraConfig(cam_name)
+    centers, obbs = make_tray(rng)
+    for k, slot in enumerate(cfg.slots.values()):
+        slot.update_position(obbs[k], centers[k])
+        slot.state = ["empty", "oke", "wrong"][rng.integers(3)]
+        slot.is_saved = bool(rng.random() < 0.5)
+        slot.first_oke_time = time.time() if slot.state == "oke" else None
+    return cfg
+
+# --- DANH SÁCH CASE ---
+# Mỗi case là hàm setup(rng) -> hàm không tham số, mỗi lần gọi là 1 lần đo
+CASES = {}
+
+def bench(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+def _cycle(items):
+    """Trả về hàm lấy lần lượt từng phần tử (vòng tròn) để mỗi lần gọi dùng dữ liệu khác nhau"""
+    state = {"i": 0}
+    n = len(items)
+    def next_item():
+        i = state["i"]
+        state["i"] = (i + 1) % n
+        return items[i]
+    return next_item
+
+@bench("geometry.identify_slots_logic")
+def _bench_identify(rng):
+    pool = _cycle([make_tray(rng)[0][rng.permutation(5)] for _ in range(POOL_SIZE)])
+    return lambda: GeometryUtils.identify_slots_logic(pool())
+
+@bench("geometry.identify_slots_batch_4cams")
+def _bench_identify_batch(rng):
+    pool = _cycle([np.stack([make_tray(rng)[0][rng.permutation(5)] for _ in range(4)]) for _ in range(POOL_SIZE)])
+    return lambda: GeometryUtils.identify_slots_batch(pool())
+
+@bench("geometry.calculate_iou_polygon")
+def _bench_iou(rng):
+    pairs = []
+    for _ in range(POOL_SIZE):
+        centers, obbs = make_tray(rng)
+        boxes, _ = make_items(rng, centers, fill=1.0)
+        pairs.append((boxes[0], obbs[rng.integers(5)].astype(np.int32)))
+    pool = _cycle(pairs)
+    def run():
+        box, poly = pool()
+        return GeometryUtils.calculate_iou_polygon(box, poly)
+    return run
+
+@bench("geometry.is_item_in_slot")
+def _bench_in_slot(rng):
+    pairs = []
+    for _ in range(POOL_SIZE):
+        centers, obbs = make_tray(rng)
+        boxes, _ = make_items(rng, centers, fill=1.0)
+        pairs.append((boxes[0], obbs[rng.integers(5)].astype(np.int32)))
+    pool = _cycle(pairs)
+    def run():
+        box, poly = pool()
+        return GeometryUtils.is_item_in_slot(box, poly)
+    return run
+
+@bench("geometry.match_items_to_slots_cluttered")
+def _bench_match_cluttered(rng):
+    scenes = []
+    for _ in range(POOL_SIZE // 4):
+        centers, obbs = make_tray(rng)
+        boxes, _ = make_items(rng, centers, fill=1.0, extra=20) # Khay lộn xộn: ~15-25 box
+        scenes.append((boxes, obbs.astype(np.int32)))
+    pool = _cycle(scenes)
+    def run():
+        boxes, polys = pool()
+        return GeometryUtils.match_items_to_slots(boxes, polys)
+    return run
+
+@bench("recovery.recover")
+def _bench_recover(rng):
+    recovery = SlotRecovery()
+    ref, _ = make_tray(rng, angle=0.2, scale=1.0)
+    recovery.update_reference({k + 1: ref[k].astype(int) for k in range(5)})
+    cases = []
+    for _ in range(POOL_SIZE):
+        centers, _ = make_tray(rng, cx=ref[:, 0].mean() + rng.normal(0, 10), cy=ref[:, 1].mean() + rng.normal(0, 10),
+                               angle=0.2 + rng.normal(0, 0.05), scale=1.0)
+        ids = np.sort(rng.permutation(5)[:rng.integers(2, 5)])
+        cases.append({int(k) + 1: centers[k].astype(int) for k in ids})
+    pool = _cycle(cases)
+    return lambda: recovery.recover(pool())
+
+@bench("processor.process_detections")
+def _bench_process(rng):
+    processor = FrameProcessor(CameraConfig("cam_1"))
+    pool = _cycle([make_detections(rng, "cam_1", n_slots=5 if rng.random() > 0.3 else int(rng.integers(2, 5)))
+                   for _ in range(POOL_SIZE)])
+    return lambda: processor.process_detections(pool())
+
+@bench("processor.process_detections_no_slot_pass")
+def _bench_process_cached(rng):
+    processor = FrameProcessor(CameraConfig("cam_1"))
+    processor.process_detections(make_detections(rng, "cam_1"))
+    pool = _cycle([make_detections(rng, "cam_1", slot_pass=False) for _ in range(POOL_SIZE)])
+    return lambda: processor.process_detections(pool())
+
+@bench("config.get_item_counts")
+def _bench_counts(rng):
+    pool = _cycle([_prepared_config(rng, CAM_ORDER[k % len(CAM_ORDER)]) for k in range(POOL_SIZE)])
+    return lambda: pool().get_item_counts()
+
+@bench("visualizer.draw_slot_obb")
+def _bench_draw_slot(rng):
+    vis, frame = Visualizer(), np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+    pool = _cycle([slot for _ in range(POOL_SIZE // 5) for slot in _prepared_config(rng).slots.values()])
+    return lambda: vis.draw_slot_obb(frame, pool())
+
+@bench("visualizer.draw_item_box")
+def _bench_draw_item(rng):
+    vis, frame = Visualizer(), np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+    boxes = [(box, NAME_TABLE[c], 0.87) for _ in range(POOL_SIZE // 4)
+             for box, c in zip(*make_items(rng, make_tray(rng)[0], fill=1.0))]
+    pool = _cycle(boxes)
+    def run():
+        box, label, conf = pool()
+        vis.draw_item_box(frame, box, label, conf)
+    return run
+
+@bench("visualizer.draw_item_boxes")
+def _bench_draw_items(rng):
+    vis, frame = Visualizer(), np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+    pool = _cycle([make_detections(rng) for _ in range(POOL_SIZE)])
+    return lambda: vis.draw_item_boxes(frame, pool())
+
+@bench("visualizer.draw_camera_info")
+def _bench_draw_info(rng):
+    vis, frame = Visualizer(), np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+    pool = _cycle([_prepared_config(rng, CAM_ORDER[k % len(CAM_ORDER)]) for k in range(POOL_SIZE)])
+    def run():
+        cfg = pool()
+        cfg.update_camera_state()
+        vis.draw_camera_info(frame, cfg)
+    return run
+
+@bench("visualizer.draw_dashboard_on_roi")
+def _bench_draw_dashboard(rng):
+    vis, roi = Visualizer(), np.zeros((PROC_H * 2, DASHBOARD_WIDTH, 3), dtype=np.uint8)
+    pool = _cycle([[_prepared_config(rng, name) for name in CAM_ORDER] for _ in range(POOL_SIZE // 4)])
+    return lambda: vis.draw_dashboard_on_roi(roi, pool())
+
+@bench("visualizer.draw_fps")
+def _bench_draw_fps(rng):
+    vis, frame = Visualizer(), np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+    return lambda: vis.draw_fps(frame)
+
+# --- MACRO: 1 tick logic 4 camera + 1 khung hình hoàn chỉnh ---
+@bench("macro.logic_tick_4cams")
+def _bench_logic_tick(rng):
+    from main import SystemFlowManager, apply_logic_tick
+    slot_table = SlotTable()
+    configs = [CameraConfig(name, slot_table) for name in CAM_ORDER]
+    processors = [FrameProcessor(cfg) for cfg in configs]
+    flow_manager = SystemFlowManager()
+    logic_state, last_items = {"trigger_detected": False}, [None] * len(configs)
+    pool = _cycle(make_session(rng, POOL_SIZE // 4))
+    def run():
+        has_signal, new_indices, dets = pool()
+        apply_logic_tick(processors, configs, flow_manager, logic_state, last_items, has_signal, new_indices, dets)
+    return run
+
+@bench("macro.render_frame_4cams")
+def _bench_render(rng):
+    from renderer import SharedState, Renderer
+    state = SharedState()
+    configs = [_prepared_config(rng, name) for name in CAM_ORDER]
+    frames = rng.integers(0, 255, (len(CAM_ORDER), PROC_H, PROC_W, 3), dtype=np.uint8)
+    items = [make_detections(rng, name) for name in CAM_ORDER]
+    state.publish(frames, items, configs, None, "RUNNING", None)
+    renderer = Renderer(state, Visualizer(), len(CAM_ORDER), PROC_W, PROC_H, DASHBOARD_WIDTH)
+    return renderer.render_once
+
+# --- ĐỐI CHIẾU BẢN CŨ / BẢN MỚI ---
+# Bản vòng lặp cũ chỉ nằm ở đây làm chuẩn so sánh, code chạy thật không giữ lại
+def _identify_slots_legacy(centers):
+    """Bản vòng lặp Python cũ của identify_slots_logic, giữ lại để đối chiếu kết quả"""
+    centers = np.array(centers)
+    if len(centers) != 5:
+        return None
+
+    # --- BƯỚC 1: TÌM 3 ĐIỂM THẲNG HÀNG (L123) ---
+    min_area = float('inf')
+    best_g3 = None
+
+    for c in combinations(range(5), 3):
+        p1, p2, p3 = centers[list(c)]
+        area = 0.5 * abs(p1[0]*(p2[1]-p3[1]) + p2[0]*(p3[1]-p1[1]) + p3[0]*(p1[1]-p2[1]))
+        if area < min_area:
+            min_area = area
+            best_g3 = c
+    
+    if best_g3 is None: return None
+    
+    idx_g3 = list(best_g3)                
+    idx_g2 = [i for i in range(5) if i not in idx_g3] 
+
+    pts_g3 = centers[idx_g3] 
+    pts_g2 = centers[idx_g2] 
+
+    # --- BƯỚC 2: TÌM S2 ---
+    dists = [sum(np.linalg.norm(pts_g3[i] - pts_g3[j]) for j in range(3) if i != j) for i in range(3)]
+    idx_s2 = idx_g3[np.argmin(dists)]
+    s2_pos = centers[idx_s2]
+
+    candidates = [i for i in idx_g3 if i != idx_s2]
+    c1_idx, c2_idx = candidates[0], candidates[1]
+    c1_pos, c2_pos = centers[c1_idx], centers[c2_idx]
+
+    # --- BƯỚC 3: XÁC ĐỊNH HƯỚNG ---
+    dx_g3 = np.max(pts_g3[:, 0]) - np.min(pts_g3[:, 0])
+    dy_g3 = np.max(pts_g3[:, 1]) - np.min(pts_g3[:, 1])
+    
+    avg_x_g3 = np.mean(pts_g3[:, 0])
+    avg_y_g3 = np.mean(pts_g3[:, 1])
+    avg_x_g2 = np.mean(pts_g2[:, 0])
+    avg_y_g2 = np.mean(pts_g2[:, 1])
+
+    s1_idx, s3_idx = None, None
+
+    if dy_g3 > dx_g3: # DỌC
+        if avg_x_g2 < avg_x_g3: 
+            if c1_pos[1] > s2_pos[1]: s1_idx, s3_idx = c1_idx, c2_idx
+            else: s1_idx, s3_idx = c2_idx, c1_idx
+        else:
+            if c1_pos[1] < s2_pos[1]: s1_idx, s3_idx = c1_idx, c2_idx
+            else: s1_idx, s3_idx = c2_idx, c1_idx
+    else: # NGANG
+        if avg_y_g2 < avg_y_g3:
+            if c1_pos[0] < s2_pos[0]: s1_idx, s3_idx = c1_idx, c2_idx
+            else: s1_idx, s3_idx = c2_idx, c1_idx
+        else:
+            if c1_pos[0] > s2_pos[0]: s1_idx, s3_idx = c1_idx, c2_idx
+            else: s1_idx, s3_idx = c2_idx, c1_idx
+
+    # --- BƯỚC 4: S4, S5 ---
+    idx_g2_1 = idx_g2[0]
+    idx_g2_2 = idx_g2[1]
+    dist_1 = np.linalg.norm(centers[idx_g2_1] - centers[s1_idx])
+    dist_2 = np.linalg.norm(centers[idx_g2_2] - centers[s1_idx])
+
+    if dist_1 < dist_2: s4_idx, s5_idx = idx_g2_1, idx_g2_2
+    else: s4_idx, s5_idx = idx_g2_2, idx_g2_1
+
+    return {
+        1: centers[s1_idx].astype(int),
+        2: centers[idx_s2].astype(int),
+        3: centers[s3_idx].astype(int),
+        4: centers[s4_idx].astype(int),
+        5: centers[s5_idx].astype(int)
+    }
+
+def parity_identify_slots(rng):
+    """Vòng lặp cũ vs identify_slots_logic / identify_slots_batch (khay xoay ngẫu nhiên)"""
+    trays = [make_tray(rng)[0][rng.permutation(5)] for _ in range(20000)]
+    trays += [np.round(t) for t in trays[:5000]] # Toạ độ nguyên (dễ bằng nhau hơn)
+
+    mismatch = 0
+    for c in trays:
+        a, b = _identify_slots_legacy(c), GeometryUtils.identify_slots_logic(c)
+        if a is None or b is None or any(not np.array_equal(a[k], b[k]) for k in range(1, 6)): mismatch += 1
+    print(f"📊 Khớp {len(trays) - mismatch}/{len(trays)} khay")
+
+    stacked = np.stack(trays[:4])
+    batch = GeometryUtils.identify_slots_batch(stacked)
+    for k in range(4):
+        ids = _identify_slots_legacy(stacked[k])
+        assert all(np.array_equal(ids[s + 1], stacked[k][batch[k, s]].astype(int)) for s in range(5))
+
+    rounds = 2000
+    t0 = time.perf_counter()
+    for k in range(rounds):
+        for c in trays[4 * (k % 100): 4 * (k % 100) + 4]: _identify_slots_legacy(c)
+    t_loop = (time.perf_counter() - t0) / rounds
+    stacks = [np.stack(trays[4 * j: 4 * j + 4]) for j in range(100)]
+    t0 = time.perf_counter()
+    for k in range(rounds): GeometryUtils.identify_slots_batch(stacks[k % 100])
+    t_batch = (time.perf_counter() - t0) / rounds
+    print(f"Vòng lặp cũ (4 cam) : {t_loop * 1e6:.1f} µs")
+    print(f"Vector hoá (4 cam)  : {t_batch * 1e6:.1f} µs  (nhanh hơn {t_loop / t_batch:.1f}x)")
+
+def parity_overlap_matrix(rng):
+    """Ma trận giao item x slot: cv2.intersectConvexConvex từng cặp vs overlap_matrix"""
+    scenes = []
+    for _ in range(500):
+        centers, obbs = make_tray(rng)
+        boxes, _ = make_items(rng, centers, fill=1.0, extra=12) # Khay lộn xộn: tới ~17 box
+        scenes.append((boxes, obbs.astype(np.int32)))
+    max_diff, flips, pairs = 0.0, 0, 0
+    for boxes, polys in scenes:
+        ref = np.array([[GeometryUtils.calculate_iou_polygon(b, p)[2] for p in polys] for b in boxes]).reshape(len(boxes), 5)
+        new = GeometryUtils.overlap_matrix(boxes, polys)
+        max_diff = max(max_diff, float(np.abs(ref - new).max()) if len(boxes) else 0.0)
+        flips += int(((ref >= 0.45) != (new >= 0.45)).sum())
+        pairs += ref.size
+    print(f"📊 Tỉ lệ giao lệch tối đa {max_diff:.2e}, đổi kết quả ngưỡng 0.45: {flips}/{pairs} cặp")
+
+    t0 = time.perf_counter()
+    for boxes, polys in scenes:
+        for p in polys:
+            for b in boxes: GeometryUtils.is_item_in_slot(b, p)
+    t_pair = (time.perf_counter() - t0) / len(scenes)
+    t0 = time.perf_counter()
+    for boxes, polys in scenes: GeometryUtils.match_items_to_slots(boxes, polys)
+    t_matrix = (time.perf_counter() - t0) / len(scenes)
+    print(f"Từng cặp (cv2)      : {t_pair * 1e6:.1f} µs / khay")
+    print(f"Ma trận (vector hoá): {t_matrix * 1e6:.1f} µs / khay  (nhanh hơn {t_pair / t_matrix:.1f}x)")
+
+def parity_slot_recovery(rng, num_frames=5000, tol=15.0):
+    """
+    Tỉ lệ frame có đủ 5 slot đúng vị trí (khay bị che / có box nhiễu).
+    Cũ: chỉ định danh được khi detect đúng 5 slot. Mới: FrameProcessor (gán tối ưu + khôi phục).
+    """
+    def placed_ok(points, centers):
+        """Mọi slot nằm đúng (<= tol) tại 1 tâm slot thật, không 2 slot trùng 1 tâm (nhãn S1-S5 do thuật toán hình học quyết định)"""
+        d = np.linalg.norm(np.asarray(points, dtype=np.float32)[:, None] - centers[None], axis=2)
+        nearest = d.argmin(axis=1)
+        return bool((d.min(axis=1) <= tol).all()) and len(set(nearest.tolist())) == len(nearest)
+
+    proc = FrameProcessor(CameraConfig("cam_1"))
+    cx, cy, angle = 320.0, 240.0, rng.uniform(0, 2 * np.pi)
+    stats = {"old_ok": 0, "old_wrong": 0, "new_ok": 0, "new_wrong": 0}
+    for f in range(num_frames):
+        # Khay trôi chậm + rung nhẹ
+        cx, cy, angle = cx + rng.normal(0, 1.5), cy + rng.normal(0, 1.5), angle + rng.normal(0, 0.01)
+        centers, obbs = make_tray(rng, cx=cx, cy=cy, angle=angle, scale=1.0)
+        obbs = obbs + rng.normal(0, 1.0, obbs.shape).astype(np.float32)
+        keep = [k for k in range(5) if rng.random() > 0.15]                 # Slot bị tay/vật che
+        boxes = [obbs[k] for k in keep]
+        for _ in range(rng.binomial(2, 0.15)):                              # Box nhiễu
+            c = rng.uniform([60, 60], [580, 420])
+            boxes.append((c + obbs[0] - centers[0]).astype(np.float32))
+        rng.shuffle(boxes)
+        found = np.array(boxes, dtype=np.float32).reshape(-1, 4, 2)
+        found_centers = found.mean(axis=1)
+
+        ids = GeometryUtils.identify_slots_logic(found_centers)
+        if ids:
+            good = placed_ok([ids[k] for k in sorted(ids) if proc.cam_config.get_slot_by_local_id(k)], centers)
+            stats["old_ok" if good else "old_wrong"] += 1
+
+        det = SimpleNamespace(slot_obbs=found, slot_confs=np.full(len(found), 0.9, dtype=np.float32))
+        slots = list(proc.cam_config.slots.values())
+        table, rows = proc.cam_config.table, proc.cam_config.rows
+        before = table.pos_version[rows].copy()
+        proc._update_slots(det)
+        # Chỉ tính frame mà mọi slot được cập nhật vị trí ngay trong frame này
+        if (table.pos_version[rows] != before).all():
+            good = placed_ok([s.center for s in slots], centers)
+            stats["new_ok" if good else "new_wrong"] += 1
+
+    print(f"📊 {num_frames} frame (che 15%/slot, nhiễu ~0.3 box/frame), sai số cho phép {tol:.0f}px")
+    print(f"   Cũ : {stats['old_ok'] / num_frames:6.1%} frame dùng được | {stats['old_wrong']} frame sai vị trí")
+    print(f"   Mới: {stats['new_ok'] / num_frames:6.1%} frame dùng được | {stats['new_wrong']} frame sai vị trí")
+
+PARITY_CHECKS = (parity_identify_slots, parity_overlap_matrix, parity_slot_recovery)
+
+# --- ĐO ---
+def measure(func, sample_time=SAMPLE_TIME, repeats=REPEATS):
+    """Tự chọn số lần gọi mỗi mẫu (~sample_time giây) -> thống kê thời gian 1 lần gọi (micro giây)"""
+    func() # Khởi động
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number): func()
+        dt = time.perf_counter() - t0
+        if dt >= sample_time / 4 or number >= 1 << 20: break
+        number *= 4
+    number = max(1, int(number * sample_time / max(dt, 1e-9)))
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number): func()
+        samples.append((time.perf_counter() - t0) * 1e6 / number)
+    return {"median_us": statistics.median(samples), "min_us": min(samples), "max_us": max(samples),
+            "stdev_us": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "number": number, "repeats": repeats}
+
+def run_all(name_filter=None, seed=0, sample_time=SAMPLE_TIME, repeats=REPEATS):
+    results = {}
+    for name, setup in CASES.items():
+        if name_filter and name_filter not in name: continue
+        # Logic có print (VD: "Slot SAVED") -> chặn lại để không lẫn vào JSON trên stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            func = setup(np.random.default_rng(seed))
+            results[name] = measure(func, sample_time, repeats)
+        print(f"   {name:<45} {results[name]['median_us']:>10.2f} µs", file=sys.stderr)
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+                     "machine": platform.machine(), "platform": platform.platform(), "seed": seed,
+                     "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "results": results}
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """So median từng case với baseline -> (list dòng báo cáo, list case bị regression)"""
+    lines, regressions = [], []
+    for name, res in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            lines.append(f"   {name:<45} {res['median_us']:>10.2f} µs   (mới)")
+            continue
+        ratio = res["median_us"] / max(base["median_us"], 1e-9)
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "❌ CHẬM HƠN"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = "✅ nhanh hơn"
+        lines.append(f"   {name:<45} {base['median_us']:>10.2f} -> {res['median_us']:>10.2f} µs  x{ratio:.2f} {flag}")
+    return lines, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hình học / logic / vẽ (không cần model)")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--compare", help="File JSON baseline để so sánh")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Ngưỡng regression (0.15 = 15%%)")
+    parser.add_argument("--filter", help="Chỉ chạy case có tên chứa chuỗi này")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--sample-time", type=float, default=SAMPLE_TIME)
+    parser.add_argument("--list", action="store_true", help="Liệt kê các case rồi thoát")
+    parser.add_argument("--parity", action="store_true", help="Đối chiếu bản cũ / bản vector hoá rồi thoát")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+    if args.parity:
+        for check in PARITY_CHECKS: check(np.random.default_rng(0))
+        return 0
+
+    print(f"📊 Benchmark ({len(CASES)} case)...", file=sys.stderr)
+    current = run_all(args.filter, sample_time=args.sample_time, repeats=args.repeats)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"💾 Đã ghi {args.json}", file=sys.stderr)
+    else:
+        json.dump(current, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+        lines, regressions = compare(current, baseline, args.tolerance)
+        print(f"📊 So với {args.compare} (ngưỡng {args.tolerance:.0%}):", file=sys.stderr)
+        for line in lines: print(line, file=sys.stderr)
+        if regressions:
+            print(f"❌ {len(regressions)} case chậm hơn baseline: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+        print("✅ Không có regression", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import time
+import cv2
+
+# --- NGUỒN THỜI GIAN ---
+# Mọi logic hẹn giờ (giữ 3s để SAVED, đếm ngược 10s, hiện kết quả 5s, đếm ngược trên màn hình)
+# đọc giờ qua 1 đối tượng clock (clock.now() -> giây) thay vì gọi time.time() trực tiếp:
+#   WallClock  : giờ thật, dùng khi chạy với camera
+#   FrameClock : giờ do người gọi đặt (thời điểm đã ghi khi replay)
+#   VideoClock : giờ theo PTS của video -> chạy offline nhanh hết mức mà hẹn giờ vẫn đúng như xem thật
+
+class WallClock:
+    def now(self):
+        return time.time()
+
+WALL_CLOCK = WallClock()
+
+class FrameClock:
+    def __init__(self, start=0.0):
+        self.t = float(start)
+
+    def now(self):
+        return self.t
+
+    def set(self, t):
+        self.t = float(t)
+
+    def advance(self, dt):
+        self.t += dt
+
+class VideoClock(FrameClock):
+    """
+    Giờ = PTS của frame vừa đọc từ cv2.VideoCapture (gọi on_frame sau mỗi lần read).
+    Video lặp lại (PTS quay về 0) thì cộng dồn để giờ luôn tăng.
+    Backend không trả PTS (luôn 0) -> suy ra từ số frame và FPS.
+    """
+    def __init__(self, cap, start=0.0):
+        super().__init__(start)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self.offset = float(start)
+        self.last_pts = None
+
+    def on_frame(self, cap):
+        pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if pts <= 0: pts = max(cap.get(cv2.CAP_PROP_POS_FRAMES) - 1, 0) * self.frame_interval
+        if self.last_pts is not None and pts < self.last_pts:
+            # Video vừa lặp lại -> nối tiếp sau frame cuối
+            self.offset += self.last_pts + self.frame_interval
+        self.last_pts = pts
+        self.t = self.offset + pts
+        return self.t
@@ -1,130 +1,343 @@
-import time
 import numpy as np
+from clock import WALL_CLOCK
+from event_log import CONSOLE_EVENTS
+from line_config import load_line_config
 
 # --- QUY TRÌNH ĐÓNG GÓI ---
+# Nạp + kiểm tra từ file cấu hình dây chuyền (line_config.json, xem line_config.py) lúc import.
 # Thứ tự cam rất quan trọng để xác định vật được phép
-CAM_ORDER = ["cam_1", "cam_2", "cam_3", "cam_4"]
+LINE = load_line_config()
+CAM_ORDER = LINE.cam_order
+PACKING_RULES = LINE.packing_rules
 
-PACKING_RULES = {
-    "cam_1": {1: "Den_nho", 2: "Den_nho", 3: "Den_nho"},
-    "cam_2": {4: "Den_to", 5: "Board"},
-    "cam_3": {6: "rgb", 7: "day_xam", 8: "day_trang"},
-    "cam_4": {9: "tui", 10: "sac"}
-}
+# --- BẢNG TRẠNG THÁI SLOT (struct-of-arrays) ---
+# Trạng thái slot của mọi camera nằm chung trong các mảng NumPy (mỗi slot 1 hàng),
+# Slot / CameraConfig chỉ là lớp "view" đọc ghi vào bảng -> không cấp phát mảng mới mỗi frame
+# và chuyển trạng thái / đếm giờ SAVED được cho cả loạt slot cùng lúc.
+SLOT_STATES = ("empty", "oke", "wrong")
+STATE_CODE = {name: code for code, name in enumerate(SLOT_STATES)}
+EMPTY, OKE, WRONG = 0, 1, 2
+SAVE_HOLD_SECONDS = 3.0 # Giữ "oke" liên tục bao lâu thì SAVED
+SLOT_COLUMNS = ("obb_points", "center", "placed", "pos_version", "state", "first_oke_time",
+                "is_saved", "item_class", "expected_item", "expected_cls")
+
+class SlotTable:
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.obb_points = np.zeros((capacity, 4, 2), dtype=np.int32)
+        self.center = np.zeros((capacity, 2), dtype=np.int32)
+        self.placed = np.zeros(capacity, dtype=bool)          # Đã có vị trí (obb_points/center khác None)
+        self.pos_version = np.zeros(capacity, dtype=np.uint32) # Tăng mỗi lần cập nhật vị trí
+        self.state = np.zeros(capacity, dtype=np.int8)         # Mã trong SLOT_STATES
+        self.first_oke_time = np.full(capacity, np.nan)        # NaN = None
+        self.is_saved = np.zeros(capacity, dtype=bool)
+        self.item_class = np.full(capacity, None, dtype=object)
+        self.expected_item = np.full(capacity, None, dtype=object)
+        self.expected_cls = np.full(capacity, -1, dtype=np.int16) # Mã item (LineConfig.items), -1 = không rõ
+
+    def add(self, expected_item, expected_cls=-1):
+        """Thêm 1 slot -> index hàng"""
+        if self.size == len(self.state): self._grow(2 * len(self.state))
+        row = self.size
+        self.expected_item[row] = expected_item
+        self.expected_cls[row] = expected_cls
+        self.size += 1
+        return row
+
+    def _grow(self, capacity):
+        for name in SLOT_COLUMNS:
+            old = getattr(self, name)
+            fill = np.nan if name == "first_oke_time" else (None if old.dtype == object else 0)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def set_states(self, rows, codes, item_classes, now, hold=SAVE_HOLD_SECONDS):
+        """
+        Quy tắc giữ "oke" / SAVED duy nhất (Slot.set_state cũng đi qua đây), cho cả loạt hàng của 1 camera.
+        Mỗi camera chỉ vài slot -> đọc mỗi mảng 1 lần rồi xét từng hàng bằng Python (nhanh hơn phép toán mảng).
+        rows: mảng index hàng, codes: mã trạng thái mới, item_classes: tên class (None nếu trống).
+        -> (có hàng nào đổi trạng thái/class, danh sách hàng vừa SAVED)
+        """
+        codes, item_classes = list(codes), list(item_classes)
+        prev = self.state[rows].tolist()
+        changed = codes != prev or item_classes != self.item_class[rows].tolist()
+        saved_rows = []
+        # Đang oke và vẫn oke -> xét đủ giờ để SAVED (trước khi ghi trạng thái mới)
+        if OKE in codes:
+            times = self.first_oke_time[rows].tolist()
+            saved = self.is_saved[rows].tolist()
+            for i, code in enumerate(codes):
+                if code == OKE and prev[i] == OKE and now - times[i] >= hold and not saved[i]:
+                    saved_rows.append(int(rows[i]))
+        # Không đổi gì thì không ghi (phần lớn các tick)
+        if changed:
+            self.first_oke_time[rows] = [(now if p != OKE else t) if c == OKE else np.nan
+                                         for c, p, t in zip(codes, prev, self.first_oke_time[rows].tolist())]
+            self.state[rows] = codes
+            self.item_class[rows] = item_classes
+        if saved_rows: self.is_saved[saved_rows] = True
+        return changed, saved_rows
 
-# ... (Class Slot giữ nguyên như cũ) ...
 class Slot:
-    def __init__(self, slot_id, expected_item):
+    """View 1 hàng của SlotTable (giữ nguyên các thuộc tính cũ để code khác không phải sửa)"""
+    __slots__ = ("id", "expected_item", "owner", "table", "row", "clock")
+
+    def __init__(self, slot_id, expected_item, owner=None, table=None, clock=None, expected_cls=-1):
         self.id = slot_id
         self.expected_item = expected_item
-        self.obb_points = None
-        self.center = None
-        self.state = "empty" 
-        self.current_item_class = None
-        self.first_oke_time = None 
-        self.is_saved = False 
+        self.owner = owner # CameraConfig chứa slot (được báo khi trạng thái đổi để cập nhật bộ đếm)
+        if clock is None: clock = owner.clock if owner is not None else WALL_CLOCK
+        self.clock = clock # Nguồn thời gian cho bộ đếm 3s (xem clock.py)
+        self.table = table if table is not None else SlotTable(capacity=1)
+        self.row = self.table.add(expected_item, expected_cls)
+
+    @property
+    def obb_points(self):
+        return self.table.obb_points[self.row] if self.table.placed[self.row] else None
+
+    @obb_points.setter
+    def obb_points(self, value):
+        if value is None: self.table.placed[self.row] = False
+        else:
+            self.table.obb_points[self.row] = value
+            self.table.placed[self.row] = True
+
+    @property
+    def center(self):
+        return self.table.center[self.row] if self.table.placed[self.row] else None
+
+    @center.setter
+    def center(self, value):
+        if value is None: self.table.placed[self.row] = False
+        else:
+            self.table.center[self.row] = value
+            self.table.placed[self.row] = True
+
+    @property
+    def state(self):
+        return SLOT_STATES[self.table.state[self.row]]
+
+    @state.setter
+    def state(self, value):
+        self.table.state[self.row] = STATE_CODE[value]
+
+    @property
+    def current_item_class(self):
+        return self.table.item_class[self.row]
+
+    @current_item_class.setter
+    def current_item_class(self, value):
+        self.table.item_class[self.row] = value
+
+    @property
+    def first_oke_time(self):
+        t = self.table.first_oke_time[self.row]
+        return None if np.isnan(t) else float(t)
+
+    @first_oke_time.setter
+    def first_oke_time(self, value):
+        self.table.first_oke_time[self.row] = np.nan if value is None else value
+
+    @property
+    def is_saved(self):
+        return bool(self.table.is_saved[self.row])
+
+    @is_saved.setter
+    def is_saved(self, value):
+        value = bool(value)
+        if value == self.is_saved: return
+        self.table.is_saved[self.row] = value
+        if self.owner is not None: self.owner._on_slot_saved(self, value)
 
     def update_position(self, obb_points, center):
-        self.obb_points = np.array(obb_points, dtype=np.int32)
-        self.center = np.array(center, dtype=np.int32)
+        table, row = self.table, self.row
+        table.obb_points[row] = obb_points
+        table.center[row] = center
+        table.placed[row] = True
+        table.pos_version[row] += 1
 
     def set_state(self, new_state, item_class=None):
-        if new_state == "oke":
-            if self.state != "oke":
-                self.first_oke_time = time.time()
-            elif self.first_oke_time is not None:
-                elapsed = time.time() - self.first_oke_time
-                if elapsed >= 3.0 and not self.is_saved:
-                    self.is_saved = True 
-                    print(f"💾 Slot {self.id} SAVED")
-        else:
-            self.first_oke_time = None
-        self.state = new_state
-        self.current_item_class = item_class
+        """Đổi trạng thái 1 slot: cùng đường với cả loạt (SlotTable.set_states) -> 1 quy tắc giữ "oke" / SAVED"""
+        rows, codes = np.array([self.row], dtype=np.intp), [STATE_CODE[new_state]]
+        if self.owner is not None:
+            self.owner.set_slot_states(rows, codes, [item_class])
+            return
+        now = self.clock.now()
+        _, saved_rows = self.table.set_states(rows, codes, [item_class], now)
+        if saved_rows: CONSOLE_EVENTS.emit("slot_saved", now, cam=None, slot=self.id, item=self.expected_item)
 
     def reset_state(self):
+        changed = self.state != "empty" or self.current_item_class is not None or self.first_oke_time is not None
         self.state = "empty"
         self.current_item_class = None
         self.first_oke_time = None
         self.is_saved = False
+        if changed and self.owner is not None: self.owner.version += 1
 
 class CameraConfig:
-    def __init__(self, cam_name):
+    def __init__(self, cam_name, table=None, clock=None, events=None, line=None):
+        """
+        table: SlotTable dùng chung cho mọi camera (None -> bảng riêng)
+        clock: nguồn thời gian cho các slot (None -> giờ thật, xem clock.py)
+        events: nơi nhận sự kiện slot/camera (None -> chỉ in console, xem event_log.py)
+        line: LineConfig (None -> LINE nạp từ file cấu hình mặc định)
+        """
         self.cam_name = cam_name
+        self.line = line if line is not None else LINE
+        self.clock = clock if clock is not None else WALL_CLOCK
+        self.events = events if events is not None else CONSOLE_EVENTS
+        self.table = table if table is not None else SlotTable()
         self.slots = {}
         self.cam_state = "waiting"
         self.status_message = "WAITING"
         self.has_finished_once = False 
+        # Tăng mỗi khi slot/checklist/trạng thái cam thay đổi -> nơi dùng chỉ tính lại khi version khác
+        self.version = 0
 
         # Biến chứa tên vật phẩm SAI QUY TRÌNH (nếu detect thấy)
         self.forbidden_item_detected = None 
+        self._reported_forbidden = None # Vật lạ đã ghi sự kiện (chỉ ghi khi đổi)
+
+        # --- VẬT PHẨM ĐƯỢC PHÉP (Cumulative) ---
+        # Được phép thấy vật của Cam hiện tại VÀ các Cam trước đó: bitmask theo mã item, dịch sẵn trong LineConfig
+        spec = self.line.camera(cam_name)
+        self.allowed_mask = spec.allowed_mask if spec is not None else 0
+        self.allowed_classes = set(self.line.items_of(self.allowed_mask))
 
-        # --- LOGIC TẠO DANH SÁCH VẬT PHẨM ĐƯỢC PHÉP (Cumulative) ---
-        self.allowed_classes = set()
-        if cam_name in CAM_ORDER:
-            current_idx = CAM_ORDER.index(cam_name)
-            # Được phép thấy vật của Cam hiện tại VÀ các Cam trước đó
-            for i in range(current_idx + 1):
-                c_name = CAM_ORDER[i]
-                if c_name in PACKING_RULES:
-                    self.allowed_classes.update(PACKING_RULES[c_name].values())
-        
-        # Mapping ID
-        if cam_name in ["cam_1", "cam_2"]: self.id_mapping = {1:1, 2:2, 3:3, 4:4, 5:5}
-        elif cam_name in ["cam_3", "cam_4"]: self.id_mapping = {1:6, 2:7, 3:8, 4:9, 5:10}
-        else: self.id_mapping = {}
-
-        if cam_name in PACKING_RULES:
-            for s_id, exp_item in PACKING_RULES[cam_name].items():
-                self.slots[s_id] = Slot(s_id, exp_item)
+        # Mapping ID (S1..S5 trên khay -> ID slot toàn cục)
+        self.id_mapping = dict(spec.id_mapping) if spec is not None else {}
+
+        # Bộ đếm checklist (cập nhật dần khi slot SAVED / reset, không quét lại mỗi frame)
+        self.item_totals = {}
+        self.item_saved = {}
+        self.num_saved = 0
+        self._stats = None
+        self._stats_version = -1
+
+        if spec is not None:
+            for s_id, exp_item in spec.rules.items():
+                self.slots[s_id] = Slot(s_id, exp_item, owner=self, table=self.table,
+                                        expected_cls=self.line.item_index[exp_item])
+                self.item_totals[exp_item] = self.item_totals.get(exp_item, 0) + 1
+                self.item_saved[exp_item] = 0
+        # Hàng trong bảng của các slot (cùng thứ tự với self.slots)
+        self.rows = np.array([slot.row for slot in self.slots.values()], dtype=np.intp)
+        self._slot_of_row = {slot.row: slot for slot in self.slots.values()}
 
     def get_slot_by_local_id(self, local_id):
         global_id = self.id_mapping.get(local_id)
         return self.slots.get(global_id)
 
+    def first_forbidden(self, item_ids):
+        """Index detect đầu tiên có item không được phép ở cam này (item_ids: mã item), -1 nếu không có"""
+        mask = self.allowed_mask
+        for k, i in enumerate(item_ids.tolist()):
+            if i < 0 or not mask >> i & 1: return k
+        return -1
+
+    def item_ids(self, det):
+        """Mã item (LineConfig.items) của từng detect trong CameraDetections, -1 = class không thuộc dây chuyền"""
+        if not len(det.item_cls): return np.zeros(0, dtype=np.int16)
+        return self.line.class_ids(det.name_table)[det.item_cls]
+
+    def placed_rows(self):
+        """Hàng của các slot đã có vị trí"""
+        return self.rows[self.table.placed[self.rows]]
+
+    def set_slot_states(self, rows, codes, item_classes):
+        """Slot.set_state cho nhiều slot của camera này cùng lúc (rows: hàng trong bảng)"""
+        now = self.clock.now()
+        events = self.events
+        # Chỉ chụp trạng thái cũ khi cần ghi từng chuyển trạng thái (tắt -> không tốn gì thêm)
+        prev = self.table.state[rows].tolist() if events.structured else None
+        changed, saved_rows = self.table.set_states(rows, codes, item_classes, now)
+        for row in saved_rows:
+            slot = self._slot_of_row[row]
+            events.emit("slot_saved", now, cam=self.cam_name, slot=slot.id, item=slot.expected_item)
+            self._on_slot_saved(slot, True)
+        if changed:
+            if prev is not None: self._emit_slot_transitions(now, rows, prev)
+            self.version += 1
+
+    def _emit_slot_transitions(self, now, rows, prev):
+        state = self.table.state[rows].tolist()
+        for row, p, s in zip(rows.tolist(), prev, state):
+            if p != s:
+                self.events.emit("slot_state", now, cam=self.cam_name, slot=self._slot_of_row[row].id,
+                                 state=SLOT_STATES[s], prev=SLOT_STATES[p], item=self.table.item_class[row])
+
+    def apply_item_matches(self, rows, matches, item_ids, item_names):
+        """
+        Cập nhật trạng thái slot từ kết quả ghép item (matches[i]: index item trong slot rows[i], -1 = trống):
+        đúng loại -> oke, sai loại -> wrong, không có -> empty.
+        So sánh mã item (item_ids, xem item_ids()) với expected_cls của bảng; item_names chỉ để ghi lại tên.
+        """
+        ids = item_ids.tolist()
+        classes, codes = [], []
+        for k, e in zip(matches.tolist(), self.table.expected_cls[rows].tolist()):
+            if k < 0:
+                classes.append(None)
+                codes.append(EMPTY)
+            else:
+                classes.append(item_names[k])
+                codes.append(OKE if ids[k] == e and e >= 0 else WRONG)
+        self.set_slot_states(rows, codes, classes)
+
+    def _on_slot_saved(self, slot, saved):
+        """Slot vừa SAVED (saved=True) hoặc bị reset sau khi đã SAVED"""
+        delta = 1 if saved else -1
+        self.item_saved[slot.expected_item] += delta
+        self.num_saved += delta
+        if self.num_saved == len(self.slots): self.has_finished_once = True
+        self.version += 1
+
+    def snapshot(self):
+        """Bản chụp cho luồng vẽ (gọi khi đang giữ lock của stage logic), rẻ hơn deepcopy nhiều"""
+        return CameraSnapshot(self)
+
     def get_item_counts(self):
-        # ... (Giữ nguyên logic cũ) ...
-        stats = {}
-        if self.cam_name in PACKING_RULES:
-            req_items = list(PACKING_RULES[self.cam_name].values())
-            unique_items = set(req_items)
-            for item in unique_items:
-                stats[item] = {"count": 0, "total": req_items.count(item), "done": False}
-
-        all_saved = True
-        for slot in self.slots.values():
-            if slot.expected_item in stats:
-                if slot.is_saved: 
-                    stats[slot.expected_item]["count"] += 1
-                else:
-                    all_saved = False
-
-        if all_saved: self.has_finished_once = True
-
-        for item in stats:
-            if stats[item]["count"] >= stats[item]["total"]:
-                stats[item]["count"] = stats[item]["total"]
-                stats[item]["done"] = True
-        return stats
+        """
+        {item: {"count", "total", "done"}} dựng từ bộ đếm, chỉ dựng lại khi version đổi.
+        Dict trả về được dùng chung giữa các lần gọi -> chỉ đọc, không sửa.
+        """
+        if self.num_saved == len(self.slots): self.has_finished_once = True
+        if self._stats_version != self.version:
+            stats = {}
+            for item, total in self.item_totals.items():
+                count = min(self.item_saved[item], total)
+                stats[item] = {"count": count, "total": total, "done": count >= total}
+            self._stats = stats
+            self._stats_version = self.version
+        return self._stats
 
     def update_camera_state(self):
         """
         Logic cập nhật trạng thái có ưu tiên check vật lạ.
         """
+        prev = (self.cam_state, self.status_message)
+        self._update_camera_state()
+        forbidden = self.forbidden_item_detected
+        if forbidden != self._reported_forbidden:
+            if forbidden: self.events.emit("forbidden_item", self.clock.now(), cam=self.cam_name, item=forbidden)
+            self._reported_forbidden = forbidden
+        if (self.cam_state, self.status_message) != prev:
+            self.version += 1
+            if self.events.structured:
+                self.events.emit("camera_state", self.clock.now(), cam=self.cam_name, state=self.cam_state,
+                                 prev=prev[0], message=self.status_message)
+
+    def _update_camera_state(self):
         # 1. Ưu tiên cao nhất: Phát hiện vật sai quy trình (từ tương lai)
         if self.forbidden_item_detected:
             self.cam_state = "false"
             self.status_message = f"WRONG ITEM: {self.forbidden_item_detected}!"
             return
 
-        has_wrong = False
-        has_empty = False
-        all_ok_now = True
-
-        for s in self.slots.values():
-            if s.state == "wrong": has_wrong = True
-            if s.state == "empty": has_empty = True
-            if s.state != "oke": all_ok_now = False
+        n_empty, n_oke, n_wrong = np.bincount(self.table.state[self.rows], minlength=3).tolist()
+        has_wrong = n_wrong > 0
+        has_empty = n_empty > 0
+        all_ok_now = n_oke == len(self.rows)
 
         if self.has_finished_once:
             self.cam_state = "done"
@@ -147,5 +360,31 @@ class CameraConfig:
         self.cam_state = "waiting"
         self.status_message = "WAITING TRAY"
         self.forbidden_item_detected = None # Reset lỗi vật lạ
+        self._reported_forbidden = None
         for s in self.slots.values():
-            s.reset_state()
\ No newline at end of file
+            s.reset_state()
+        self.version += 1
+
+class CameraSnapshot:
+    """
+    Bản chụp chỉ-đọc của CameraConfig cho Visualizer: thông tin cam + các cột slot đã copy khỏi SlotTable.
+    Có cùng tên thuộc tính với CameraConfig cho những gì Visualizer đọc (cam_name, cam_state, status_message,
+    version, get_item_counts) -> dùng thay được cho CameraConfig khi vẽ.
+    """
+    def __init__(self, cfg):
+        table, rows = cfg.table, cfg.rows
+        self.cam_name = cfg.cam_name
+        self.cam_state = cfg.cam_state
+        self.status_message = cfg.status_message
+        self.version = cfg.version
+        self.stats = cfg.get_item_counts() # Dict dựng lại (object mới) mỗi khi version đổi -> giữ tham chiếu được
+        self.slot_ids = list(cfg.slots)
+        self.placed = table.placed[rows]
+        self.obb_points = table.obb_points[rows]
+        self.center = table.center[rows]
+        self.state = table.state[rows]
+        self.is_saved = table.is_saved[rows]
+        self.first_oke_time = table.first_oke_time[rows]
+
+    def get_item_counts(self):
+        return self.stats
@@ -0,0 +1,151 @@
+import json
+import os
+import numpy as np
+from detections import CameraDetections
+
+# --- ĐỊNH DẠNG GHI KẾT QUẢ DETECT ---
+# Thư mục ghi gồm meta.json + các chunk_XXXXX/, mỗi chunk là các file .npy (đọc bằng mmap):
+#   rows.npy        1 dòng / (tick, camera): thời điểm, camera, cờ, vị trí trong các mảng phẳng bên dưới
+#   slot_obbs.npy   (S, 4, 2) float32     slot_confs.npy (S,) float32
+#   item_boxes.npy  (N, 4) float32 xyxy   item_confs.npy (N,) float32   item_cls.npy (N,) int32
+# Mỗi tick của stage logic luôn có ít nhất 1 dòng (cam = -1 nếu tick không có frame mới)
+# để khi phát lại, SystemFlowManager được gọi đúng số lần như lúc chạy thật.
+FORMAT_VERSION = 1
+
+ROW_DTYPE = np.dtype([
+    ("tick", np.int64),
+    ("ts", np.float64),       # time.time() lúc stage logic xử lý tick này
+    ("cam", np.int16),        # index camera, -1 = tick rỗng
+    ("flags", np.uint8),
+    ("slot_start", np.int64), ("slot_count", np.int32),
+    ("item_start", np.int64), ("item_count", np.int32),
+])
+FLAG_SIGNAL = 1     # Camera có tín hiệu
+FLAG_NEW = 2        # Có frame mới -> FrameProcessor chạy với kết quả trong dòng này
+FLAG_SLOT_PASS = 4  # Frame này có chạy model Slot (slot_obbs khác None)
+
+ARRAY_NAMES = ("slot_obbs", "slot_confs", "item_boxes", "item_confs", "item_cls")
+
+class DetectionRecorder:
+    """Ghi kết quả detect của từng tick thành các chunk .npy (ghi khi đủ chunk_size dòng)"""
+    def __init__(self, out_dir, cam_names, chunk_size=2000):
+        self.out_dir = out_dir
+        self.cam_names = list(cam_names)
+        self.chunk_size = chunk_size
+        self.names = []
+        self.num_chunks = 0
+        self.tick = 0
+        self.total_rows = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self.rows = []
+        self.arrays = {name: [] for name in ARRAY_NAMES}
+        self.counts = {"slot": 0, "item": 0}
+
+    def _add_row(self, ts, cam, flags, det=None):
+        slot_start, item_start = self.counts["slot"], self.counts["item"]
+        n_slots = n_items = 0
+        if det is not None:
+            if det.slot_obbs is not None:
+                flags |= FLAG_SLOT_PASS
+                n_slots = len(det.slot_obbs)
+                self.arrays["slot_obbs"].append(np.asarray(det.slot_obbs, dtype=np.float32).reshape(-1, 4, 2))
+                self.arrays["slot_confs"].append(np.asarray(det.slot_confs, dtype=np.float32))
+            n_items = len(det.item_boxes)
+            self.arrays["item_boxes"].append(np.asarray(det.item_boxes, dtype=np.float32).reshape(-1, 4))
+            self.arrays["item_confs"].append(np.asarray(det.item_confs, dtype=np.float32))
+            self.arrays["item_cls"].append(np.asarray(det.item_cls, dtype=np.int32))
+            if len(det.name_table) > len(self.names): self.names = [str(n) for n in det.name_table]
+        self.counts["slot"] += n_slots
+        self.counts["item"] += n_items
+        self.rows.append((self.tick, ts, cam, flags, slot_start, n_slots, item_start, n_items))
+
+    def record_tick(self, ts, has_signal, new_indices, dets):
+        """Ghi 1 tick của stage logic (cùng tham số với apply_logic_tick)"""
+        det_of = dict(zip(new_indices, dets))
+        for i, ok in enumerate(has_signal):
+            if i in det_of: self._add_row(ts, i, FLAG_SIGNAL | FLAG_NEW, det_of[i])
+            elif not ok: self._add_row(ts, i, 0)
+        if not new_indices and all(has_signal): self._add_row(ts, -1, 0)
+        self.tick += 1
+        if len(self.rows) >= self.chunk_size: self.flush()
+
+    def flush(self):
+        if not self.rows: return
+        chunk_dir = os.path.join(self.out_dir, f"chunk_{self.num_chunks:05d}")
+        os.makedirs(chunk_dir, exist_ok=True)
+        np.save(os.path.join(chunk_dir, "rows.npy"), np.array(self.rows, dtype=ROW_DTYPE))
+        empty = {"slot_obbs": (0, 4, 2), "slot_confs": (0,), "item_boxes": (0, 4), "item_confs": (0,), "item_cls": (0,)}
+        for name in ARRAY_NAMES:
+            parts = self.arrays[name]
+            dtype = np.int32 if name == "item_cls" else np.float32
+            arr = np.concatenate(parts) if parts else np.zeros(empty[name], dtype=dtype)
+            np.save(os.path.join(chunk_dir, f"{name}.npy"), arr)
+        self.total_rows += len(self.rows)
+        self.num_chunks += 1
+        self._new_chunk()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {"version": FORMAT_VERSION, "cam_names": self.cam_names, "names": self.names,
+                "chunks": self.num_chunks, "rows": self.total_rows, "ticks": self.tick}
+        tmp = os.path.join(self.out_dir, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.out_dir, "meta.json"))
+
+    def close(self):
+        self.flush()
+        self._write_meta()
+
+class DetectionReader:
+    """Đọc thư mục ghi, mở các chunk bằng mmap và trả lại từng tick"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Không hỗ trợ định dạng phiên bản {self.meta['version']}")
+        self.cam_names = self.meta["cam_names"]
+        self.name_table = np.array(self.meta["names"], dtype=object)
+
+    def chunks(self):
+        for k in range(self.meta["chunks"]):
+            chunk_dir = os.path.join(self.path, f"chunk_{k:05d}")
+            yield {name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode="r")
+                   for name in ("rows",) + ARRAY_NAMES}
+
+    def ticks(self):
+        """
+        -> (ts, has_signal, new_indices, dets) cho từng tick, đúng thứ tự ghi.
+        Mảng trong CameraDetections là view mmap (chỉ đọc).
+        """
+        num_cams = len(self.cam_names)
+        for chunk in self.chunks():
+            rows = chunk["rows"]
+            if len(rows) == 0: continue
+            # Ranh giới giữa các tick trong chunk
+            bounds = np.flatnonzero(np.diff(rows["tick"])) + 1
+            for group in np.split(np.arange(len(rows)), bounds):
+                has_signal = [True] * num_cams
+                new_indices, dets = [], []
+                ts = float(rows["ts"][group[0]])
+                for r in group:
+                    row = rows[r]
+                    cam, flags = int(row["cam"]), int(row["flags"])
+                    if cam < 0: continue
+                    if not flags & FLAG_SIGNAL:
+                        has_signal[cam] = False
+                        continue
+                    det = CameraDetections(name_table=self.name_table)
+                    i0, n = int(row["item_start"]), int(row["item_count"])
+                    det.item_boxes = chunk["item_boxes"][i0:i0 + n]
+                    det.item_confs = chunk["item_confs"][i0:i0 + n]
+                    det.item_cls = chunk["item_cls"][i0:i0 + n]
+                    if flags & FLAG_SLOT_PASS:
+                        s0, n = int(row["slot_start"]), int(row["slot_count"])
+                        det.set_slots(chunk["slot_obbs"][s0:s0 + n], chunk["slot_confs"][s0:s0 + n])
+                    new_indices.append(cam)
+                    dets.append(det)
+                yield ts, has_signal, new_indices, dets
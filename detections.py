@@ -0,0 +1,88 @@
+import numpy as np
+
+# Bảng tên class (numpy) theo từng dict names của model, tạo 1 lần rồi dùng lại
+_NAME_TABLES = {}
+
+def get_name_table(names):
+    """dict {id: tên} của Ultralytics -> mảng numpy để tra tên theo mảng class id"""
+    key = id(names)
+    entry = _NAME_TABLES.get(key)
+    if entry is None or entry[0] is not names:
+        size = max(names) + 1 if names else 0
+        table = np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+        entry = (names, table) # Giữ tham chiếu names để id không bị tái sử dụng
+        _NAME_TABLES[key] = entry
+    return entry[1]
+
+class CameraDetections:
+    """
+    Kết quả detect của 1 camera trong 1 frame, dạng struct-of-arrays.
+    Chuyển từ tensor Ultralytics sang numpy + lọc conf đúng 1 lần,
+    sau đó FrameProcessor, Visualizer và logic luồng đều dùng chung object này.
+    slot_obbs = None nghĩa là frame này không chạy model Slot (giữ vị trí slot cũ).
+    """
+    __slots__ = ("slot_obbs", "slot_confs", "item_boxes", "item_confs", "item_cls", "name_table", "_item_names")
+
+    def __init__(self, slot_obbs=None, slot_confs=None, item_boxes=None, item_confs=None, item_cls=None, name_table=None):
+        self.slot_obbs = slot_obbs      # (S, 4, 2) float32
+        self.slot_confs = slot_confs    # (S,)
+        self.item_boxes = item_boxes if item_boxes is not None else np.zeros((0, 4), dtype=np.float32) # (N, 4) xyxy
+        self.item_confs = item_confs if item_confs is not None else np.zeros(0, dtype=np.float32)      # (N,)
+        self.item_cls = item_cls if item_cls is not None else np.zeros(0, dtype=np.int32)              # (N,) class id
+        self.name_table = name_table if name_table is not None else np.zeros(0, dtype=object)
+        self._item_names = None
+
+    @staticmethod
+    def extract_slots(results_slot, conf_threshold=0.5):
+        """Lấy (obbs, confs) đã lọc conf từ kết quả model Slot"""
+        if getattr(results_slot, 'obb', None) is None:
+            return np.zeros((0, 4, 2), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        obbs = results_slot.obb.xyxyxyxy.cpu().numpy()
+        confs = results_slot.obb.conf.cpu().numpy()
+        keep = confs >= conf_threshold
+        return obbs[keep], confs[keep]
+
+    @classmethod
+    def from_results(cls, results_slot, results_item, slot_conf=0.5, item_conf=0.45):
+        det = cls()
+        if results_slot is not None:
+            det.slot_obbs, det.slot_confs = cls.extract_slots(results_slot, slot_conf)
+        if getattr(results_item, 'boxes', None):
+            boxes = results_item.boxes
+            confs = boxes.conf.cpu().numpy()
+            keep = confs >= item_conf
+            det.item_boxes = boxes.xyxy.cpu().numpy()[keep]
+            det.item_confs = confs[keep]
+            det.item_cls = boxes.cls.cpu().numpy()[keep].astype(np.int32)
+        if results_item is not None and getattr(results_item, 'names', None):
+            det.name_table = get_name_table(results_item.names)
+        return det
+
+    def attach_slots(self, results_slot, conf_threshold=0.5):
+        """Bổ sung kết quả model Slot (khi model Slot chạy sau model Item)"""
+        return self.set_slots(*self.extract_slots(results_slot, conf_threshold))
+
+    def set_slots(self, obbs, confs):
+        """Gán slot đã giải mã sẵn (obbs (S, 4, 2), confs (S,)) - dùng cho backend không phải Ultralytics"""
+        self.slot_obbs, self.slot_confs = obbs, confs
+        return self
+
+    @property
+    def has_slot_pass(self):
+        return self.slot_obbs is not None
+
+    @property
+    def tray_detected(self):
+        """Thấy >= 3 slot là có khay (None nếu frame này không chạy model Slot)"""
+        if self.slot_obbs is None: return None
+        return len(self.slot_obbs) >= 3
+
+    @property
+    def item_names(self):
+        """Tên class của từng item (tra bảng 1 lần cho cả mảng)"""
+        if self._item_names is None:
+            self._item_names = self.name_table[self.item_cls] if len(self.item_cls) else np.zeros(0, dtype=object)
+        return self._item_names
+
+    def __len__(self):
+        return len(self.item_boxes)
@@ -0,0 +1,172 @@
+import gzip
+import json
+import os
+import time
+from collections import deque
+from threading import Thread, Event
+
+# --- NHẬT KÝ SỰ KIỆN (slot / camera / luồng kiểm tra) ---
+# Nơi phát sinh sự kiện (CameraConfig, Slot, SystemFlowManager) gọi events.emit(kind, t, **fields):
+#   slot_state      cam, slot, state, prev, item     (chỉ ghi khi sink.structured = True)
+#   slot_saved      cam, slot, item
+#   forbidden_item  cam, item
+#   camera_state    cam, state, prev, message        (chỉ ghi khi sink.structured = True)
+#   countdown_start cam                              (camera kích hoạt)
+#   countdown_cancel / verdict (verdict, missing) / reset
+# t là giờ của clock của nơi phát (replay -> giờ đã ghi), không phải giờ ghi file.
+#
+# ConsoleEvents: in các thông báo cũ ra console ngay (mặc định, giữ nguyên hành vi của các script test).
+# EventLog: đẩy vào deque (append của CPython là nguyên tử -> không khoá, không bao giờ chặn luồng kiểm tra),
+# luồng ghi nền gom theo lô thành file JSONL nén gzip, xoay file theo dung lượng. Hàng đợi đầy -> bỏ sự kiện
+# mới và đếm theo loại (dropped), luồng ghi ghi thêm sự kiện events_dropped để biết đã mất bao nhiêu.
+
+# Sự kiện vẫn in ra console (định dạng cũ)
+CONSOLE_MESSAGES = {
+    "slot_saved": "💾 Slot {slot} SAVED",
+    "countdown_start": "🏁 {cam} mất tín hiệu -> Bắt đầu đếm ngược 10s...",
+    "reset": "🔄 Kết thúc hiển thị -> Reset Hệ Thống",
+}
+
+class ConsoleEvents:
+    """Không ghi file: chỉ in các sự kiện trong CONSOLE_MESSAGES (đồng bộ, như print cũ)"""
+    structured = False # Nơi phát bỏ qua việc dò từng chuyển trạng thái slot/camera
+
+    def emit(self, kind, t, **fields):
+        msg = CONSOLE_MESSAGES.get(kind)
+        if msg is not None: print(msg.format(**fields))
+
+    def close(self):
+        pass
+
+CONSOLE_EVENTS = ConsoleEvents()
+
+def _to_json(value):
+    """Kiểu NumPy (np.int64, np.str_, ...) -> kiểu Python cho json"""
+    if hasattr(value, "item"): return value.item()
+    if hasattr(value, "tolist"): return value.tolist()
+    return str(value)
+
+class EventLog:
+    def __init__(self, out_dir, max_queue=10000, flush_interval=0.5, rotate_bytes=16 << 20,
+                 max_files=50, echo=True):
+        """
+        out_dir: thư mục chứa events_<thời điểm>_<số>.jsonl.gz
+        max_queue: số sự kiện tối đa chờ ghi (đầy -> bỏ sự kiện mới, tăng dropped)
+        rotate_bytes: dung lượng (trước nén) mỗi file; max_files: giữ tối đa bao nhiêu file (0 = không xoá)
+        echo: luồng ghi in CONSOLE_MESSAGES ra console (thay cho print trên luồng kiểm tra)
+        """
+        self.out_dir = out_dir
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.max_files = max_files
+        self.echo = echo
+        self.structured = True
+        self.queue = deque()
+        self.dropped = {} # {kind: số sự kiện bị bỏ}
+        self.written = 0
+        self.files = []
+        self.file = None
+        self.file_bytes = 0
+        self.dropped_reported = 0
+        self.stop_event = Event()
+        os.makedirs(out_dir, exist_ok=True)
+        self.writer = Thread(target=self._run, name="event-log", daemon=True)
+        self.writer.start()
+
+    def emit(self, kind, t, **fields):
+        """Gọi từ luồng kiểm tra: chỉ append vào deque, không khoá, không I/O"""
+        if len(self.queue) >= self.max_queue:
+            self.dropped[kind] = self.dropped.get(kind, 0) + 1
+            return
+        self.queue.append((t, kind, fields))
+
+    def __deepcopy__(self, memo):
+        # CameraConfig giữ sink này: deepcopy config (test, công cụ) dùng chung sink (có luồng/khoá, không copy được)
+        return self
+
+    @property
+    def total_dropped(self):
+        return sum(self.dropped.values())
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+        self._close_file()
+
+    def _drain(self):
+        """Ghi hết sự kiện đang chờ thành 1 lô (chỉ luồng ghi gọi)"""
+        queue = self.queue
+        lines = []
+        while queue:
+            t, kind, fields = queue.popleft()
+            record = {"t": t, "kind": kind}
+            record.update(fields)
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_to_json))
+            if self.echo:
+                msg = CONSOLE_MESSAGES.get(kind)
+                if msg is not None: print(msg.format(**fields))
+        dropped = self.total_dropped
+        if dropped != self.dropped_reported:
+            record = {"t": time.time(), "kind": "events_dropped", "count": dropped - self.dropped_reported,
+                      "total": dropped, "by_kind": dict(self.dropped)}
+            lines.append(json.dumps(record, separators=(",", ":")))
+            self.dropped_reported = dropped
+        if not lines: return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self.file is None or self.file_bytes >= self.rotate_bytes: self._rotate()
+        self.file.write(data)
+        self.file.flush() # Mỗi lô đọc được ngay (zcat) kể cả khi chương trình bị tắt đột ngột
+        self.file_bytes += len(data)
+        self.written += len(lines)
+
+    def _rotate(self):
+        self._close_file()
+        name = f"events_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.files):04d}.jsonl.gz"
+        path = os.path.join(self.out_dir, name)
+        self.file = gzip.open(path, "wb", compresslevel=6)
+        self.file_bytes = 0
+        self.files.append(path)
+        while self.max_files and len(self.files) > self.max_files:
+            old = self.files.pop(0)
+            if os.path.exists(old): os.remove(old)
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self, timeout=5.0):
+        """Dừng luồng ghi sau khi ghi nốt các sự kiện còn trong hàng đợi"""
+        self.stop_event.set()
+        self.writer.join(timeout)
+
+def read_events(path):
+    """Đọc lại 1 file hoặc cả thư mục nhật ký -> các dict sự kiện theo thứ tự ghi"""
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(path, n) for n in os.listdir(path) if n.endswith(".jsonl.gz"))
+    else:
+        paths = [path]
+    for p in paths:
+        with gzip.open(p, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip(): yield json.loads(line)
+
+if __name__ == "__main__":
+    # Đo chi phí emit trên luồng kiểm tra và kiểm tra hàng đợi đầy thì bỏ + đếm
+    import sys
+    import tempfile
+    out = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp(prefix="events_")
+    log = EventLog(out, max_queue=5000, echo=False)
+    n = 200000
+    t0 = time.perf_counter()
+    for i in range(n):
+        log.emit("slot_state", float(i), cam="cam_1", slot=i % 10, state="oke", prev="empty", item="Den_nho")
+    dt = time.perf_counter() - t0
+    log.close()
+    events = list(read_events(out))
+    print(f"📊 emit: {dt / n * 1e6:.2f} µs/sự kiện | ghi {log.written} dòng, bỏ {log.total_dropped} "
+          f"| {len(log.files)} file trong {out}")
+    assert log.total_dropped == 0 or any(e["kind"] == "events_dropped" for e in events)
+    assert sum(e["kind"] == "slot_state" for e in events) + log.total_dropped == n
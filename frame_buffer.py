@@ -0,0 +1,110 @@
+import cv2
+import time
+import numpy as np
+from collections import deque
+from threading import Lock
+
+class FrameRingBuffer:
+    """
+    Ring buffer cấp phát trước cho 1 camera.
+    Mỗi slot lưu 1 frame kèm số thứ tự (seq) tăng dần và thời điểm chụp.
+    Người đọc nhận view chỉ-đọc (không copy), hợp lệ tới lần read() tiếp theo.
+    """
+    def __init__(self, depth=3, shape=None, dtype=np.uint8):
+        # Cần tối thiểu 3 slot: 1 slot người đọc đang giữ, 1 slot mới nhất, 1 slot đang ghi
+        self.depth = max(3, depth)
+        self.frames = None          # Mảng (depth, H, W, 3), cấp phát khi có frame đầu tiên
+        self.seqs = np.zeros(self.depth, dtype=np.int64)
+        self.timestamps = np.zeros(self.depth, dtype=np.float64)
+        self.seq = 0                # Seq của frame mới nhất (0 = chưa có frame)
+        self.latest_idx = -1        # Slot chứa frame mới nhất
+        self.reader_idx = -1        # Slot người đọc đang giữ (không được ghi đè)
+        self.lock = Lock()
+        # Biết trước kích thước (VD: PROC_H x PROC_W) -> cấp phát pool ngay từ đầu
+        if shape is not None: self._allocate(shape, dtype)
+
+    def _allocate(self, shape, dtype):
+        self.frames = np.zeros((self.depth,) + tuple(shape), dtype=dtype)
+        self.seqs[:] = 0
+        self.latest_idx = -1
+        self.reader_idx = -1
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Lấy 1 slot trống để ghi (luồng capture).
+        Trả về (index, buffer) - buffer là vùng nhớ cấp phát sẵn để decode thẳng vào.
+        """
+        with self.lock:
+            if self.frames is None or self.frames.shape[1:] != tuple(shape) or self.frames.dtype != dtype:
+                self._allocate(shape, dtype)
+            for k in range(1, self.depth + 1):
+                idx = (self.latest_idx + k) % self.depth
+                if idx != self.latest_idx and idx != self.reader_idx:
+                    return idx, self.frames[idx]
+        return None, None
+
+    def commit(self, idx, timestamp=None):
+        """Đánh dấu slot idx đã ghi xong -> trở thành frame mới nhất."""
+        with self.lock:
+            self.seq += 1
+            self.seqs[idx] = self.seq
+            self.timestamps[idx] = timestamp if timestamp is not None else time.time()
+            self.latest_idx = idx
+
+    def write(self, frame, timestamp=None):
+        """Ghi 1 frame có sẵn (copy vào slot cấp phát trước)."""
+        idx, buf = self.acquire(frame.shape, frame.dtype)
+        np.copyto(buf, frame)
+        self.commit(idx, timestamp)
+
+    def read(self):
+        """
+        Trả về (seq, timestamp, view) của frame mới nhất.
+        view là chỉ-đọc, không copy. Chưa có frame -> (0, 0.0, None).
+        """
+        with self.lock:
+            if self.latest_idx < 0:
+                return 0, 0.0, None
+            idx = self.latest_idx
+            self.reader_idx = idx
+            view = self.frames[idx].view()
+            view.flags.writeable = False
+            return int(self.seqs[idx]), float(self.timestamps[idx]), view
+
+_NO_SIGNAL_CACHE = {}
+
+def get_no_signal_frame(width, height):
+    """
+    Ảnh "NO SIGNAL" dùng chung, chỉ tạo 1 lần cho mỗi kích thước.
+    Trả về view chỉ-đọc để tránh bị vẽ đè lên bản cache.
+    """
+    key = (width, height)
+    if key not in _NO_SIGNAL_CACHE:
+        black = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.putText(black, "NO SIGNAL", (width // 2 - 170, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
+        black.flags.writeable = False
+        _NO_SIGNAL_CACHE[key] = black
+    return _NO_SIGNAL_CACHE[key]
+
+class BatchFramePool:
+    """
+    Pool các mảng batch (cams, H, W, 3) cấp phát sẵn, mượn / trả rõ ràng (không xoay vòng mù).
+    acquire() lấy 1 batch trống; người giữ cuối cùng gọi release(idx) khi không còn ai đọc batch đó
+    (hàng đợi bỏ batch cũ, hoặc batch đã công bố bị batch mới thay thế) -> batch đang dùng không bao giờ bị ghi đè.
+    size >= số batch có thể cùng lúc bị giữ (đang ghi + trong hàng đợi + stage đang xử lý + đã công bố).
+    """
+    def __init__(self, size, num_cams, height, width):
+        self.size = size
+        self.batches = np.zeros((size, num_cams, height, width, 3), dtype=np.uint8)
+        self.free = deque(range(size))
+        self.lock = Lock()
+
+    def acquire(self):
+        """-> (idx, batch). Hết batch trống = có chỗ quên release -> báo lỗi thay vì ghi đè batch đang dùng"""
+        with self.lock:
+            if not self.free: raise RuntimeError(f"BatchFramePool: cả {self.size} batch đều đang bị giữ (thiếu release)")
+            idx = self.free.popleft()
+        return idx, self.batches[idx]
+
+    def release(self, idx):
+        with self.lock: self.free.append(idx)
@@ -0,0 +1,221 @@
+import json
+import os
+import numpy as np
+
+# --- CẤU HÌNH DÂY CHUYỀN (file khai báo) ---
+# Mọi thứ đổi theo biến thể sản phẩm nằm trong 1 file JSON (mặc định line_config.json cạnh file này,
+# hoặc đường dẫn trong biến môi trường PACKING_LINE_CONFIG), không sửa code:
+#   models      : đường dẫn model Item / Slot (tương đối -> tính từ thư mục chứa file cấu hình)
+#   thresholds  : item_conf, slot_conf (lọc conf), slot_overlap (tỉ lệ box item nằm trong slot)
+#   cameras     : theo THỨ TỰ công đoạn (thêm trạm = thêm camera). Mỗi cam: name, source (RTSP / file video),
+#                 slot_ids = ID toàn cục của S1..S5 trên khay, slots = {ID toàn cục: item cần đặt}
+#   trigger_camera : camera báo khay rời dây chuyền -> đếm ngược rồi chốt kết quả (mặc định camera cuối)
+#   display.columns: số cột của lưới hiển thị (mặc định lưới gần vuông: 4 cam -> 2x2, 6 -> 3x2, 12 -> 4x3)
+#   inference.max_batch : số camera tối đa mỗi lần chạy model (mặc định: mọi camera 1 lô, như trước).
+#                         Tuỳ chọn "auto" (phải ghi rõ mới bật): đo lúc khởi động, chọn cỡ lô cho nhiều frame/giây
+#                         nhất mà 1 lô vẫn xong trong inference.latency_budget_ms -> cỡ lô phụ thuộc máy / lúc đo
+# Kiểm tra hết lỗi ngay lúc nạp (báo 1 lần tất cả lỗi), rồi dịch sang bảng số:
+#   items            : danh sách item của dây chuyền -> mã item 0..K-1
+#   allowed_mask     : mỗi cam 1 bitmask (bit k = item k được phép thấy ở cam này: item của cam đó và các cam trước)
+#   class_ids(names) : class id của model -> mã item (-1 = class không thuộc dây chuyền), tính 1 lần mỗi model
+# -> check vật lạ / đúng item trong processor là phép so sánh số nguyên trên mảng mã item, không so chuỗi.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "line_config.json")
+ENV_VAR = "PACKING_LINE_CONFIG"
+TRAY_SLOTS = 5 # Hình học định danh S1..S5 (utils.GeometryUtils) luôn trả về 5 vị trí
+THRESHOLD_KEYS = ("item_conf", "slot_conf", "slot_overlap")
+DEFAULT_LATENCY_BUDGET_MS = 200
+
+class LineConfigError(ValueError):
+    def __init__(self, path, problems):
+        self.path = path
+        self.problems = list(problems)
+        super().__init__(f"Cấu hình dây chuyền lỗi ({path}):\n" + "\n".join(f"  - {p}" for p in self.problems))
+
+class CameraSpec:
+    """1 camera đã kiểm tra và dịch sang bảng số"""
+    def __init__(self, index, name, source, slot_ids, rules, allowed_mask):
+        self.index = index         # Vị trí trong thứ tự công đoạn
+        self.name = name
+        self.source = source
+        self.id_mapping = {local_id: global_id for local_id, global_id in enumerate(slot_ids, start=1)}
+        self.rules = rules         # {ID slot toàn cục: tên item}, theo thứ tự trong file
+        self.allowed_mask = allowed_mask
+
+class LineConfig:
+    def __init__(self, data, path="<dict>"):
+        """data: dict đọc từ file; lỗi -> LineConfigError liệt kê mọi chỗ sai"""
+        self.path = path
+        problems = []
+        if not isinstance(data, dict):
+            raise LineConfigError(path, ["Nội dung phải là 1 object JSON"])
+        unknown = set(data) - {"line", "models", "thresholds", "cameras", "trigger_camera", "display", "inference"}
+        if unknown: problems.append(f"Khoá không hỗ trợ: {sorted(unknown)}")
+        self.name = str(data.get("line", os.path.splitext(os.path.basename(path))[0]))
+
+        base = os.path.dirname(os.path.abspath(path)) if os.path.exists(path) else os.getcwd()
+        models = data.get("models")
+        self.model_item_path = self.model_slot_path = None
+        if not isinstance(models, dict):
+            problems.append("models: cần {\"item\": đường dẫn, \"slot\": đường dẫn}")
+        else:
+            for key in ("item", "slot"):
+                value = models.get(key)
+                if not isinstance(value, str) or not value:
+                    problems.append(f"models.{key}: cần đường dẫn model")
+                    continue
+                setattr(self, f"model_{key}_path", os.path.join(base, value))
+
+        thresholds = data.get("thresholds", {})
+        for key in THRESHOLD_KEYS:
+            value = thresholds.get(key) if isinstance(thresholds, dict) else None
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 1:
+                problems.append(f"thresholds.{key}: cần số trong (0, 1], đang là {value!r}")
+                value = None
+            setattr(self, key, value)
+        if isinstance(thresholds, dict) and set(thresholds) - set(THRESHOLD_KEYS):
+            problems.append(f"thresholds: khoá không hỗ trợ {sorted(set(thresholds) - set(THRESHOLD_KEYS))}")
+
+        self.cameras = []
+        self.items = []      # Tên item theo thứ tự xuất hiện -> mã item
+        self.item_index = {}
+        cameras = data.get("cameras")
+        if not isinstance(cameras, list) or not cameras:
+            problems.append("cameras: cần danh sách camera (theo thứ tự công đoạn)")
+            cameras = []
+        seen_names, slot_owner = set(), {}
+        mask = 0
+        for index, cam in enumerate(cameras):
+            where = f"cameras[{index}]"
+            if not isinstance(cam, dict):
+                problems.append(f"{where}: cần object")
+                continue
+            name = cam.get("name")
+            if isinstance(name, str) and name: where = f"cameras[{index}] ({name})"
+            else: problems.append(f"{where}.name: cần tên camera")
+            if name in seen_names: problems.append(f"{where}: trùng tên camera")
+            seen_names.add(name)
+            unknown = set(cam) - {"name", "source", "slot_ids", "slots"}
+            if unknown: problems.append(f"{where}: khoá không hỗ trợ {sorted(unknown)}")
+            source = cam.get("source")
+            if not isinstance(source, str) or not source: problems.append(f"{where}.source: cần URL RTSP / file video")
+
+            slot_ids = cam.get("slot_ids")
+            if (not isinstance(slot_ids, list) or len(slot_ids) != TRAY_SLOTS
+                    or not all(isinstance(s, int) and not isinstance(s, bool) for s in slot_ids)
+                    or len(set(slot_ids)) != TRAY_SLOTS):
+                problems.append(f"{where}.slot_ids: cần {TRAY_SLOTS} ID slot (số nguyên, khác nhau) cho S1..S{TRAY_SLOTS}")
+                slot_ids = []
+            rules = {}
+            slots = cam.get("slots")
+            if not isinstance(slots, dict) or not slots:
+                problems.append(f"{where}.slots: cần {{ID slot: tên item}}")
+                slots = {}
+            for key, item in slots.items():
+                try:
+                    slot_id = int(key)
+                except (TypeError, ValueError):
+                    problems.append(f"{where}.slots: ID slot {key!r} không phải số")
+                    continue
+                if not isinstance(item, str) or not item:
+                    problems.append(f"{where}.slots.{key}: cần tên item")
+                    continue
+                if slot_ids and slot_id not in slot_ids:
+                    problems.append(f"{where}.slots.{key}: không nằm trong slot_ids {slot_ids}")
+                if slot_id in slot_owner:
+                    problems.append(f"{where}.slots.{key}: slot đã thuộc {slot_owner[slot_id]}")
+                slot_owner[slot_id] = name
+                if item not in self.item_index:
+                    self.item_index[item] = len(self.items)
+                    self.items.append(item)
+                rules[slot_id] = item
+                mask |= 1 << self.item_index[item] # Tích luỹ: cam sau được thấy item của mọi cam trước
+            self.cameras.append(CameraSpec(index, name, source, slot_ids, rules, mask))
+
+        # --- TRIGGER / LƯỚI HIỂN THỊ / CỠ LÔ SUY LUẬN ---
+        names = [cam.name for cam in self.cameras]
+        self.trigger_camera = data.get("trigger_camera", names[-1] if names else None)
+        if names and self.trigger_camera not in names:
+            problems.append(f"trigger_camera: {self.trigger_camera!r} không có trong cameras")
+        display = data.get("display", {})
+        if not isinstance(display, dict):
+            problems.append("display: cần object")
+            display = {}
+        columns = display.get("columns")
+        if columns is None: columns = max(1, int(np.ceil(np.sqrt(len(names)))))
+        if isinstance(columns, bool) or not isinstance(columns, int) or columns < 1:
+            problems.append(f"display.columns: cần số nguyên >= 1, đang là {columns!r}")
+        self.grid_columns = columns
+        self.grid_rows = -(-len(names) // columns) if isinstance(columns, int) and columns > 0 else 0
+        inference = data.get("inference", {})
+        if not isinstance(inference, dict):
+            problems.append("inference: cần object")
+            inference = {}
+        max_batch = inference.get("max_batch", len(names)) # Mặc định: mọi camera 1 lô (như trước)
+        if max_batch != "auto" and (isinstance(max_batch, bool) or not isinstance(max_batch, int) or max_batch < 1):
+            problems.append(f"inference.max_batch: cần số nguyên >= 1 hoặc \"auto\", đang là {max_batch!r}")
+        self.max_batch = None if max_batch == "auto" else max_batch # None -> đo lúc khởi động
+        budget = inference.get("latency_budget_ms", DEFAULT_LATENCY_BUDGET_MS)
+        if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+            problems.append(f"inference.latency_budget_ms: cần số > 0, đang là {budget!r}")
+        self.latency_budget = budget / 1000.0 if isinstance(budget, (int, float)) else None
+        if problems: raise LineConfigError(path, problems)
+
+        self.items = tuple(self.items)
+        self.cam_order = [cam.name for cam in self.cameras]
+        self.sources = [cam.source for cam in self.cameras]
+        self._by_name = {cam.name: cam for cam in self.cameras}
+        self.trigger_index = self.cam_order.index(self.trigger_camera)
+        self._class_ids = {} # id(bảng tên) -> (bảng tên, mã item theo class id)
+
+    def camera(self, name):
+        """CameraSpec theo tên, None nếu camera không thuộc dây chuyền"""
+        return self._by_name.get(name)
+
+    @property
+    def packing_rules(self):
+        """{cam: {ID slot: item}} (dạng PACKING_RULES cũ)"""
+        return {cam.name: dict(cam.rules) for cam in self.cameras}
+
+    def items_of(self, mask):
+        return [item for k, item in enumerate(self.items) if mask >> k & 1]
+
+    def class_ids(self, name_table):
+        """name_table (mảng tên theo class id của model) -> mảng mã item int16 cùng độ dài, -1 = không thuộc dây chuyền"""
+        entry = self._class_ids.get(id(name_table))
+        if entry is None or entry[0] is not name_table:
+            ids = np.array([self.item_index.get(n, -1) for n in name_table.tolist()], dtype=np.int16)
+            entry = self._class_ids[id(name_table)] = (name_table, ids) # Giữ tham chiếu -> id không bị tái sử dụng
+        return entry[1]
+
+    def missing_items(self, names):
+        """Item của dây chuyền mà model không có class (names: dict {id: tên} của model)"""
+        have = set(names.values()) if isinstance(names, dict) else set(names)
+        return [item for item in self.items if item not in have]
+
+def load_line_config(path=None):
+    """Đọc + kiểm tra file cấu hình (path None -> biến môi trường PACKING_LINE_CONFIG hoặc line_config.json)"""
+    path = path or os.environ.get(ENV_VAR) or DEFAULT_PATH
+    try:
+        with open(path, encoding="utf-8") as f: data = json.load(f)
+    except OSError as e:
+        raise LineConfigError(path, [f"Không đọc được file: {e}"]) from e
+    except json.JSONDecodeError as e:
+        raise LineConfigError(path, [f"JSON sai dòng {e.lineno} cột {e.colno}: {e.msg}"]) from e
+    return LineConfig(data, path)
+
+if __name__ == "__main__":
+    # Kiểm tra 1 file cấu hình: python line_config.py [đường dẫn]
+    import sys
+    try:
+        line = load_line_config(sys.argv[1] if len(sys.argv) > 1 else None)
+    except LineConfigError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {line.path}: dây chuyền '{line.name}', {len(line.cameras)} camera, {len(line.items)} item")
+    print(f"   Model: {line.model_item_path} | {line.model_slot_path}")
+    print(f"   Ngưỡng: item_conf {line.item_conf}, slot_conf {line.slot_conf}, slot_overlap {line.slot_overlap}")
+    print(f"   Trigger: {line.trigger_camera} | Lưới {line.grid_columns}x{line.grid_rows} | "
+          f"Lô suy luận: {line.max_batch or 'auto'} (tối đa {line.latency_budget * 1000:.0f} ms/lô)")
+    for cam in line.cameras:
+        print(f"   {cam.name}: slot {cam.rules} | được phép {line.items_of(cam.allowed_mask)} "
+              f"(mask {cam.allowed_mask:#x})")
@@ -0,0 +1,258 @@
+import time
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Condition, Event
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics import NULL_METRICS
+
+# --- XEM TRỰC TIẾP QUA HTTP (MJPEG) ---
+# Màn hình giám sát mở trình duyệt thay vì remote desktop vào máy suy luận:
+#   http://<máy>:8080/                  -> trang xem lưới camera + link từng camera
+#   http://<máy>:8080/stream/grid       -> MJPEG cả canvas (lưới + dashboard)
+#   http://<máy>:8080/stream/cam_1      -> MJPEG 1 camera (cắt từ canvas, đã vẽ slot / item)
+#   http://<máy>:8080/snapshot/cam_1    -> 1 ảnh JPEG
+#   ?fps=5                              -> giới hạn FPS riêng client này (không vượt max_fps của server)
+# Nén JPEG chạy trong pool luồng (cv2.imencode nhả GIL), theo yêu cầu của client:
+#   - không có client nào -> không nén gì cả
+#   - mỗi view nén tối đa 1 lần cho mỗi canvas mới của Renderer, mọi client của view đó dùng chung kết quả
+#   - client chậm / FPS thấp chỉ bỏ qua frame, không làm chậm client khác hay luồng kiểm tra
+STREAM_BOUNDARY = "frame"
+
+INDEX_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Smart Packing System</title>
+<style>body{{background:#111;color:#ddd;font-family:sans-serif;margin:0}}a{{color:#0cf;margin-right:12px}}
+img{{max-width:100%;display:block}}</style></head>
+<body><div style="padding:6px">{links}</div><img src="/stream/grid"></body></html>
+"""
+
+class _View:
+    """1 nguồn ảnh (cả canvas hoặc 1 ô camera) + JPEG mới nhất của nó"""
+    def __init__(self, name, rect):
+        self.name = name
+        self.rect = rect # (x, y, w, h) trong canvas, None = cả canvas
+        self.cond = Condition()
+        self.version = 0 # canvas_version của Renderer mà self.jpeg được nén từ đó
+        self.jpeg = None
+        self.pending = False # Đang có 1 lần nén trong pool
+        self.clients = 0
+        self.buffer = None
+        self.encoded = 0
+
+class LiveViewServer(Thread):
+    def __init__(self, renderer, cam_names, port=8080, host="0.0.0.0", quality=70, max_fps=10, workers=2,
+                 poll_interval=0.02, metrics=NULL_METRICS):
+        """
+        renderer: Renderer (latest() -> (version, canvas), cam_rect(i) -> vị trí ô camera i)
+        quality: chất lượng JPEG (0-100)
+        max_fps: FPS tối đa mỗi client (client xin ?fps= thấp hơn được)
+        workers: số luồng nén JPEG dùng chung cho mọi view
+        poll_interval: chu kỳ hỏi Renderer có canvas mới khi client đang chờ
+        """
+        super().__init__(name="live-view", daemon=True)
+        self.renderer = renderer
+        self.quality = quality
+        self.max_fps = max_fps
+        self.poll_interval = poll_interval
+        self.metrics = metrics
+        self.views = {"grid": _View("grid", None)}
+        for i, name in enumerate(cam_names):
+            self.views[name] = _View(name, renderer.cam_rect(i))
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jpeg")
+        self.stop_event = Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                parts = [p for p in url.path.split("/") if p]
+                query = parse_qs(url.query)
+                if not parts:
+                    self._send(200, "text/html; charset=utf-8", server.index_html().encode("utf-8"))
+                    return
+                view = server.views.get(parts[1] if len(parts) > 1 else "grid")
+                if parts[0] not in ("stream", "snapshot") or view is None:
+                    self.send_error(404)
+                    return
+                try:
+                    if parts[0] == "snapshot":
+                        got = server.snapshot(view)
+                        if got is None: self.send_error(503)
+                        else: self._send(200, "image/jpeg", got[1])
+                    else:
+                        server.stream(self, view, query.get("fps", [None])[0])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # Client đóng tab
+
+            def _send(self, code, content_type, body):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def run(self):
+        self.httpd.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.stop_event.set()
+        for view in self.views.values():
+            with view.cond: view.cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.pool.shutdown(wait=False)
+
+    def has_clients(self):
+        """Có ai đang xem không (Renderer headless dùng để bỏ qua việc vẽ khi không ai xem)"""
+        return any(view.clients for view in self.views.values())
+
+    @property
+    def encoded(self):
+        return sum(view.encoded for view in self.views.values())
+
+    def index_html(self):
+        links = "".join(f'<a href="/stream/{name}">{name}</a>' for name in self.views)
+        return INDEX_HTML.format(links=links)
+
+    def frame(self, view, after_version, timeout=1.0):
+        """
+        Chờ JPEG của view mới hơn after_version -> (version, bytes), hết timeout -> None.
+        Renderer có canvas mới mà view chưa nén (và chưa đang nén) -> gửi 1 việc nén vào pool.
+        """
+        deadline = time.monotonic() + timeout
+        with view.cond:
+            while not self.stop_event.is_set():
+                version, canvas = self.renderer.latest()
+                if canvas is not None and version > view.version and not view.pending:
+                    view.pending = True
+                    self.pool.submit(self._encode, view)
+                if view.version > after_version: return view.version, view.jpeg
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return None
+                view.cond.wait(min(remaining, self.poll_interval))
+        return None
+
+    def snapshot(self, view, timeout=2.0):
+        """
+        1 JPEG vẽ sau lúc nhận yêu cầu -> (version, bytes) hoặc None. Tính là 1 client trong lúc chờ (headless mới vẽ).
+        Không trả canvas đang có: headless không ai xem thì Renderer đứng yên -> canvas đó có thể cũ từ lâu.
+        """
+        with view.cond: view.clients += 1
+        try:
+            return self.frame(view, self.renderer.latest()[0], timeout)
+        finally:
+            with view.cond: view.clients -= 1
+
+    def _encode(self, view):
+        version, jpeg = 0, None
+        try:
+            version, canvas = self.renderer.latest()
+            if canvas is None: return
+            if view.rect is not None:
+                x, y, w, h = view.rect
+                canvas = canvas[y:y+h, x:x+w]
+            # Renderer xoay vòng 3 canvas -> chép ra ngay rồi mới nén (nén lâu hơn chép nhiều)
+            if view.buffer is None or view.buffer.shape != canvas.shape: view.buffer = np.empty_like(canvas)
+            np.copyto(view.buffer, canvas)
+            with self.metrics.timer("jpeg_encode", cam=view.name):
+                ok, buf = cv2.imencode(".jpg", view.buffer, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok: jpeg = buf.tobytes()
+        finally:
+            with view.cond:
+                view.pending = False
+                if jpeg is not None:
+                    view.version, view.jpeg = version, jpeg
+                    view.encoded += 1
+                view.cond.notify_all()
+
+    def stream(self, handler, view, fps=None):
+        """Gửi MJPEG tới 1 client cho tới khi client ngắt hoặc server dừng"""
+        try:
+            fps = min(self.max_fps, float(fps)) if fps else self.max_fps
+        except ValueError:
+            fps = self.max_fps
+        interval = 1.0 / fps if fps > 0 else 0.0
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={STREAM_BOUNDARY}")
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        with view.cond: view.clients += 1
+        try:
+            last_version = self.renderer.latest()[0] # Frame đầu cũng phải vẽ sau khi client kết nối (như snapshot)
+            next_send = 0.0
+            while not self.stop_event.is_set():
+                # Giới hạn FPS riêng client: chưa tới lượt thì ngủ, frame ra trong lúc đó bị bỏ qua
+                delay = next_send - time.monotonic()
+                if delay > 0 and self.stop_event.wait(delay): break
+                got = self.frame(view, last_version)
+                if got is None: continue
+                last_version, jpeg = got
+                next_send = time.monotonic() + interval
+                handler.wfile.write(f"--{STREAM_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode("ascii"))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                handler.wfile.flush()
+        finally:
+            with view.cond: view.clients -= 1
+
+if __name__ == "__main__":
+    # Tự kiểm tra: Renderer giả ra canvas mới 30 lần/giây, 2 client xin 5 và 20 FPS (server tối đa 15)
+    import urllib.request
+
+    class FakeRenderer:
+        def __init__(self):
+            self.version = 0
+            self.canvas = np.zeros((960, 1630, 3), dtype=np.uint8)
+
+        def latest(self):
+            return self.version, self.canvas
+
+        def cam_rect(self, i):
+            return (i % 2) * 640, (i // 2) * 480, 640, 480
+
+    renderer = FakeRenderer()
+    stop = Event()
+
+    def produce():
+        rng = np.random.default_rng(0)
+        while not stop.is_set():
+            renderer.canvas = rng.integers(0, 255, renderer.canvas.shape, dtype=np.uint8)
+            renderer.version += 1
+            time.sleep(1 / 30)
+
+    Thread(target=produce, daemon=True).start()
+    server = LiveViewServer(renderer, ["cam_1", "cam_2", "cam_3", "cam_4"], port=0, host="127.0.0.1", max_fps=15)
+    server.start()
+    time.sleep(0.5)
+    print(f"📺 Không có client: đã nén {server.encoded} JPEG")
+    counts = {}
+
+    def client(path, seconds=3.0):
+        n = 0
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}") as r:
+            t_end = time.monotonic() + seconds
+            while time.monotonic() < t_end:
+                line = r.readline()
+                if line.startswith(b"Content-Length:"):
+                    r.readline()
+                    r.read(int(line.split(b":")[1]))
+                    n += 1
+        counts[path] = n / seconds
+
+    clients = [Thread(target=client, args=(p,)) for p in ("/stream/grid?fps=5", "/stream/grid?fps=20", "/stream/cam_2")]
+    for c in clients: c.start()
+    for c in clients: c.join()
+    for path, rate in counts.items(): print(f"📺 {path}: {rate:.1f} FPS")
+    print(f"📺 Đã nén {server.encoded} JPEG ({ {v.name: v.encoded for v in server.views.values() if v.encoded} })")
+    stop.set()
+    server.stop()
@@ -0,0 +1,184 @@
+import time
+import numpy as np
+from threading import Thread, Lock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- ĐO ĐỘ TRỄ TỪNG STAGE ---
+# with metrics.timer("item_predict"): ...            -> packing_stage_seconds{stage="item_predict"}
+# with metrics.timer("process", cam="cam_1"): ...    -> thêm nhãn cam
+# metrics.observe_frame_age("cam_1", giây)           -> packing_frame_age_seconds{cam="cam_1"}
+# Mỗi chuỗi giữ WINDOW mẫu gần nhất (vòng tròn) -> p50/p95/p99 tính lúc đọc, không tốn gì khi đo.
+# Tắt (NULL_METRICS): timer() trả về 1 context manager rỗng dùng chung -> chỉ tốn 1 lời gọi hàm.
+# Xuất dạng Prometheus text (summary) qua MetricsServer: curl http://127.0.0.1:9108/metrics
+QUANTILES = (0.5, 0.95, 0.99)
+STAGE_METRIC = "packing_stage_seconds"
+AGE_METRIC = "packing_frame_age_seconds"
+HELP = {
+    STAGE_METRIC: "Thời gian chạy từng stage (cửa sổ trượt)",
+    AGE_METRIC: "Tuổi frame camera lúc đưa vào AI (giây từ lúc chụp)",
+}
+
+class RollingSummary:
+    """WINDOW mẫu gần nhất + tổng/đếm từ lúc chạy. Mỗi chuỗi chỉ 1 luồng ghi."""
+    def __init__(self, window=1024):
+        self.values = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, qs=QUANTILES):
+        n = min(self.count, len(self.values))
+        if n == 0: return [float("nan")] * len(qs)
+        return np.quantile(self.values[:n], qs).tolist()
+
+class _Timer:
+    """Context manager dùng lại cho 1 chuỗi (không lồng nhau / không dùng chung giữa các luồng)"""
+    __slots__ = ("summary", "t0")
+
+    def __init__(self, summary):
+        self.summary = summary
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.summary.observe(time.perf_counter() - self.t0)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class NullMetrics:
+    """Đo tắt: mọi lời gọi là no-op"""
+    enabled = False
+    overlay = False
+
+    def timer(self, stage, cam=None):
+        return _NULL_TIMER
+
+    def observe_frame_age(self, cam, age):
+        pass
+
+NULL_METRICS = NullMetrics()
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, window=1024, overlay=False):
+        """overlay: Renderer vẽ bảng p50/p95/p99 lên canvas"""
+        self.window = window
+        self.overlay = overlay
+        self.series = {} # {(metric, nhãn...): RollingSummary}
+        self.timers = {} # {(stage, cam): _Timer}
+        self.lock = Lock() # Chỉ giữ khi tạo chuỗi mới / chụp danh sách chuỗi
+        self.started = time.time()
+
+    def _summary(self, key):
+        summary = self.series.get(key)
+        if summary is None:
+            with self.lock:
+                summary = self.series.setdefault(key, RollingSummary(self.window))
+        return summary
+
+    def timer(self, stage, cam=None):
+        t = self.timers.get((stage, cam))
+        if t is None:
+            t = self.timers.setdefault((stage, cam), _Timer(self._summary((STAGE_METRIC, stage, cam))))
+        return t
+
+    def observe_frame_age(self, cam, age):
+        self._summary((AGE_METRIC, None, cam)).observe(age)
+
+    def snapshot(self):
+        """-> [(metric, stage, cam, [p50, p95, p99], sum, count)] sắp theo tên"""
+        with self.lock:
+            items = sorted(self.series.items(), key=lambda kv: tuple(str(k) for k in kv[0]))
+        return [(metric, stage, cam, s.quantiles(), s.sum, s.count) for (metric, stage, cam), s in items]
+
+    def prometheus_text(self):
+        lines = []
+        last_metric = None
+        for metric, stage, cam, qs, total, count in self.snapshot():
+            if metric != last_metric:
+                lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} summary")
+                last_metric = metric
+            labels = []
+            if stage is not None: labels.append(f'stage="{stage}"')
+            if cam is not None: labels.append(f'cam="{cam}"')
+            for q, v in zip(QUANTILES, qs):
+                q_labels = ",".join(labels + ['quantile="%s"' % q])
+                lines.append(f"{metric}{{{q_labels}}} {v:.6g}")
+            label_str = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{metric}_sum{label_str} {total:.6g}")
+            lines.append(f"{metric}_count{label_str} {count}")
+        lines.append(f"packing_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def overlay_rows(self):
+        """Các dòng cho overlay: (tên, [p50, p95, p99] tính bằng ms)"""
+        rows = []
+        for metric, stage, cam, qs, total, count in self.snapshot():
+            if count == 0: continue
+            name = stage if metric == STAGE_METRIC else "frame_age"
+            if cam is not None: name = f"{name}[{cam}]"
+            rows.append((name, [v * 1000 for v in qs]))
+        return rows
+
+class MetricsServer(Thread):
+    """HTTP cục bộ: GET /metrics -> Prometheus text. Mặc định chỉ nghe 127.0.0.1."""
+    def __init__(self, metrics, port=9108, host="127.0.0.1"):
+        super().__init__(name="metrics-http", daemon=True)
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics_ref.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # Không in mỗi lần scrape
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    def run(self):
+        self.httpd.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    # Chi phí 1 lần đo khi tắt / bật (so với vòng lặp rỗng)
+    import timeit
+    n = 200000
+    for name, m in (("tắt", NULL_METRICS), ("bật", Metrics())):
+        def body():
+            with m.timer("process", cam="cam_1"): pass
+        dt = min(timeit.repeat(body, number=n, repeat=5)) / n
+        print(f"📊 timer {name}: {dt * 1e6:.3f} µs/lần")
+    m = Metrics()
+    for v in np.random.default_rng(0).exponential(0.01, 5000): m._summary((STAGE_METRIC, "demo", None)).observe(v)
+    print(m.prometheus_text())
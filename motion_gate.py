@@ -0,0 +1,55 @@
+import cv2
+import time
+import numpy as np
+
+class MotionGate:
+    """
+    Bộ phát hiện thay đổi rẻ tiền cho 1 camera.
+    So ảnh thu nhỏ (xám) hiện tại với ảnh tại lần chạy AI gần nhất, theo từng block.
+    Không block nào thay đổi quá ngưỡng -> camera "tĩnh" -> dùng lại kết quả AI cũ.
+    """
+    def __init__(self, threshold=6.0, max_reuse_age=1.0, thumb_size=(80, 60), block=10):
+        self.threshold = threshold          # Chênh lệch trung bình (0-255) của 1 block để coi là có chuyển động
+        self.max_reuse_age = max_reuse_age  # Dùng lại kết quả cũ tối đa bao nhiêu giây
+        self.thumb_size = thumb_size
+        self.block = block
+        self.ref_thumb = None               # Ảnh thu nhỏ tại lần chạy AI gần nhất
+        self.ref_time = 0.0
+        self.thumb = np.zeros((thumb_size[1], thumb_size[0]), dtype=np.uint8)
+        self.small = np.zeros((thumb_size[1], thumb_size[0], 3), dtype=np.uint8)
+        self.inferred = 0
+        self.skipped = 0
+
+    def _make_thumb(self, frame):
+        cv2.resize(frame, self.thumb_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.thumb)
+        return self.thumb
+
+    def _is_static(self, thumb):
+        diff = cv2.absdiff(thumb, self.ref_thumb)
+        w, h = self.thumb_size
+        b = self.block
+        # Trung bình theo từng block b x b -> vật nhỏ di chuyển vẫn bị bắt
+        block_means = diff[:h - h % b, :w - w % b].reshape(h // b, b, w // b, b).mean(axis=(1, 3))
+        return float(block_means.max()) < self.threshold
+
+    def needs_inference(self, frame, now=None):
+        """
+        True -> cần chạy AI cho frame này (đã lưu frame làm tham chiếu mới).
+        False -> camera tĩnh và kết quả cũ chưa quá max_reuse_age.
+        """
+        now = time.time() if now is None else now
+        thumb = self._make_thumb(frame)
+        if self.ref_thumb is not None and now - self.ref_time < self.max_reuse_age and self._is_static(thumb):
+            self.skipped += 1
+            return False
+        if self.ref_thumb is None: self.ref_thumb = np.empty_like(thumb)
+        np.copyto(self.ref_thumb, thumb)
+        self.ref_time = now
+        self.inferred += 1
+        return True
+
+    def reset(self):
+        """Ép lần sau phải chạy AI (VD: camera vừa mất tín hiệu)"""
+        self.ref_thumb = None
+        self.ref_time = 0.0
@@ -0,0 +1,66 @@
+import traceback
+from collections import deque
+from threading import Thread, Condition, Event
+
+class DropOldestQueue:
+    """
+    Hàng đợi giới hạn giữa 2 stage.
+    Khi đầy -> bỏ phần tử cũ nhất (luôn ưu tiên dữ liệu mới nhất), không bao giờ chặn người ghi.
+    on_drop(item): gọi với phần tử bị bỏ (VD: trả batch frame về pool)
+    """
+    def __init__(self, maxsize=2, on_drop=None):
+        self.maxsize = max(1, maxsize)
+        self.on_drop = on_drop
+        self.items = deque()
+        self.cond = Condition()
+        self.dropped = 0 # Số phần tử bị bỏ do stage sau chậm
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                old = self.items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None: self.on_drop(old)
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Lấy phần tử cũ nhất còn lại. Hết timeout mà chưa có -> None"""
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+                if not self.items: return None
+            return self.items.popleft()
+
+    def __len__(self):
+        return len(self.items)
+
+class PipelineStage(Thread):
+    """
+    1 stage chạy trên luồng riêng: lấy từ in_queue -> func(item) -> đẩy kết quả sang out_queue.
+    Stage đầu tiên (không có in_queue) gọi func() liên tục.
+    func trả về None -> không đẩy gì sang stage sau.
+    """
+    def __init__(self, name, func, in_queue=None, out_queue=None, stop_event=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stop_event = stop_event if stop_event is not None else Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.in_queue is not None:
+                    item = self.in_queue.get(timeout=0.1)
+                    if item is None: continue
+                    out = self.func(item)
+                else:
+                    out = self.func()
+                if out is not None and self.out_queue is not None:
+                    self.out_queue.put(out)
+            except Exception:
+                # Lỗi ở 1 stage -> dừng cả pipeline thay vì treo im lặng
+                print(f"❌ Lỗi tại stage {self.name}:")
+                traceback.print_exc()
+                self.stop_event.set()
@@ -1,103 +1,136 @@
 import numpy as np
 from slot_recovery import SlotRecovery
 from utils import GeometryUtils
+from detections import CameraDetections
 
 class FrameProcessor:
-    def __init__(self, cam_config, conf_threshold=0.5):
+    def __init__(self, cam_config, conf_threshold=None, overlap_threshold=None):
+        """Ngưỡng None -> lấy từ cấu hình dây chuyền của camera (slot_conf / slot_overlap)"""
         self.cam_config = cam_config
-        self.conf_threshold = conf_threshold
+        self.conf_threshold = conf_threshold if conf_threshold is not None else cam_config.line.slot_conf
+        self.overlap_threshold = overlap_threshold if overlap_threshold is not None else cam_config.line.slot_overlap
         self.recovery = SlotRecovery()
         self.geo_utils = GeometryUtils()
+        self.last_tray_detected = False # Kết quả lần chạy model Slot gần nhất
 
     def process(self, results_slot, results_item):
         """
-        Xử lý logic cho 1 camera.
+        Xử lý logic cho 1 camera từ kết quả YOLO.
         Thêm logic check vật sai quy trình (Forbidden Item Check).
+        results_slot = None -> frame này không chạy model Slot, giữ nguyên vị trí slot lần trước.
         """
+        det = CameraDetections.from_results(results_slot, results_item, slot_conf=self.conf_threshold)
+        return self.process_detections(det)
+
+    def process_detections(self, det, slot_order=None):
+        """
+        Xử lý logic cho 1 camera từ CameraDetections (đã chuyển numpy + lọc conf sẵn).
+        slot_order: kết quả identify_slots_batch đã tính sẵn cho camera này (khi đủ 5 slot), None -> tự tính.
+        """
+        if det.has_slot_pass:
+            is_tray_detected = self._update_slots(det, slot_order)
+        else:
+            is_tray_detected = self.last_tray_detected
+        return self._check_items(det, is_tray_detected)
+
+    def _update_slots(self, det, slot_order=None):
         # --- BƯỚC 1: XỬ LÝ SLOT (Tìm khay) ---
-        slots_found = []
-        slot_centers = []
-        
-        if hasattr(results_slot, 'obb') and results_slot.obb is not None:
-            obbs = results_slot.obb.xyxyxyxy.cpu().numpy()
-            confs = results_slot.obb.conf.cpu().numpy()
-            for obb, conf in zip(obbs, confs):
-                if conf < self.conf_threshold: continue
-                center = np.mean(obb, axis=0)
-                slot_centers.append(center)
-                slots_found.append(obb)
+        slots_found = det.slot_obbs
+        slot_centers = slots_found.mean(axis=1) if len(slots_found) else np.zeros((0, 2), dtype=np.float32)
 
         is_tray_detected = len(slot_centers) >= 3
 
         # --- BƯỚC 2: ĐỊNH DANH & CẬP NHẬT VỊ TRÍ ---
-        geometry_ids = self.geo_utils.identify_slots_logic(slot_centers)
-        if geometry_ids:
-            if len(geometry_ids) == 5:
-                self.recovery.update_reference(geometry_ids)
-            elif len(geometry_ids) >= 2:
+        # matches: {local_id: index OBB detect được}
+        matches = self._identify(slots_found, slot_centers, det.slot_confs, slot_order)
+        if matches:
+            geometry_ids = {local_id: slot_centers[i].astype(int) for local_id, i in matches.items()}
+            if 2 <= len(geometry_ids) < 5:
                 geometry_ids = self.recovery.recover(geometry_ids)
 
             for local_id, center_pos in geometry_ids.items():
                 slot_obj = self.cam_config.get_slot_by_local_id(local_id)
-                if slot_obj:
-                    if slots_found:
-                        closest_obb = min(slots_found, key=lambda obb: np.linalg.norm(np.mean(obb, axis=0) - center_pos))
-                        slot_obj.update_position(closest_obb, center_pos)
+                if not slot_obj: continue
+                if local_id in matches:
+                    slot_obj.update_position(slots_found[matches[local_id]], center_pos)
+                else:
+                    # Slot bị che (khôi phục từ mẫu): giữ hình OBB cũ (hoặc của 1 slot vừa ghép) dời tới tâm mới
+                    if slot_obj.obb_points is not None:
+                        shape = slot_obj.obb_points - slot_obj.center
+                    else:
+                        k = next(iter(matches.values()))
+                        shape = slots_found[k] - slot_centers[k]
+                    slot_obj.update_position(shape + center_pos, center_pos)
+
+        self.last_tray_detected = is_tray_detected
+        return is_tray_detected
 
+    def _identify(self, slots_found, slot_centers, slot_confs, slot_order=None):
+        """
+        Định danh S1-S5 cho các OBB detect được -> {local_id: index OBB}, {} nếu không định danh được.
+        - Đủ 5 slot: thuật toán hình học (3 điểm thẳng hàng), đề xuất làm mẫu chuẩn cho SlotRecovery.
+        - Số slot khác 5 (bị che / box nhiễu): gán tối ưu với mẫu chuẩn có ngưỡng khoảng cách.
+        """
+        n = len(slot_centers)
+        if n == 5:
+            order = slot_order if slot_order is not None else self.geo_utils.identify_slots_batch(slot_centers[None])[0]
+            if order[0] >= 0:
+                ids = {k + 1: int(i) for k, i in enumerate(order)}
+                if self.recovery.propose(dict(zip(ids, slot_centers[order].astype(int)))): return ids
+                # Lệch hình dạng so với mẫu: nếu >= 4 box nằm ngay tại vị trí cũ thì box còn lại là nhiễu,
+                # ngược lại (khay mới đặt vào) vẫn dùng kết quả hình học cho frame này
+                if self.recovery.ref_slots is not None:
+                    matches = self.recovery.match(slot_centers, self._prior(), refine=False)
+                    if len(matches) >= 4: return matches
+                return ids
+        if n < 2: return {}
+
+        if self.recovery.ref_slots is not None:
+            return self.recovery.match(slot_centers, self._prior())
+
+        # Chưa có mẫu chuẩn mà thấy > 5 box: thử 5 box conf cao nhất
+        if n > 5 and slot_confs is not None:
+            top = np.sort(np.argsort(-np.asarray(slot_confs))[:5])
+            order = self.geo_utils.identify_slots_batch(slot_centers[top][None])[0]
+            if order[0] >= 0: return {k + 1: int(top[i]) for k, i in enumerate(order)}
+        return {}
+
+    def _prior(self):
+        """Vị trí gần nhất đã biết của các slot -> {local_id: tâm}"""
+        prior = {}
+        for local_id in self.recovery.ref_slots:
+            slot_obj = self.cam_config.get_slot_by_local_id(local_id)
+            if slot_obj is not None and slot_obj.center is not None: prior[local_id] = slot_obj.center
+        return prior
+
+    def _check_items(self, det, is_tray_detected):
         # --- BƯỚC 3: KIỂM TRA ITEM ---
-        items_boxes = []
-        items_classes = []
+        cfg = self.cam_config
+        items_boxes = det.item_boxes
         
         # Reset cờ báo vật lạ trước khi check
-        self.cam_config.forbidden_item_detected = None
+        cfg.forbidden_item_detected = None
+        # Class id của model -> mã item của dây chuyền (1 lần, dùng cho cả check vật lạ và check slot)
+        item_ids = cfg.item_ids(det)
 
-        if hasattr(results_item, 'boxes') and results_item.boxes:
-            boxes = results_item.boxes.xyxy.cpu().numpy()
-            confs = results_item.boxes.conf.cpu().numpy()
-            clss = results_item.boxes.cls.cpu().numpy()
-            
-            detected_classes_set = set() # Dùng set để check nhanh
-
-            for box, conf, cls in zip(boxes, confs, clss):
-                if conf < 0.45: continue 
-                
-                cls_name = results_item.names[int(cls)]
-                items_boxes.append(box)
-                items_classes.append(cls_name)
-                detected_classes_set.add(cls_name)
-
-            # --- [LOGIC MỚI] CHECK VẬT SAI QUY TRÌNH ---
-            # Chỉ check nếu có detect được khay (tránh báo lỗi khi chưa có gì)
-            if is_tray_detected:
-                # Tìm xem có vật nào detect được mà KHÔNG nằm trong allowed list không?
-                # allowed_classes đã được tính tích lũy bên config.py
-                forbidden_items = detected_classes_set - self.cam_config.allowed_classes
-                
-                if forbidden_items:
-                    # Lấy tên vật lạ đầu tiên để báo lỗi
-                    wrong_item = list(forbidden_items)[0]
-                    self.cam_config.forbidden_item_detected = wrong_item
-                    
-                    # Nếu phát hiện vật lạ -> Cập nhật trạng thái ngay lập tức và return
-                    # (Hoặc vẫn để chạy tiếp để vẽ box nhưng state sẽ bị đè là False)
-                    # Ở đây ta cho chạy tiếp để visualizer vẫn vẽ được box đỏ của slot
+        # --- [LOGIC MỚI] CHECK VẬT SAI QUY TRÌNH ---
+        # Chỉ check nếu có detect được khay (tránh báo lỗi khi chưa có gì)
+        if len(item_ids) and is_tray_detected:
+            # Tìm xem có vật nào detect được mà KHÔNG được phép ở cam này không?
+            # Bitmask được phép đã tính tích lũy từ cấu hình dây chuyền (line_config.py)
+            k = cfg.first_forbidden(item_ids)
+            if k >= 0:
+                # Báo vật lạ đầu tiên theo thứ tự detect của model (xếp theo conf giảm dần)
+                cfg.forbidden_item_detected = det.item_names[k]
+                # Vẫn chạy tiếp để visualizer vẽ được box đỏ của slot (state cam bị đè là False)
         
         # --- BƯỚC 4: CHECK VA CHẠM SLOT ---
-        for s_id, slot in self.cam_config.slots.items():
-            if slot.obb_points is None: continue 
-
-            is_occupied = False
-            for box, cls_name in zip(items_boxes, items_classes):
-                if self.geo_utils.is_item_in_slot(box, slot.obb_points, threshold=0.45):
-                    is_occupied = True
-                    if cls_name == slot.expected_item:
-                        slot.set_state("oke", cls_name)
-                    else:
-                        slot.set_state("wrong", cls_name)
-                    break 
-            
-            if not is_occupied:
-                slot.set_state("empty")
+        # Tính ma trận giao item x slot 1 lần; mỗi slot lấy item đầu tiên vượt ngưỡng (như vòng lặp cũ)
+        rows = cfg.placed_rows()
+        if len(rows):
+            matches = self.geo_utils.match_items_to_slots(items_boxes, cfg.table.obb_points[rows],
+                                                          threshold=self.overlap_threshold)
+            cfg.apply_item_matches(rows, matches, item_ids, det.item_names)
 
         # --- BƯỚC 5: UPDATE TRẠNG THÁI CAMERA ---
         # Hàm này sẽ ưu tiên check forbidden_item_detected trước
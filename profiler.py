@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import signal
+import threading
+from collections import Counter
+
+# --- PROFILER LẤY MẪU BẬT LÚC ĐANG CHẠY ---
+# Không cần khởi động lại main.py:
+#   kill -USR1 <pid>                      -> đo PROFILE_ITERATIONS tick của stage logic
+#   echo 500 > profile.trigger            -> đo 500 tick (file rỗng -> số mặc định), file bị xoá khi nhận
+# Luồng lấy mẫu riêng đọc stack của mọi luồng (sys._current_frames) mỗi interval giây, không chèn gì vào
+# code đang đo -> luồng kiểm tra không dừng, chỉ chậm đi phần GIL bị luồng lấy mẫu chiếm.
+# Kết quả trong <out_dir>/profile_<thời điểm>/:
+#   wall.folded   stack thời gian thực (số mẫu), gồm cả lúc chờ I/O / chờ model
+#   cpu.folded    cùng stack nhưng trọng số = µs CPU luồng đó đã dùng kể từ mẫu trước (Linux/Unix),
+#                 chia đều cho stack đầu và cuối khoảng -> ước lượng, đoạn chạy ngắn hơn interval bị dàn ra
+#   summary.txt   top hàm theo CPU tự thân / CPU gồm hàm con, theo từng luồng (inference, logic, render, ...)
+# File .folded dạng "luồng;hàm_ngoài;...;hàm_trong số" -> flamegraph.pl, speedscope, inferno đọc được.
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _thread_cpu_time(ident):
+    """Thời gian CPU (giây) của 1 luồng bất kỳ, None nếu hệ điều hành không hỗ trợ"""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, out_dir, iterations=200, interval=0.005, trigger_file=None, max_seconds=120,
+                 poll_interval=0.5):
+        """
+        iterations: số tick (gọi tick() từ vòng lặp chính) cho 1 lần đo
+        trigger_file: có file này -> bắt đầu đo (nội dung = số tick, tuỳ chọn)
+        max_seconds: dừng dù chưa đủ tick (vòng lặp bị treo vẫn có kết quả)
+        """
+        super().__init__(name="profiler", daemon=True)
+        self.out_dir = out_dir
+        self.iterations = iterations
+        self.interval = interval
+        self.trigger_file = trigger_file
+        self.max_seconds = max_seconds
+        self.poll_interval = poll_interval
+        self.requested = None # Số tick được yêu cầu (đặt từ signal handler / file)
+        self.active = False
+        self.ticks = 0
+        self.last_dump = None
+        self.stop_event = threading.Event()
+
+    def install_signal(self, signum=None):
+        """Gắn signal (mặc định SIGUSR1) -> request(). Chỉ gọi từ luồng chính; Windows không có SIGUSR1."""
+        if signum is None: signum = getattr(signal, "SIGUSR1", None)
+        if signum is None: return False
+        signal.signal(signum, lambda *_: self.request())
+        return True
+
+    def request(self, iterations=None):
+        """Yêu cầu đo (an toàn khi gọi từ signal handler / luồng khác)"""
+        self.requested = iterations or self.iterations
+
+    def tick(self):
+        """Gọi mỗi vòng lặp chính (1 phép so sánh khi không đo)"""
+        if self.active: self.ticks += 1
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self._check_trigger_file()
+            if self.requested:
+                target, self.requested = self.requested, None
+                self._profile(target)
+            else:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _check_trigger_file(self):
+        if not self.trigger_file or not os.path.exists(self.trigger_file): return
+        try:
+            with open(self.trigger_file) as f: text = f.read().strip()
+            os.remove(self.trigger_file)
+        except OSError:
+            return
+        self.request(int(text) if text.isdigit() else None)
+
+    def _profile(self, target):
+        print(f"🔬 Bắt đầu profile {target} tick...")
+        wall, cpu = Counter(), Counter()
+        names = {}
+        labels = {} # code object -> nhãn (khỏi format lại mỗi mẫu)
+        last_cpu = {}
+        own = threading.get_ident()
+        self.ticks = 0
+        self.active = True
+        t_start = time.perf_counter()
+        n_samples = 0
+        try:
+            while self.ticks < target and not self.stop_event.is_set():
+                if time.perf_counter() - t_start > self.max_seconds: break
+                frames = sys._current_frames()
+                if len(names) != len(frames):
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident == own: continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None: label = labels[code] = _frame_label(code)
+                        stack.append(label)
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    key = ";".join(reversed(stack))
+                    wall[key] += 1
+                    t_cpu = _thread_cpu_time(ident)
+                    if t_cpu is not None:
+                        prev, prev_key = last_cpu.get(ident, (None, None))
+                        last_cpu[ident] = (t_cpu, key)
+                        if prev is not None and t_cpu > prev:
+                            # Không biết stack đổi lúc nào trong khoảng -> chia đều cho stack đầu và cuối
+                            us = int((t_cpu - prev) * 1e6)
+                            cpu[prev_key] += us // 2
+                            cpu[key] += us - us // 2
+                n_samples += 1
+                time.sleep(self.interval)
+        finally:
+            self.active = False
+        elapsed = time.perf_counter() - t_start
+        self.last_dump = self._dump(wall, cpu, n_samples, elapsed, target)
+        print(f"🔬 Xong profile: {self.ticks} tick, {n_samples} mẫu trong {elapsed:.1f}s -> {self.last_dump}")
+
+    def _dump(self, wall, cpu, n_samples, elapsed, target):
+        path = os.path.join(self.out_dir, time.strftime("profile_%Y%m%d_%H%M%S"))
+        os.makedirs(path, exist_ok=True)
+        for name, counts in (("wall.folded", wall), ("cpu.folded", cpu)):
+            if not counts: continue
+            with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+                for stack, n in counts.most_common():
+                    f.write(f"{stack} {n}\n")
+        with open(os.path.join(path, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(f"{self.ticks}/{target} tick | {n_samples} mẫu | {elapsed:.2f}s | interval {self.interval * 1000:.1f}ms\n")
+            if cpu: f.write(summarize(cpu, "CPU (ms)", 1e-3))
+            # Khoảng cách thực giữa 2 mẫu dài hơn interval (thời gian lấy mẫu + chờ GIL)
+            f.write(summarize(wall, "Wall (ms, ước lượng từ số mẫu)", elapsed / max(n_samples, 1) * 1000))
+        return path
+
+def summarize(counts, title, scale, top=25):
+    """Từ stack gộp -> bảng top hàm theo tự thân / gồm hàm con cho từng luồng"""
+    by_thread = {}
+    for stack, n in counts.items():
+        frames = stack.split(";")
+        self_t, total_t = by_thread.setdefault(frames[0], (Counter(), Counter()))
+        self_t[frames[-1]] += n
+        for fn in set(frames[1:]): total_t[fn] += n # Hàm đệ quy chỉ tính 1 lần mỗi stack
+    lines = [f"\n=== {title} ==="]
+    for thread, (self_t, total_t) in sorted(by_thread.items(), key=lambda kv: -sum(kv[1][0].values())):
+        lines.append(f"\n[{thread}] tổng {sum(self_t.values()) * scale:.1f}")
+        lines.append(f"{'tự thân':>10} {'gồm con':>10}  hàm")
+        for fn, n in self_t.most_common(top):
+            lines.append(f"{n * scale:10.1f} {total_t[fn] * scale:10.1f}  {fn}")
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    # Tự đo: 1 luồng giả làm vòng lặp chính (bận CPU + ngủ), đo 50 tick
+    import tempfile
+    import numpy as np
+    out = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp(prefix="profile_")
+    prof = SamplingProfiler(out, iterations=50, interval=0.002)
+    prof.start()
+    stop = threading.Event()
+
+    def busy():
+        a = np.random.default_rng(0).random((200, 200))
+        return sum(float((a @ a).sum()) for _ in range(3))
+
+    def loop():
+        while not stop.is_set():
+            busy()
+            time.sleep(0.01)
+            prof.tick()
+
+    worker = threading.Thread(target=loop, name="logic", daemon=True)
+    worker.start()
+    prof.request()
+    while prof.last_dump is None: time.sleep(0.05)
+    stop.set()
+    prof.stop()
+    with open(os.path.join(prof.last_dump, "summary.txt"), encoding="utf-8") as f: print(f.read()[:1500])
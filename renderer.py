@@ -0,0 +1,157 @@
+import cv2
+import time
+import numpy as np
+from threading import Thread, Lock, Event
+from metrics import NULL_METRICS
+
+class SharedState:
+    """
+    Trạng thái mới nhất do stage logic công bố.
+    Stage logic giữ lock trong lúc cập nhật CameraConfig, nên bản chụp bên vẽ luôn nhất quán.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.version = 0          # Tăng mỗi lần logic công bố kết quả mới
+        self.frames = None        # Batch frame (cams, H, W, 3) của lần xử lý gần nhất, chỉ đọc khi giữ lock
+                                  # (batch mượn từ pool, được trả lại ngay sau khi batch mới thay thế)
+        self.items = []           # Mỗi cam: CameraDetections gần nhất hoặc None nếu mất tín hiệu
+        self.configs = []
+        self.status = None
+        self.flow_state = "IDLE"
+        self.verdict = None
+
+    def publish(self, frames, items, configs, status, flow_state, verdict):
+        """Gọi khi đang giữ self.lock"""
+        self.frames = frames
+        self.items = list(items)
+        self.configs = configs
+        self.status = status
+        self.flow_state = flow_state
+        self.verdict = verdict
+        self.version += 1
+
+class Renderer(Thread):
+    """
+    Luồng vẽ tách rời vòng lặp kiểm tra: chụp lại trạng thái và vẽ canvas lưới camera (columns cột) + dashboard
+    theo nhịp cố định (fps), thấp hơn tốc độ AI. Không gọi HighGUI -> dùng được cả khi headless.
+    trigger: chỉ số camera kích hoạt (vẽ đếm ngược lên ô của nó), None = camera cuối
+    """
+    def __init__(self, state, visualizer, num_cams, proc_w, proc_h, dashboard_width, fps=10, stop_event=None,
+                 metrics=NULL_METRICS, active=None, columns=2, trigger=None):
+        super().__init__(name="render", daemon=True)
+        self.metrics = metrics # Đo thời gian vẽ / dashboard, metrics.overlay -> vẽ bảng độ trễ
+        # active() -> False: bỏ qua lần vẽ này (headless chỉ vẽ khi có người xem qua live view)
+        self.active = active
+        self.state = state
+        self.visualizer = visualizer
+        self.num_cams = num_cams
+        self.columns = max(1, min(columns, num_cams))
+        self.rows = -(-num_cams // self.columns)
+        self.trigger = trigger if trigger is not None else num_cams - 1
+        self.proc_w, self.proc_h = proc_w, proc_h
+        self.dashboard_width = dashboard_width
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.stop_event = stop_event if stop_event is not None else Event()
+
+        self.total_w = (proc_w * self.columns) + dashboard_width
+        self.total_h = proc_h * self.rows
+        # 3 canvas xoay vòng: 1 cái đang vẽ, 1 cái mới xong, 1 cái có thể vẫn đang được hiển thị
+        self.canvases = np.zeros((3, self.total_h, self.total_w, 3), dtype=np.uint8)
+        # Key dashboard đang nằm trên từng canvas: trùng key mới -> vùng dashboard đã đúng, khỏi copy lại
+        self.canvas_dashboard_keys = [None] * len(self.canvases)
+        self.ready_idx = -1
+        self.canvas_version = 0
+        self.canvas_lock = Lock()
+        self.rendered_state_version = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            t0 = time.time()
+            if self.active is None or self.active(): self.render_once()
+            delay = self.interval - (time.time() - t0)
+            if delay > 0: self.stop_event.wait(delay)
+
+    def cam_rect(self, i):
+        """Vị trí ô của camera i trong canvas -> (x, y, w, h)"""
+        return (i % self.columns) * self.proc_w, (i // self.columns) * self.proc_h, self.proc_w, self.proc_h
+
+    def latest(self):
+        """Trả về (version, canvas) mới nhất đã vẽ xong, chưa có -> (0, None)"""
+        with self.canvas_lock:
+            if self.ready_idx < 0: return 0, None
+            return self.canvas_version, self.canvases[self.ready_idx]
+
+    def render_once(self):
+        draw_idx = (self.ready_idx + 1) % len(self.canvases)
+        main_canvas = self.canvases[draw_idx]
+        pw, ph = self.proc_w, self.proc_h
+
+        # --- CHỤP TRẠNG THÁI (giữ lock càng ngắn càng tốt) ---
+        with self.state.lock:
+            if self.state.version == 0: return False
+            for i in range(self.num_cams):
+                dx, dy, _, _ = self.cam_rect(i)
+                np.copyto(main_canvas[dy:dy+ph, dx:dx+pw], self.state.frames[i])
+            # Bản chụp nhẹ (thông tin cam + cột slot) thay cho deepcopy cả CameraConfig
+            configs = [cfg.snapshot() for cfg in self.state.configs]
+            items = list(self.state.items)
+            status = self.state.status
+            flow_state, verdict = self.state.flow_state, self.state.verdict
+            self.rendered_state_version = self.state.version
+
+        visualizer = self.visualizer
+        metrics = self.metrics
+        with metrics.timer("draw"):
+            for i in range(self.num_cams):
+                if items[i] is None: continue
+                dx, dy, _, _ = self.cam_rect(i)
+                roi = main_canvas[dy:dy+ph, dx:dx+pw]
+                # Vẽ
+                visualizer.draw_slots(roi, configs[i])
+                visualizer.draw_item_boxes(roi, items[i])
+                visualizer.draw_camera_info(roi, configs[i])
+
+        # --- VẼ GIAO DIỆN ---
+        total_w, total_h = self.total_w, self.total_h
+        blink = int(time.time() * 4) % 2 == 0
+
+        # A. Đếm ngược (Khi camera kích hoạt mất khay)
+        if flow_state == "COUNTDOWN" and isinstance(status, float):
+            # Vẽ lên ô của camera kích hoạt
+            tx, ty, _, _ = self.cam_rect(self.trigger)
+            cv2.putText(main_canvas, f"FINAL CHECK: {status:.1f}s", (tx+50, ty+100),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 255), 4)
+
+        # B. Hiển thị kết quả (Sau 10s)
+        elif flow_state == "SHOW_RESULT":
+            # Chữ / viền kết quả đè lên vùng dashboard -> canvas này phải dán lại dashboard
+            if blink: self.canvas_dashboard_keys[draw_idx] = None
+            if verdict == "PASS" and blink:
+                cv2.putText(main_canvas, "OKE - DONE", (total_w//2-200, total_h//2),
+                            cv2.FONT_HERSHEY_SIMPLEX, 4, (0, 255, 0), 10)
+                cv2.rectangle(main_canvas, (0,0), (total_w, total_h), (0,255,0), 20)
+
+            elif verdict == "FAIL" and blink:
+                cv2.putText(main_canvas, "WRONG / MISSING", (total_w//2-350, total_h//2),
+                            cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 255), 10)
+                cv2.rectangle(main_canvas, (0,0), (total_w, total_h), (0,0,255), 20)
+
+        # Dashboard (lớp vẽ sẵn, chỉ vẽ lại khi checklist / trạng thái cam đổi)
+        dashboard_roi = main_canvas[:, -self.dashboard_width:]
+        bg = (20, 20, 20)
+        # Nhấp nháy đỏ Dashboard nếu Fail
+        if flow_state == "SHOW_RESULT" and verdict == "FAIL" and blink:
+            bg = (0, 0, 100)
+
+        with metrics.timer("dashboard"):
+            key, layer = visualizer.dashboard(configs, dashboard_roi.shape, bg)
+            if self.canvas_dashboard_keys[draw_idx] != key:
+                np.copyto(dashboard_roi, layer)
+                self.canvas_dashboard_keys[draw_idx] = key
+        visualizer.draw_fps(main_canvas)
+        if metrics.overlay: visualizer.draw_metrics(main_canvas, metrics.overlay_rows())
+
+        with self.canvas_lock:
+            self.ready_idx = draw_idx
+            self.canvas_version += 1
+        return True
@@ -0,0 +1,50 @@
+import sys
+import time
+import main as app
+from clock import FrameClock
+from config import CameraConfig, SlotTable, LINE
+from processor import FrameProcessor
+from detection_log import DetectionReader
+
+# --- PHÁT LẠI KẾT QUẢ DETECT ĐÃ GHI (KHÔNG CẦN MODEL, KHÔNG CẦN VIDEO) ---
+# Chạy lại FrameProcessor + CameraConfig + SystemFlowManager với tốc độ tối đa của CPU.
+# Ghi: đặt RECORD_DIR trong main.py. Phát lại: python replay.py <thư mục ghi>
+# Đo riêng phần logic: python -m cProfile -s cumtime replay.py <thư mục ghi>
+RECORD_DIR = "records/latest"
+
+def replay(path, verbose=False):
+    """Phát lại toàn bộ bản ghi -> dict thống kê"""
+    reader = DetectionReader(path)
+    # Giờ = thời điểm đã ghi của tick hiện tại -> timer giữ 3s của Slot và đếm ngược 10s chạy đúng như lúc ghi
+    clock = FrameClock()
+    slot_table = SlotTable()
+    configs = [CameraConfig(name, slot_table, clock) for name in reader.cam_names]
+    processors = [FrameProcessor(cfg) for cfg in configs]
+    logic_state = {"trigger_detected": False}
+    # Camera kích hoạt theo cấu hình dây chuyền nếu bản ghi có camera đó, không thì camera cuối của bản ghi
+    trigger = reader.cam_names.index(LINE.trigger_camera) if LINE.trigger_camera in reader.cam_names else None
+    flow_manager = app.SystemFlowManager(clock, trigger_name=reader.cam_names[-1 if trigger is None else trigger])
+    last_items = [None] * len(configs)
+    stats = {"ticks": 0, "frames": 0, "verdicts": [], "seconds": 0.0}
+
+    t0 = time.perf_counter()
+    for ts, has_signal, new_indices, dets in reader.ticks():
+        clock.set(ts)
+        status = app.apply_logic_tick(processors, configs, flow_manager, logic_state, last_items,
+                                      has_signal, new_indices, dets, trigger=trigger)
+        stats["ticks"] += 1
+        stats["frames"] += len(new_indices)
+        if status == "FINISHED":
+            stats["verdicts"].append((ts, flow_manager.final_verdict))
+            if verbose: print(f"🏁 {time.strftime('%H:%M:%S', time.localtime(ts))} -> {flow_manager.final_verdict}")
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else RECORD_DIR
+    stats = replay(path, verbose=True)
+    dt = max(stats["seconds"], 1e-9)
+    passed = sum(v == "PASS" for _, v in stats["verdicts"])
+    print(f"📊 {stats['ticks']} tick / {stats['frames']} frame trong {dt:.2f}s "
+          f"({stats['ticks'] / dt:.0f} tick/s, {stats['frames'] / dt:.0f} frame/s)")
+    print(f"📊 Kết quả: {len(stats['verdicts'])} khay | PASS {passed} | FAIL {len(stats['verdicts']) - passed}")
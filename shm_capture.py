@@ -0,0 +1,160 @@
+import cv2
+import os
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+# --- BỐ CỤC SHARED MEMORY ---
+# [ctrl: int64 x 4][slot_seq: int64 x depth][ts: float64 x depth][frames: uint8 x depth x H x W x 3]
+# ctrl[0] = seq mới nhất, ctrl[1] = slot chứa frame mới nhất, ctrl[2] = heartbeat (số lần ghi)
+# slot_seq là seqlock: số lẻ = đang ghi, số chẵn = ghi xong (seq frame = slot_seq // 2)
+CTRL_LEN = 4
+
+def _layout(depth, width, height):
+    ctrl_bytes = 8 * CTRL_LEN
+    seq_bytes = 8 * depth
+    ts_bytes = 8 * depth
+    frame_bytes = depth * height * width * 3
+    return ctrl_bytes, seq_bytes, ts_bytes, ctrl_bytes + seq_bytes + ts_bytes + frame_bytes
+
+def _map_arrays(buf, depth, width, height):
+    """Tạo các numpy view trỏ thẳng vào vùng shared memory (không copy)"""
+    ctrl_bytes, seq_bytes, ts_bytes, _ = _layout(depth, width, height)
+    ctrl = np.ndarray((CTRL_LEN,), dtype=np.int64, buffer=buf, offset=0)
+    slot_seq = np.ndarray((depth,), dtype=np.int64, buffer=buf, offset=ctrl_bytes)
+    ts = np.ndarray((depth,), dtype=np.float64, buffer=buf, offset=ctrl_bytes + seq_bytes)
+    frames = np.ndarray((depth, height, width, 3), dtype=np.uint8, buffer=buf,
+                        offset=ctrl_bytes + seq_bytes + ts_bytes)
+    return ctrl, slot_seq, ts, frames
+
+def _capture_worker(shm_name, source, size, depth, stop_event):
+    """
+    Hàm chạy trong process con: đọc camera/video, resize thẳng vào shared memory.
+    """
+    cv2.setNumThreads(1)
+    width, height = size
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ctrl, slot_seq, ts, frames = _map_arrays(shm.buf, depth, width, height)
+
+    # Video file (camera giả lập) -> lặp lại khi hết và giữ đúng tốc độ FPS của file
+    is_file = os.path.exists(source)
+    cap = cv2.VideoCapture(source)
+    frame_interval = 0.0
+    if is_file and cap.isOpened():
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 25
+
+    decode_buf = None
+    seq = 0
+    next_time = time.time()
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read(decode_buf) if cap.isOpened() else (False, None)
+            if not ret:
+                if is_file and cap.isOpened():
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0) # Hết video -> quay lại đầu
+                    continue
+                cap.release()
+                time.sleep(2)
+                cap = cv2.VideoCapture(source)
+                continue
+            decode_buf = frame
+
+            # Ghi vào slot kế tiếp theo seqlock
+            seq += 1
+            idx = seq % depth
+            slot_seq[idx] = 2 * seq - 1
+            try:
+                cv2.resize(frame, size, dst=frames[idx])
+            except cv2.error:
+                slot_seq[idx] = 0 # Frame hỏng -> bỏ slot này
+                seq -= 1
+                continue
+            ts[idx] = time.time()
+            slot_seq[idx] = 2 * seq
+            ctrl[1] = idx
+            ctrl[0] = seq
+            ctrl[2] += 1
+
+            if frame_interval > 0:
+                next_time += frame_interval
+                delay = next_time - time.time()
+                if delay > 0: time.sleep(delay)
+                else: next_time = time.time()
+    finally:
+        cap.release()
+        del ctrl, slot_seq, ts, frames
+        shm.close()
+
+class ShmCameraStream:
+    """
+    Camera chạy ở process riêng, frame trao đổi qua shared memory (không pickle).
+    Giao diện giống SafeCameraStream: start() / read() -> (seq, timestamp, frame) / stop().
+    source có thể là URL RTSP hoặc đường dẫn video (để test thay camera thật).
+    Process con chạy kiểu spawn nên import lại __main__ của script gọi: script dùng lớp này phải để import nặng
+    (ultralytics / torch / onnxruntime) trong main() hoặc dưới if __name__ == "__main__".
+    """
+    def __init__(self, source, cam_id, buffer_depth=3, size=(640, 480)):
+        self.url = source
+        self.cam_id = cam_id
+        self.size = size
+        self.depth = max(3, buffer_depth)
+        width, height = size
+        _, _, _, total = _layout(self.depth, width, height)
+        self.shm = shared_memory.SharedMemory(create=True, size=total)
+        self.ctrl, self.slot_seq, self.ts, self.frames = _map_arrays(self.shm.buf, self.depth, width, height)
+        self.ctrl[:] = 0
+        self.slot_seq[:] = 0
+
+        # 2 buffer local luân phiên: frame trả về còn hợp lệ tới lần read() tiếp theo
+        self.local = np.zeros((2, height, width, 3), dtype=np.uint8)
+        self.local_idx = 0
+        self.last_seq = 0
+        self.last_ts = 0.0
+
+        # spawn: an toàn với PyTorch/CUDA ở process chính, chạy được cả Windows
+        ctx = mp.get_context("spawn")
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(target=_capture_worker,
+                                   args=(self.shm.name, source, size, self.depth, self.stop_event),
+                                   daemon=True)
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def read(self):
+        """Đọc frame mới nhất theo seqlock. Chưa có frame -> (0, 0.0, None)"""
+        for _ in range(5):
+            if self.ctrl[0] == 0: return 0, 0.0, None
+            idx = int(self.ctrl[1])
+            s1 = int(self.slot_seq[idx])
+            if s1 == 0 or s1 & 1: continue # Slot đang được ghi -> thử lại
+            seq = s1 // 2
+            if seq == self.last_seq:
+                # Không có frame mới -> trả lại buffer cũ, khỏi copy
+                return self._result(self.local[self.local_idx])
+            dst = self.local[1 - self.local_idx]
+            np.copyto(dst, self.frames[idx])
+            ts = float(self.ts[idx])
+            if int(self.slot_seq[idx]) != s1: continue # Bị ghi đè giữa chừng -> thử lại
+            self.local_idx = 1 - self.local_idx
+            self.last_seq, self.last_ts = seq, ts
+            return self._result(dst)
+        # Writer quá nhanh -> trả frame hợp lệ gần nhất
+        if self.last_seq == 0: return 0, 0.0, None
+        return self._result(self.local[self.local_idx])
+
+    def _result(self, frame):
+        view = frame.view()
+        view.flags.writeable = False
+        return self.last_seq, self.last_ts, view
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=3)
+        if self.process.is_alive(): self.process.terminate()
+        del self.ctrl, self.slot_seq, self.ts, self.frames
+        self.shm.close()
+        self.shm.unlink()
@@ -1,11 +1,21 @@
 import cv2
 import numpy as np
+from utils import linear_assignment
 
 class SlotRecovery:
+    # Ngưỡng ghép = GATE_RATIO * khoảng cách ngắn nhất giữa 2 slot của mẫu;
+    # sai lệch hình dạng cho phép (sau dịch/xoay/co giãn) = SHAPE_RATIO * khoảng cách đó
+    GATE_RATIO = 0.5
+    SHAPE_RATIO = 0.1
+    MAX_SCALE_CHANGE = 0.2
+
     def __init__(self):
         # Lưu tọa độ 5 slot chuẩn (Reference)
         # Dạng: {1: [x,y], ..., 5: [x,y]}
         self.ref_slots = None 
+        self.ref_layout = None # (ids, mảng toạ độ, ngưỡng ghép) tính sẵn từ ref_slots
+        # Bộ 5 slot chưa được xác nhận (chờ frame sau khớp hình dạng mới thành mẫu chuẩn)
+        self.candidate = None
 
     def update_reference(self, current_slots):
         """
@@ -13,6 +23,120 @@ class SlotRecovery:
         Giúp hệ thống thích nghi nếu camera bị rung nhẹ.
         """
         self.ref_slots = current_slots.copy()
+        self.ref_layout = self._layout(self.ref_slots, with_gate=True)
+        self.candidate = None
+
+    def propose(self, current_slots):
+        """
+        Đề xuất bộ 5 slot vừa định danh bằng hình học làm mẫu chuẩn.
+        Chỉ nhận khi khớp hình dạng với mẫu hiện tại, hoặc với đề xuất của lần trước
+        (box nhiễu ngẫu nhiên không lặp lại 2 lần, khay mới đặt vào thì lặp lại).
+        -> True nếu đã cập nhật mẫu chuẩn
+        """
+        layout = self._layout(current_slots, with_gate=False)
+        for ref in (self.ref_layout, self.candidate):
+            if ref is not None and self._same_shape(ref, layout):
+                self.update_reference(current_slots)
+                return True
+        self.candidate = self._layout(current_slots, with_gate=True)
+        return False
+
+    def match(self, centers, prior=None, refine=True):
+        """
+        Ghép các tâm slot detect được (số lượng bất kỳ: thiếu do bị che, thừa do box nhiễu)
+        với mẫu chuẩn bằng phép gán tối ưu (Hungarian), bỏ các cặp xa hơn ngưỡng.
+        prior: {local_id: [x,y]} vị trí gần nhất đã biết (ưu tiên hơn mẫu chuẩn nếu có).
+        refine: cho phép ghép lại sau khi ước lượng khay dịch/xoay (False: box phải nằm ngay tại vị trí cũ).
+        Output: {local_id: index trong centers}
+        """
+        if self.ref_layout is None or len(centers) == 0: return {}
+        ids, ref, gate = self.ref_layout
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+
+        expected = ref
+        if prior:
+            expected = ref.copy()
+            for k, sid in enumerate(ids):
+                if prior.get(sid) is not None: expected[k] = prior[sid]
+        pairs = self._assign(expected, centers, gate)
+
+        # Khay có thể đã dịch/xoay: ước lượng biến đổi mẫu -> hiện tại từ các cặp đã ghép rồi ghép lại
+        if refine and len(pairs) >= 2:
+            rows, cols = zip(*pairs)
+            M = self._similarity(ref[list(rows)], centers[list(cols)])
+            if M is not None:
+                refined = self._assign(ref @ M[:, :2].T + M[:, 2], centers, gate)
+                if len(refined) >= len(pairs): pairs = refined
+        pairs = self._reject_outliers(ref, centers, pairs, gate * self.SHAPE_RATIO / self.GATE_RATIO)
+        return {ids[r]: c for r, c in pairs}
+
+    def _reject_outliers(self, ref, centers, pairs, tol):
+        """
+        Box nhiễu lọt vào ngưỡng của 1 slot bị che sẽ làm lệch hình dạng khay:
+        bỏ lần lượt cặp mà khi bỏ đi phần còn lại khớp mẫu nhất, cho tới khi mọi cặp lệch <= tol.
+        Với 2 cặp (luôn khớp hoàn hảo) thì kiểm tra tỉ lệ co giãn so với mẫu (camera cố định).
+        """
+        pairs = list(pairs)
+        while len(pairs) >= 3:
+            rows, cols = zip(*pairs)
+            if self._max_error(ref[list(rows)], centers[list(cols)]) <= tol: return pairs
+            errors = []
+            for k in range(len(pairs)):
+                rest = pairs[:k] + pairs[k + 1:]
+                errors.append(self._max_error(ref[[r for r, _ in rest]], centers[[c for _, c in rest]]))
+            pairs.pop(int(np.argmin(errors)))
+        if len(pairs) == 2:
+            rows, cols = zip(*pairs)
+            M = self._similarity(ref[list(rows)], centers[list(cols)])
+            if M is None or abs(np.hypot(M[0, 0], M[1, 0]) - 1.0) > self.MAX_SCALE_CHANGE: return []
+        return pairs
+
+    def _same_shape(self, ref_layout, layout):
+        """2 bộ slot đã định danh có cùng hình dạng (sau dịch/xoay/co giãn, mọi slot lệch trong SHAPE_RATIO)"""
+        ref_ids, ref, gate = ref_layout
+        ids, pts, _ = layout
+        if ids != ref_ids: return False
+        return self._max_error(ref, pts) <= gate * self.SHAPE_RATIO / self.GATE_RATIO
+
+    @classmethod
+    def _layout(cls, slots, with_gate=True):
+        """{local_id: [x,y]} -> (ids đã sắp xếp, mảng (n, 2), ngưỡng ghép hoặc None)"""
+        ids = sorted(slots)
+        pts = np.array([slots[i] for i in ids], dtype=np.float64).reshape(-1, 2)
+        if not with_gate: return ids, pts, None
+        d = np.sqrt(((pts[:, None] - pts[None]) ** 2).sum(axis=2))
+        d[np.diag_indices(len(pts))] = np.inf
+        return ids, pts, cls.GATE_RATIO * float(d.min())
+
+    @staticmethod
+    def _similarity(src, dst):
+        """
+        Phép dịch + xoay + co giãn khớp src -> dst theo bình phương tối thiểu (dạng đóng, không RANSAC
+        như estimateAffinePartial2D nên rẻ hơn nhiều với 2-5 điểm) -> ma trận 2x3, None nếu suy biến
+        """
+        src_mean, dst_mean = src.sum(axis=0) / len(src), dst.sum(axis=0) / len(dst)
+        s, d = src - src_mean, dst - dst_mean
+        den = float((s * s).sum())
+        if den < 1e-6: return None
+        a = float((s * d).sum()) / den
+        b = float((s[:, 0] * d[:, 1] - s[:, 1] * d[:, 0]).sum()) / den
+        R = np.array([[a, -b], [b, a]])
+        return np.hstack([R, (dst_mean - R @ src_mean)[:, None]])
+
+    @classmethod
+    def _max_error(cls, src, dst):
+        """Sai lệch lớn nhất sau khi khớp src -> dst bằng dịch/xoay/co giãn"""
+        M = cls._similarity(src, dst)
+        if M is None: return np.inf
+        return float(np.sqrt(((src @ M[:, :2].T + M[:, 2] - dst) ** 2).sum(axis=1)).max())
+
+    @staticmethod
+    def _assign(expected, centers, gate):
+        """Gán tối ưu điểm kỳ vọng <-> tâm detect, chỉ giữ cặp có khoảng cách <= gate -> [(hàng, cột)]"""
+        cost = np.sqrt(((expected[:, None] - centers[None]) ** 2).sum(axis=2))
+        # Cặp vượt ngưỡng coi như không thể ghép (chi phí rất lớn) rồi loại sau khi gán
+        rows, cols = linear_assignment(np.where(cost <= gate, cost, 1e6))
+        return [(int(r), int(c)) for r, c in zip(rows, cols) if cost[r, c] <= gate]
 
     def recover(self, detected_slots):
         """
@@ -74,4 +198,4 @@ class SlotRecovery:
             pos = recovered_pts[i][0]
             recovered_slots[mid] = pos.astype(int)
 
-        return recovered_slots
\ No newline at end of file
+        return recovered_slots
@@ -0,0 +1,65 @@
+import time
+import numpy as np
+
+class SlotScheduler:
+    """
+    Lịch chạy model Slot (OBB) cho 1 camera.
+    Khay gần như đứng yên sau khi đặt -> chỉ chạy model Slot theo chu kỳ thưa (interval giây),
+    hoặc khi các box item cho thấy khay đã bị dịch chuyển/nhấc đi.
+    Giữa 2 lần chạy, vị trí slot được giữ nguyên từ kết quả định danh/khôi phục gần nhất.
+    """
+    def __init__(self, interval=1.0, move_threshold=15.0, match_radius=40.0):
+        self.interval = interval              # Khay đã khoá: chạy lại model Slot sau tối đa bao nhiêu giây
+        self.move_threshold = move_threshold  # Item lệch trung vị quá bao nhiêu px -> coi như khay bị dời
+        self.match_radius = match_radius      # Bán kính ghép item cũ - mới (px)
+        self.last_pass_time = 0.0
+        self.tray_locked = False              # Lần chạy Slot gần nhất có thấy khay không
+        self.anchor_centers = np.zeros((0, 2), dtype=np.float32) # Tâm item tại lần chạy Slot gần nhất
+        self.anchor_classes = np.zeros(0, dtype=np.int32)
+        self.ran = 0
+        self.skipped = 0
+
+    @staticmethod
+    def _centers(boxes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+    def _tray_moved(self, item_boxes, item_classes):
+        """So item hiện tại với item lúc chạy Slot gần nhất"""
+        if len(self.anchor_centers) == 0: return False
+        centers = self._centers(item_boxes)
+        classes = np.asarray(item_classes, dtype=np.int32).reshape(-1)
+        if len(centers) == 0: return True # Item biến mất hết -> khay có thể đã bị nhấc đi
+
+        # Khoảng cách từ mỗi anchor tới item cùng class gần nhất
+        d = np.linalg.norm(self.anchor_centers[:, None, :] - centers[None, :, :], axis=2)
+        d[self.anchor_classes[:, None] != classes[None, :]] = np.inf
+        nearest = d.min(axis=1)
+        matched = nearest[nearest <= self.match_radius]
+
+        # Quá nửa anchor không tìm thấy -> cảnh đã đổi nhiều
+        if len(matched) * 2 < len(self.anchor_centers): return True
+        return float(np.median(matched)) > self.move_threshold
+
+    def need_slot_pass(self, item_boxes, item_classes, now=None):
+        """True -> frame này phải chạy model Slot"""
+        now = time.time() if now is None else now
+        if (not self.tray_locked
+                or now - self.last_pass_time >= self.interval
+                or self._tray_moved(item_boxes, item_classes)):
+            return True
+        self.skipped += 1
+        return False
+
+    def on_slot_pass(self, item_boxes, item_classes, tray_detected, now=None):
+        """Gọi sau mỗi lần chạy model Slot để lưu mốc so sánh"""
+        self.last_pass_time = time.time() if now is None else now
+        self.tray_locked = tray_detected
+        self.anchor_centers = self._centers(item_boxes)
+        self.anchor_classes = np.asarray(item_classes, dtype=np.int32).reshape(-1)
+        self.ran += 1
+
+    def reset(self):
+        self.tray_locked = False
+        self.anchor_centers = np.zeros((0, 2), dtype=np.float32)
+        self.anchor_classes = np.zeros(0, dtype=np.int32)
@@ -4,11 +4,12 @@ cv2.setNumThreads(0)
 
 import numpy as np
 import os
-import time
-from ultralytics import YOLO
 from config import CameraConfig
 from visualizer import Visualizer
 from processor import FrameProcessor
+from detections import CameraDetections
+from shm_capture import ShmCameraStream
+from clock import WALL_CLOCK, VideoClock
 
 # --- CẤU HÌNH ĐƯỜNG DẪN (QUAN TRỌNG) ---
 # 1. Điền đường dẫn Model
@@ -27,6 +28,14 @@ VIDEO_PATHS = {
 PROC_W, PROC_H = 640, 480 
 DASHBOARD_WIDTH = 350 
 
+# 3. Chế độ đọc video: "looper" (đọc tuần tự trong vòng lặp chính)
+# hoặc "process" (mỗi video 1 process riêng qua shared memory, giả lập camera thật)
+CAPTURE_MODE = "looper"
+
+# 4. Phát theo tốc độ thật (waitKey 30ms)? False -> chạy nhanh hết mức; ở chế độ "looper" mọi bộ đếm giờ
+# theo thời gian video nên logic vẫn như xem thật ("process" luôn là thời gian thực)
+REALTIME_PLAYBACK = False
+
 # --- CLASS ĐỌC VIDEO (CÓ LẶP LẠI) ---
 class VideoLooper:
     def __init__(self, video_path, cam_name):
@@ -35,8 +44,10 @@ class VideoLooper:
         if not os.path.exists(video_path):
             print(f"❌ Không tìm thấy file video cho {cam_name}: {video_path}")
             self.cap = None
+            self.clock = None
         else:
             self.cap = cv2.VideoCapture(video_path)
+            self.clock = VideoClock(self.cap) # Giờ theo PTS của frame vừa đọc (xem clock.py)
             
     def read(self):
         if self.cap is None or not self.cap.isOpened():
@@ -48,6 +59,7 @@ class VideoLooper:
             # Hết video -> Quay lại từ đầu (Loop)
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             ret, frame = self.cap.read()
+        if ret: self.clock.on_frame(self.cap)
         return frame
 
     def release(self):
@@ -55,7 +67,8 @@ class VideoLooper:
 
 # --- CLASS QUẢN LÝ QUY TRÌNH (FULL LOGIC) ---
 class SystemFlowManager:
-    def __init__(self):
+    def __init__(self, clock):
+        self.clock = clock
         self.timer_start = None
         self.final_verdict = None 
         self.state = "IDLE" 
@@ -73,14 +86,14 @@ class SystemFlowManager:
         else:
             if self.state == "RUNNING":
                 self.state = "COUNTDOWN"
-                self.timer_start = time.time()
+                self.timer_start = self.clock.now()
                 print("🏁 Cam 4 mất tín hiệu -> Bắt đầu đếm ngược 10s...")
             
             elif self.state == "IDLE": return None
 
             # --- XỬ LÝ ĐẾM NGƯỢC ---
             if self.state == "COUNTDOWN":
-                elapsed = time.time() - self.timer_start
+                elapsed = self.clock.now() - self.timer_start
                 remaining = 10.0 - elapsed 
                 
                 if remaining <= 0:
@@ -95,13 +108,13 @@ class SystemFlowManager:
                                 checklist_ok = False
                     
                     self.final_verdict = "PASS" if checklist_ok else "FAIL"
-                    self.timer_start = time.time() # Reset timer để show result
+                    self.timer_start = self.clock.now() # Reset timer để show result
                     return "FINISHED"
                 return remaining
 
             # --- XỬ LÝ HIỂN THỊ KẾT QUẢ ---
             elif self.state == "SHOW_RESULT":
-                elapsed = time.time() - self.timer_start
+                elapsed = self.clock.now() - self.timer_start
                 if elapsed > 5.0: # Show 5s
                     print("🔄 Reset Hệ Thống")
                     return "RESET_NOW"
@@ -116,7 +129,9 @@ def main():
 
     print(f"🚀 TEST SIMULATION: 4 CAMERAS")
 
-    # Load AI
+    # Load AI (import tại đây: CAPTURE_MODE "process" spawn mỗi camera 1 process, process con import lại
+    # file này -> import ultralytics ở đầu file sẽ nạp PyTorch vào từng process đọc video)
+    from ultralytics import YOLO
     print("⏳ Đang load model...")
     model_items = YOLO(MODEL_ITEM_PATH)
     model_slots = YOLO(MODEL_SLOT_PATH)
@@ -126,13 +141,22 @@ def main():
     # Khởi tạo 4 luồng Video
     streams = []
     for name in cam_names:
-        streams.append(VideoLooper(VIDEO_PATHS[name], name))
+        if CAPTURE_MODE == "process":
+            streams.append(ShmCameraStream(VIDEO_PATHS[name], name, size=(PROC_W, PROC_H)).start())
+        else:
+            streams.append(VideoLooper(VIDEO_PATHS[name], name))
+
+    # Nguồn thời gian: "looper" -> theo video đầu tiên mở được (các video đọc đồng bộ từng frame),
+    # "process" -> giờ thật vì mỗi process tự phát theo tốc độ thật
+    clock = WALL_CLOCK
+    if CAPTURE_MODE != "process":
+        clock = next((s.clock for s in streams if s.clock is not None), WALL_CLOCK)
 
     # Khởi tạo Logic
-    configs = [CameraConfig(name) for name in cam_names]
+    configs = [CameraConfig(name, clock=clock) for name in cam_names]
     processors = [FrameProcessor(cfg) for cfg in configs]
-    visualizer = Visualizer()
-    flow_manager = SystemFlowManager()
+    visualizer = Visualizer(clock)
+    flow_manager = SystemFlowManager(clock)
 
     # Canvas Setup
     total_w = (PROC_W * 2) + DASHBOARD_WIDTH
@@ -145,6 +169,12 @@ def main():
             batch_frames = []
             
             for i, stream in enumerate(streams):
+                if CAPTURE_MODE == "process":
+                    # Frame đã được resize sẵn ở process capture
+                    _, _, frame = stream.read()
+                    if frame is None: frame = np.zeros((PROC_H, PROC_W, 3), dtype=np.uint8)
+                    batch_frames.append(frame)
+                    continue
                 frame = stream.read()
                 # Resize ngay lập tức để đồng bộ kích thước
                 resized = cv2.resize(frame, (PROC_W, PROC_H))
@@ -166,8 +196,9 @@ def main():
                 # Copy ảnh webcam vào vùng ROI
                 np.copyto(roi, batch_frames[i])
 
-                # Xử lý Logic
-                detected = processors[i].process(res_slots[i], res_items[i])
+                # Xử lý Logic (chuyển kết quả sang numpy 1 lần, dùng chung cho logic và vẽ)
+                det = CameraDetections.from_results(res_slots[i], res_items[i])
+                detected = processors[i].process_detections(det)
 
                 # Lưu trạng thái Cam 4 để điều phối quy trình
                 if i == 3: cam4_detected = detected
@@ -178,9 +209,7 @@ def main():
                     visualizer.draw_slot_obb(roi, slot)
                 
                 # Vẽ Item
-                if res_items[i].boxes:
-                    for b, c, cl in zip(res_items[i].boxes.xyxy.cpu().numpy(), res_items[i].boxes.conf.cpu().numpy(), res_items[i].boxes.cls.cpu().numpy()):
-                        visualizer.draw_item_box(roi, b, res_items[i].names[int(cl)], c)
+                visualizer.draw_item_boxes(roi, det)
                 
                 # Vẽ Info bar
                 visualizer.draw_camera_info(roi, configs[i])
@@ -194,7 +223,7 @@ def main():
                 flow_manager.state = "IDLE"
 
             # --- GIAO DIỆN TỔNG ---
-            blink = int(time.time() * 4) % 2 == 0
+            blink = int(clock.now() * 4) % 2 == 0
 
             # A. Đếm ngược (Vẽ lên góc Cam 4)
             if flow_manager.state == "COUNTDOWN" and isinstance(status, float):
@@ -230,14 +259,16 @@ def main():
             cv2.imshow("Full System Simulation (4 Cams)", main_canvas)
             
             # Điều khiển
-            key = cv2.waitKey(30) & 0xFF
+            key = cv2.waitKey(30 if REALTIME_PLAYBACK else 1) & 0xFF
             if key == ord('q'): break
             if key == ord('p'): # Pause
                 cv2.waitKey(-1)
 
     finally:
-        for s in streams: s.release()
+        for s in streams:
+            if CAPTURE_MODE == "process": s.stop()
+            else: s.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
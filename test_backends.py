@@ -0,0 +1,130 @@
+import cv2
+cv2.setNumThreads(0)
+
+import numpy as np
+import time
+from backends import create_backend, regularize_rboxes, xywhr2xyxyxyxy
+from config import CameraConfig
+from processor import FrameProcessor
+
+# --- CẤU HÌNH TEST ---
+# So sánh backend Ultralytics (PyTorch) và ONNX Runtime CPU trên cùng các frame:
+#   1. Parity: box/OBB và kết quả của FrameProcessor phải khớp nhau
+#   2. Throughput: thời gian suy luận trung bình mỗi batch
+VIDEO_PATH = r"D:\AI_CK\final\minh\test_data\video_test\Video test đúng.avi"
+
+MODEL_ITEM_PATH = r"D:\AI_CK\final\minh\models\best_ck.pt"
+MODEL_SLOT_PATH = r"D:\AI_CK\final\minh\models\best.pt"
+# Xuất bằng: yolo export model=best.pt format=onnx imgsz=480,640 dynamic=True
+ONNX_ITEM_PATH = r"D:\AI_CK\final\minh\models\best_ck.onnx"
+ONNX_SLOT_PATH = r"D:\AI_CK\final\minh\models\best.onnx"
+
+PROC_W, PROC_H = 640, 480
+NUM_CAMS = 4          # Kích thước batch (giả lập 4 camera)
+NUM_BATCHES = 30      # Số batch dùng để so sánh
+ITEM_CONF, SLOT_CONF = 0.45, 0.5
+BOX_TOL = 2.0         # Sai lệch toạ độ cho phép (px) giữa 2 backend
+
+def load_batches(path, num_batches, num_cams):
+    """Đọc frame từ video (lặp lại nếu hết), resize về PROC, gom thành batch (num_cams, H, W, 3)"""
+    cap = cv2.VideoCapture(path)
+    batches = []
+    for _ in range(num_batches):
+        batch = np.empty((num_cams, PROC_H, PROC_W, 3), dtype=np.uint8)
+        for i in range(num_cams):
+            ret, frame = cap.read()
+            if not ret:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
+            if not ret:
+                print(f"❌ Không đọc được video: {path}")
+                return []
+            cv2.resize(frame, (PROC_W, PROC_H), dst=batch[i])
+        batches.append(batch)
+    cap.release()
+    return batches
+
+def match_rows(a, b, tol):
+    """Số dòng của a có dòng tương ứng trong b (mọi toạ độ lệch <= tol)"""
+    if len(a) == 0 or len(b) == 0: return 0
+    a, b = a.reshape(len(a), -1), b.reshape(len(b), -1)
+    d = np.abs(a[:, None, :] - b[None, :, :]).max(axis=2)
+    return int((d.min(axis=1) <= tol).sum())
+
+# OBB tổng hợp (cx, cy, w, h, góc): cạnh dài nằm ở w hoặc h, góc ở cả 2 nửa [0, pi) -> thứ tự đỉnh sau
+# chuẩn hoá phải giống Ultralytics kể cả khi video test không có slot nào dựng đứng (h > w)
+SYNTHETIC_RBOXES = np.array([[320, 240, 120, 60, 0.3],
+                             [320, 240, 60, 120, 1.9],
+                             [100, 80, 40, 90, 2.8],
+                             [500, 400, 90, 40, 0.0]], dtype=np.float32)
+
+def check_rbox_order():
+    """Số OBB tổng hợp có 4 đỉnh (đúng thứ tự) khớp ops của Ultralytics"""
+    import torch
+    from ultralytics.utils import ops
+    ref = ops.xywhr2xyxyxyxy(ops.regularize_rboxes(torch.from_numpy(SYNTHETIC_RBOXES))).numpy()
+    out = xywhr2xyxyxyxy(regularize_rboxes(SYNTHETIC_RBOXES))
+    return int((np.abs(ref - out).reshape(len(out), -1).max(axis=1) <= 1e-3).sum())
+
+def run_backend(backend, batches):
+    """Chạy cả 2 model trên mọi batch -> (list kết quả, ms/batch)"""
+    outputs = []
+    t0 = time.perf_counter()
+    for batch in batches:
+        x = backend.prepare(batch, range(len(batch)))
+        dets = backend.predict_items(x)
+        for det, slots in zip(dets, backend.predict_slots(x)):
+            det.set_slots(*slots)
+        outputs.append(dets)
+    return outputs, (time.perf_counter() - t0) * 1000 / max(1, len(batches))
+
+def main():
+    batches = load_batches(VIDEO_PATH, NUM_BATCHES, NUM_CAMS)
+    if not batches: return
+
+    print("⏳ Đang khởi tạo backend...")
+    torch_backend = create_backend("ultralytics", MODEL_ITEM_PATH, MODEL_SLOT_PATH, NUM_CAMS, PROC_H, PROC_W,
+                                   item_conf=ITEM_CONF, slot_conf=SLOT_CONF)
+    onnx_backend = create_backend("onnx", ONNX_ITEM_PATH, ONNX_SLOT_PATH, NUM_CAMS, PROC_H, PROC_W,
+                                  item_conf=ITEM_CONF, slot_conf=SLOT_CONF)
+
+    # Khởi động (warm-up) để không tính thời gian nạp model lần đầu
+    run_backend(torch_backend, batches[:2])
+    run_backend(onnx_backend, batches[:2])
+    ref, t_torch = run_backend(torch_backend, batches)
+    out, t_onnx = run_backend(onnx_backend, batches)
+
+    # --- 1. PARITY ---
+    n_items = n_item_match = n_slots = n_slot_match = n_state_match = 0
+    procs_ref = [FrameProcessor(CameraConfig("cam_1")) for _ in range(NUM_CAMS)]
+    procs_out = [FrameProcessor(CameraConfig("cam_1")) for _ in range(NUM_CAMS)]
+    for dets_ref, dets_out in zip(ref, out):
+        for i, (a, b) in enumerate(zip(dets_ref, dets_out)):
+            n_items += max(len(a.item_boxes), len(b.item_boxes))
+            n_item_match += match_rows(a.item_boxes, b.item_boxes, BOX_TOL)
+            n_slots += max(len(a.slot_obbs), len(b.slot_obbs))
+            n_slot_match += match_rows(a.slot_obbs, b.slot_obbs, BOX_TOL)
+            # Kết quả logic cuối cùng (có khay + trạng thái 5 slot) phải giống nhau
+            tray_a = procs_ref[i].process_detections(a)
+            tray_b = procs_out[i].process_detections(b)
+            states_a = [s.state for s in procs_ref[i].cam_config.slots.values()]
+            states_b = [s.state for s in procs_out[i].cam_config.slots.values()]
+            n_state_match += int(tray_a == tray_b and states_a == states_b)
+    n_frames = NUM_BATCHES * NUM_CAMS
+    n_rbox_match = check_rbox_order()
+
+    print(f"📊 Item khớp : {n_item_match}/{n_items}")
+    print(f"📊 Slot khớp : {n_slot_match}/{n_slots}")
+    print(f"📊 Logic khớp: {n_state_match}/{n_frames} frame")
+    print(f"📊 Đỉnh OBB  : {n_rbox_match}/{len(SYNTHETIC_RBOXES)} box tổng hợp")
+    ok = (n_item_match == n_items and n_slot_match == n_slots and n_state_match == n_frames
+          and n_rbox_match == len(SYNTHETIC_RBOXES))
+    print("✅ PARITY OK" if ok else "❌ PARITY LỆCH")
+
+    # --- 2. THROUGHPUT ---
+    print(f"🏁 Ultralytics: {t_torch:.1f} ms/batch ({NUM_CAMS * 1000 / t_torch:.1f} frame/s)")
+    print(f"🏁 ONNX CPU   : {t_onnx:.1f} ms/batch ({NUM_CAMS * 1000 / t_onnx:.1f} frame/s)  "
+          f"-> {t_torch / t_onnx:.2f}x")
+
+if __name__ == "__main__":
+    main()
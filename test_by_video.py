@@ -4,11 +4,12 @@ cv2.setNumThreads(0)
 
 import numpy as np
 import os
-import time
 from ultralytics import YOLO
 from config import CameraConfig
 from visualizer import Visualizer
 from processor import FrameProcessor
+from detections import CameraDetections
+from clock import VideoClock
 
 # --- CẤU HÌNH TEST ---
 # 1. Điền đường dẫn file video của bạn vào đây
@@ -25,6 +26,9 @@ TEST_CAM_NAME = "cam_1"
 PROC_W, PROC_H = 640, 480 
 DASHBOARD_WIDTH = 350 
 
+# 4. Phát theo tốc độ thật (waitKey 30ms)? False -> chạy nhanh hết mức; mọi bộ đếm giờ vẫn theo thời gian video
+REALTIME_PLAYBACK = False
+
 # --- CLASS ĐỌC VIDEO (CÓ LẶP LẠI) ---
 class VideoLooper:
     def __init__(self, video_path):
@@ -33,6 +37,7 @@ class VideoLooper:
         if not self.cap.isOpened():
             print(f"❌ Không thể mở video: {video_path}")
             exit()
+        self.clock = VideoClock(self.cap) # Giờ theo PTS của frame vừa đọc (xem clock.py)
             
     def read(self):
         ret, frame = self.cap.read()
@@ -40,6 +45,7 @@ class VideoLooper:
             # Nếu hết video -> Quay lại từ đầu (Loop)
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             ret, frame = self.cap.read()
+        if ret: self.clock.on_frame(self.cap)
         return frame
 
     def release(self):
@@ -47,7 +53,8 @@ class VideoLooper:
 
 # --- CLASS QUẢN LÝ QUY TRÌNH (GIẢN LƯỢC CHO TEST) ---
 class SystemFlowManagerTest:
-    def __init__(self):
+    def __init__(self, clock):
+        self.clock = clock
         self.timer_start = None
         self.final_verdict = None
         self.state = "IDLE" 
@@ -62,13 +69,13 @@ class SystemFlowManagerTest:
         else:
             if self.state == "RUNNING":
                 self.state = "COUNTDOWN"
-                self.timer_start = time.time()
+                self.timer_start = self.clock.now()
                 print("🏁 Mất tín hiệu khay -> Đếm ngược 5s (Test Mode)...")
             
             elif self.state == "IDLE": return None
 
             if self.state == "COUNTDOWN":
-                elapsed = time.time() - self.timer_start
+                elapsed = self.clock.now() - self.timer_start
                 remaining = 5.0 - elapsed # Test để 5s cho nhanh
                 
                 if remaining <= 0:
@@ -81,12 +88,12 @@ class SystemFlowManagerTest:
                         if not item_info['done']: checklist_ok = False
                     
                     self.final_verdict = "PASS" if checklist_ok else "FAIL"
-                    self.timer_start = time.time()
+                    self.timer_start = self.clock.now()
                     return "FINISHED"
                 return remaining
 
             elif self.state == "SHOW_RESULT":
-                elapsed = time.time() - self.timer_start
+                elapsed = self.clock.now() - self.timer_start
                 if elapsed > 3.0: # Show 3s thôi
                     print("🔄 Reset Test")
                     return "RESET_NOW"
@@ -108,12 +115,13 @@ def main():
 
     # Khởi tạo Video
     video_stream = VideoLooper(VIDEO_PATH)
+    clock = video_stream.clock
 
     # Khởi tạo Config chỉ cho 1 Camera
-    cam_config = CameraConfig(TEST_CAM_NAME)
+    cam_config = CameraConfig(TEST_CAM_NAME, clock=clock)
     processor = FrameProcessor(cam_config)
-    visualizer = Visualizer()
-    flow_manager = SystemFlowManagerTest()
+    visualizer = Visualizer(clock)
+    flow_manager = SystemFlowManagerTest(clock)
 
     # Canvas Setup
     total_w = PROC_W + DASHBOARD_WIDTH
@@ -137,7 +145,8 @@ def main():
             res_items = model_items.predict(batch_frames, conf=0.45, verbose=False)[0]
 
             # 3. Process Logic
-            detected = processor.process(res_slots, res_items)
+            det = CameraDetections.from_results(res_slots, res_items)
+            detected = processor.process_detections(det)
 
             # 4. Vẽ lên ảnh
             display_frame = resized.copy()
@@ -147,9 +156,7 @@ def main():
                 visualizer.draw_slot_obb(display_frame, slot)
             
             # Vẽ Item
-            if res_items.boxes:
-                for b, c, cl in zip(res_items.boxes.xyxy.cpu().numpy(), res_items.boxes.conf.cpu().numpy(), res_items.boxes.cls.cpu().numpy()):
-                    visualizer.draw_item_box(display_frame, b, res_items.names[int(cl)], c)
+            visualizer.draw_item_boxes(display_frame, det)
             
             visualizer.draw_camera_info(display_frame, cam_config)
 
@@ -170,7 +177,7 @@ def main():
             dashboard_roi[:] = (20, 20, 20) # Màu nền xám đậm
             
             # Hiệu ứng Blink
-            blink = int(time.time() * 5) % 2 == 0
+            blink = int(clock.now() * 5) % 2 == 0
 
             # Hiển thị kết quả Test
             if TEST_CAM_NAME == "cam_4":
@@ -190,8 +197,9 @@ def main():
             # Show
             cv2.imshow(f"Test Mode - {TEST_CAM_NAME}", final_canvas)
             
-            # Điều khiển tốc độ: Video file chạy rất nhanh, cần waitKey lâu hơn chút (30ms ~ 30fps)
-            key = cv2.waitKey(30) & 0xFF
+            # Điều khiển tốc độ: mặc định chạy nhanh hết mức (giờ lấy theo video nên logic không đổi),
+            # REALTIME_PLAYBACK = True để xem ~30fps như cũ
+            key = cv2.waitKey(30 if REALTIME_PLAYBACK else 1) & 0xFF
             if key == ord('q'): break
             if key == ord('p'): # Phím P để tạm dừng soi lỗi
                 cv2.waitKey(-1)
@@ -0,0 +1,119 @@
+import cv2
+cv2.setNumThreads(0)
+
+import argparse
+import sys
+import time
+import numpy as np
+import main as app
+from backends import create_backend, predict_chunked, calibrate_batch_size
+from config import CameraConfig, SlotTable, LINE
+from line_config import LineConfig
+from processor import FrameProcessor
+
+# --- ĐO KHẢ NĂNG MỞ RỘNG THEO SỐ CAMERA (CẦN MODEL) ---
+# Mỗi mức N camera: chạy AI (chia lô như main.py) + 1 tick logic liên tục trong --seconds giây,
+# báo FPS mỗi camera khi thêm camera. Camera thứ N > số camera trong cấu hình dùng lại quy tắc slot
+# của các trạm có sẵn (cam_5 giống cam_1, ...). Backend / model / ngưỡng lấy như main.py.
+#   python throughput.py                            -> 1, 2, 4, 6, 8, 12 camera, ảnh nhiễu
+#   python throughput.py --video khay.avi           -> frame thật (khay, item) thay cho ảnh nhiễu
+#   python throughput.py --cams 4 8 --batch 4       -> cỡ lô cố định thay vì theo cấu hình / tự đo
+CAM_LEVELS = (1, 2, 4, 6, 8, 12)
+SECONDS_PER_LEVEL = 10.0
+SLOT_PASS_EVERY = 10 # Model Slot chạy thưa (giống SlotScheduler khi khay đã khoá): 1 tick / 10
+
+def scaled_line(num_cams):
+    """LineConfig N camera: nhân bản các trạm trong cấu hình hiện tại, trigger = camera cuối"""
+    data = {"line": f"{LINE.name}_x{num_cams}",
+            "models": {"item": LINE.model_item_path, "slot": LINE.model_slot_path},
+            "thresholds": {"item_conf": LINE.item_conf, "slot_conf": LINE.slot_conf, "slot_overlap": LINE.slot_overlap},
+            "cameras": []}
+    for i in range(num_cams):
+        spec = LINE.cameras[i % len(LINE.cameras)]
+        # ID slot toàn cục không được trùng giữa các trạm -> trạm lặp lại lấy ID mới
+        offset = (i // len(LINE.cameras)) * 1000
+        data["cameras"].append({"name": f"cam_{i + 1}", "source": spec.source,
+                                "slot_ids": [s + offset for s in spec.id_mapping.values()],
+                                "slots": {str(s + offset): item for s, item in spec.rules.items()}})
+    return LineConfig(data, f"<{num_cams} cam>")
+
+def load_frames(num_cams, video=None):
+    """Batch frame (num_cams, H, W, 3): mỗi camera 1 frame khác nhau trong video, không có video -> ảnh nhiễu"""
+    frames = np.random.default_rng(0).integers(0, 255, (num_cams, app.PROC_H, app.PROC_W, 3), dtype=np.uint8)
+    if video is None: return frames
+    cap = cv2.VideoCapture(video)
+    total = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    for i in range(num_cams):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, (i * total) // num_cams)
+        ret, frame = cap.read()
+        if not ret: sys.exit(f"❌ Không đọc được video: {video}")
+        frames[i] = cv2.resize(frame, (app.PROC_W, app.PROC_H))
+    cap.release()
+    return frames
+
+def run_level(backend, frames, line, batch_size, seconds):
+    """Chạy AI + logic trên N camera trong seconds giây -> dict thống kê"""
+    num_cams = len(line.cameras)
+    slot_table = SlotTable()
+    configs = [CameraConfig(cam.name, slot_table, line=line) for cam in line.cameras]
+    processors = [FrameProcessor(cfg) for cfg in configs]
+    flow_manager = app.SystemFlowManager(trigger_name=line.trigger_camera)
+    logic_state, last_items = {"trigger_detected": False}, [None] * num_cams
+    indices = list(range(num_cams))
+    has_signal = [True] * num_cams
+    tick_times = []
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        slot_pass = len(tick_times) % SLOT_PASS_EVERY == 0
+        dets = predict_chunked(backend, frames, indices, batch_size, need_slots=lambda i, det: slot_pass)
+        app.apply_logic_tick(processors, configs, flow_manager, logic_state, last_items, has_signal, indices, dets,
+                             trigger=line.trigger_index)
+        tick_times.append(time.perf_counter() - t0)
+    elapsed = sum(tick_times)
+    return {"cams": num_cams, "batch": batch_size, "chunks": -(-num_cams // batch_size), "ticks": len(tick_times),
+            "tick_p50_ms": float(np.median(tick_times)) * 1000, "fps_per_cam": len(tick_times) / elapsed,
+            "frames_per_sec": num_cams * len(tick_times) / elapsed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FPS mỗi camera khi tăng số camera (AI chia lô + logic)")
+    parser.add_argument("--cams", type=int, nargs="+", default=list(CAM_LEVELS), help="Các mức số camera")
+    parser.add_argument("--seconds", type=float, default=SECONDS_PER_LEVEL, help="Thời gian đo mỗi mức")
+    parser.add_argument("--video", help="Video lấy frame thật (mặc định: ảnh nhiễu)")
+    parser.add_argument("--batch", type=int, help="Cỡ lô cố định (mặc định: theo cấu hình, \"auto\" -> tự đo)")
+    args = parser.parse_args(argv)
+
+    item_path, slot_path = ((app.ONNX_ITEM_PATH, app.ONNX_SLOT_PATH) if app.INFERENCE_BACKEND == "onnx"
+                            else (app.MODEL_ITEM_PATH, app.MODEL_SLOT_PATH))
+    max_cams = max(args.cams)
+    thresholds = {"item_conf": LINE.item_conf, "slot_conf": LINE.slot_conf}
+    if app.INFERENCE_BACKEND == "onnx":
+        backend = create_backend("onnx", item_path, slot_path, max_cams, app.PROC_H, app.PROC_W, **thresholds,
+                                 intra_op_threads=app.ONNX_INTRA_OP_THREADS, inter_op_threads=app.ONNX_INTER_OP_THREADS)
+    else:
+        backend = create_backend(app.INFERENCE_BACKEND, item_path, slot_path, max_cams, app.PROC_H, app.PROC_W,
+                                 **thresholds, shared_preprocess=app.SHARED_PREPROCESS)
+
+    batch_size = args.batch or LINE.max_batch
+    if batch_size is None:
+        batch_size, timings = calibrate_batch_size(backend, max_cams, app.PROC_H, app.PROC_W, LINE.latency_budget)
+        print(f"📦 Cỡ lô tự đo: {batch_size} (" + ", ".join(f"{n} cam {t * 1000:.0f} ms" for n, t in timings.items())
+              + f" | tối đa {LINE.latency_budget * 1000:.0f} ms/lô)", file=sys.stderr)
+
+    frames = load_frames(max_cams, args.video)
+    rows = []
+    for n in sorted(set(args.cams)):
+        print(f"⏳ {n} camera...", file=sys.stderr)
+        rows.append(run_level(backend, frames, scaled_line(n), min(batch_size, n), args.seconds))
+
+    base = rows[0]["fps_per_cam"]
+    print(f"📊 {app.INFERENCE_BACKEND} | {app.PROC_W}x{app.PROC_H} | Slot 1/{SLOT_PASS_EVERY} tick | "
+          f"{'video' if args.video else 'ảnh nhiễu'}")
+    print(f"   {'cam':>4} {'lô':>4} {'số lô':>6} {'tick p50 (ms)':>14} {'frame/s':>9} {'FPS/cam':>9} {'so với ' + str(rows[0]['cams']) + ' cam':>12}")
+    for r in rows:
+        print(f"   {r['cams']:>4} {r['batch']:>4} {r['chunks']:>6} {r['tick_p50_ms']:>14.1f} {r['frames_per_sec']:>9.1f} "
+              f"{r['fps_per_cam']:>9.1f} {r['fps_per_cam'] / base:>11.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
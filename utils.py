@@ -2,86 +2,83 @@ import numpy as np
 import cv2
 from itertools import combinations
 
+# 10 tổ hợp 3 điểm trong 5 tâm slot (đúng thứ tự của combinations) và 2 điểm còn lại của mỗi tổ hợp
+_TRIPLES = np.array(list(combinations(range(5), 3)))
+_PAIRS = np.array([[i for i in range(5) if i not in c] for c in _TRIPLES])
+# Vị trí 2 điểm còn lại trong bộ 3 khi đã chọn S2 ở vị trí 0/1/2
+_OTHERS = np.array([[1, 2], [0, 2], [0, 1]])
+
+# Số cặp item x slot (sau lọc khung bao) tối thiểu để dùng bản cắt đa giác vector hoá
+VECTOR_MIN_PAIRS = 16
+
 class GeometryUtils:
     @staticmethod
-    def identify_slots_logic(centers):
+    def identify_slots_batch(centers):
         """
-        Thuật toán định danh Slot (S1-S5) hỗ trợ xoay 4 chiều.
+        Định danh Slot (S1-S5) cho nhiều camera cùng lúc, toàn bộ bằng phép toán mảng.
+        centers: (cams, 5, 2) -> (cams, 5) index điểm đầu vào ứng với S1..S5 (-1 nếu không định danh được).
         """
-        centers = np.array(centers)
-        if len(centers) != 5:
-            return None
+        centers = np.asarray(centers)
+        n = len(centers)
+        rows = np.arange(n)[:, None]
 
-        # --- BƯỚC 1: TÌM 3 ĐIỂM THẲNG HÀNG (L123) ---
-        min_area = float('inf')
-        best_g3 = None
+        # --- BƯỚC 1: TÌM 3 ĐIỂM THẲNG HÀNG (L123) - diện tích cả 10 tam giác 1 lần ---
+        p = centers[:, _TRIPLES]                     # (cams, 10, 3, 2)
+        x, y = p[..., 0], p[..., 1]
+        area = 0.5 * np.abs(x[..., 0]*(y[..., 1]-y[..., 2]) + x[..., 1]*(y[..., 2]-y[..., 0]) + x[..., 2]*(y[..., 0]-y[..., 1]))
+        area = np.where(np.isnan(area), np.inf, area)
+        valid = (area < np.inf).any(axis=1)
+        best = area.argmin(axis=1)                   # Lấy tổ hợp đầu tiên nếu bằng nhau (giống vòng for)
 
-        for c in combinations(range(5), 3):
-            p1, p2, p3 = centers[list(c)]
-            area = 0.5 * abs(p1[0]*(p2[1]-p3[1]) + p2[0]*(p3[1]-p1[1]) + p3[0]*(p1[1]-p2[1]))
-            if area < min_area:
-                min_area = area
-                best_g3 = c
-        
-        if best_g3 is None: return None
-        
-        idx_g3 = list(best_g3)                
-        idx_g2 = [i for i in range(5) if i not in idx_g3] 
+        idx_g3 = _TRIPLES[best]                      # (cams, 3)
+        idx_g2 = _PAIRS[best]                        # (cams, 2)
+        pts_g3 = centers[rows, idx_g3]
+        pts_g2 = centers[rows, idx_g2]
 
-        pts_g3 = centers[idx_g3] 
-        pts_g2 = centers[idx_g2] 
+        # --- BƯỚC 2: TÌM S2 (điểm có tổng khoảng cách tới 2 điểm còn lại nhỏ nhất) ---
+        dists = np.linalg.norm(pts_g3[:, :, None] - pts_g3[:, None], axis=-1).sum(axis=2)
+        s2_local = dists.argmin(axis=1)
+        cand = _OTHERS[s2_local]                     # 2 điểm còn lại, giữ thứ tự trong tổ hợp
+        s2_idx = idx_g3[rows[:, 0], s2_local]
+        c1_idx = idx_g3[rows[:, 0], cand[:, 0]]
+        c2_idx = idx_g3[rows[:, 0], cand[:, 1]]
+        s2_pos, c1_pos = centers[rows[:, 0], s2_idx], centers[rows[:, 0], c1_idx]
 
-        # --- BƯỚC 2: TÌM S2 ---
-        dists = [sum(np.linalg.norm(pts_g3[i] - pts_g3[j]) for j in range(3) if i != j) for i in range(3)]
-        idx_s2 = idx_g3[np.argmin(dists)]
-        s2_pos = centers[idx_s2]
+        # --- BƯỚC 3: XÁC ĐỊNH HƯỚNG ---
+        dx_g3 = pts_g3[..., 0].max(axis=1) - pts_g3[..., 0].min(axis=1)
+        dy_g3 = pts_g3[..., 1].max(axis=1) - pts_g3[..., 1].min(axis=1)
+        avg_g3 = pts_g3.mean(axis=1)
+        avg_g2 = pts_g2.mean(axis=1)
 
-        candidates = [i for i in idx_g3 if i != idx_s2]
-        c1_idx, c2_idx = candidates[0], candidates[1]
-        c1_pos, c2_pos = centers[c1_idx], centers[c2_idx]
+        vertical = dy_g3 > dx_g3
+        c1_is_s1 = np.where(vertical,
+                            np.where(avg_g2[:, 0] < avg_g3[:, 0], c1_pos[:, 1] > s2_pos[:, 1], c1_pos[:, 1] < s2_pos[:, 1]),
+                            np.where(avg_g2[:, 1] < avg_g3[:, 1], c1_pos[:, 0] < s2_pos[:, 0], c1_pos[:, 0] > s2_pos[:, 0]))
+        s1_idx = np.where(c1_is_s1, c1_idx, c2_idx)
+        s3_idx = np.where(c1_is_s1, c2_idx, c1_idx)
 
-        # --- BƯỚC 3: XÁC ĐỊNH HƯỚNG ---
-        dx_g3 = np.max(pts_g3[:, 0]) - np.min(pts_g3[:, 0])
-        dy_g3 = np.max(pts_g3[:, 1]) - np.min(pts_g3[:, 1])
-        
-        avg_x_g3 = np.mean(pts_g3[:, 0])
-        avg_y_g3 = np.mean(pts_g3[:, 1])
-        avg_x_g2 = np.mean(pts_g2[:, 0])
-        avg_y_g2 = np.mean(pts_g2[:, 1])
-
-        s1_idx, s3_idx = None, None
-
-        if dy_g3 > dx_g3: # DỌC
-            if avg_x_g2 < avg_x_g3: 
-                if c1_pos[1] > s2_pos[1]: s1_idx, s3_idx = c1_idx, c2_idx
-                else: s1_idx, s3_idx = c2_idx, c1_idx
-            else:
-                if c1_pos[1] < s2_pos[1]: s1_idx, s3_idx = c1_idx, c2_idx
-                else: s1_idx, s3_idx = c2_idx, c1_idx
-        else: # NGANG
-            if avg_y_g2 < avg_y_g3:
-                if c1_pos[0] < s2_pos[0]: s1_idx, s3_idx = c1_idx, c2_idx
-                else: s1_idx, s3_idx = c2_idx, c1_idx
-            else:
-                if c1_pos[0] > s2_pos[0]: s1_idx, s3_idx = c1_idx, c2_idx
-                else: s1_idx, s3_idx = c2_idx, c1_idx
-
-        # --- BƯỚC 4: S4, S5 ---
-        idx_g2_1 = idx_g2[0]
-        idx_g2_2 = idx_g2[1]
-        dist_1 = np.linalg.norm(centers[idx_g2_1] - centers[s1_idx])
-        dist_2 = np.linalg.norm(centers[idx_g2_2] - centers[s1_idx])
-
-        if dist_1 < dist_2: s4_idx, s5_idx = idx_g2_1, idx_g2_2
-        else: s4_idx, s5_idx = idx_g2_2, idx_g2_1
-
-        return {
-            1: centers[s1_idx].astype(int),
-            2: centers[idx_s2].astype(int),
-            3: centers[s3_idx].astype(int),
-            4: centers[s4_idx].astype(int),
-            5: centers[s5_idx].astype(int)
-        }
+        # --- BƯỚC 4: S4, S5 (điểm hàng 2 gần S1 hơn là S4) ---
+        d_g2 = np.linalg.norm(pts_g2 - centers[rows, s1_idx[:, None]], axis=-1)
+        g2_first = d_g2[:, 0] < d_g2[:, 1]
+        s4_idx = np.where(g2_first, idx_g2[:, 0], idx_g2[:, 1])
+        s5_idx = np.where(g2_first, idx_g2[:, 1], idx_g2[:, 0])
+
+        order = np.stack([s1_idx, s2_idx, s3_idx, s4_idx, s5_idx], axis=1)
+        order[~valid] = -1
+        return order
+
+    @staticmethod
+    def identify_slots_logic(centers):
+        """
+        Thuật toán định danh Slot (S1-S5) hỗ trợ xoay 4 chiều.
+        """
+        centers = np.array(centers)
+        if len(centers) != 5:
+            return None
+
+        order = GeometryUtils.identify_slots_batch(centers[None])[0]
+        if order[0] < 0: return None
+        return {k + 1: centers[i].astype(int) for k, i in enumerate(order)}
 
     @staticmethod
     def calculate_iou_polygon(box_item, poly_slot):
@@ -118,4 +115,148 @@ class GeometryUtils:
         Threshold để 0.45 để khắc phục lỗi góc cam nghiêng.
         """
         _, _, ratio = GeometryUtils.calculate_iou_polygon(box_item, poly_slot)
-        return ratio >= threshold
\ No newline at end of file
+        return ratio >= threshold
+
+    @staticmethod
+    def overlap_matrix(boxes, polys):
+        """
+        Tỉ lệ giao (diện tích giao / min(diện tích item, diện tích slot)) cho mọi cặp item x slot,
+        cùng ý nghĩa với calculate_iou_polygon nhưng tính 1 lần bằng phép toán mảng.
+        boxes: (N, 4) xyxy, polys: (S, 4, 2) OBB lồi -> (N, S)
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        polys = np.asarray(polys).reshape(-1, 4, 2)
+        ratios = np.zeros((len(boxes), len(polys)))
+        if ratios.size == 0: return ratios
+
+        # Lọc nhanh bằng khung bao trục (AABB): chỉ cặp có khung chồng nhau mới phải tính phần giao
+        cand = ((boxes[:, None, :2] < polys.max(axis=1)) & (boxes[:, None, 2:] > polys.min(axis=1))).all(axis=2)
+        ii, jj = np.nonzero(cand)
+
+        if len(ii) < VECTOR_MIN_PAIRS:
+            # Ít cặp: gọi OpenCV từng cặp còn rẻ hơn chi phí cố định của bản vector hoá
+            for i, j in zip(ii.tolist(), jj.tolist()):
+                ratios[i, j] = GeometryUtils.calculate_iou_polygon(boxes[i], polys[j])[2]
+            return ratios
+
+        boxes, polys = boxes[ii].astype(np.float64), polys[jj].astype(np.float64)
+        item_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        denom = np.minimum(item_area, _polygon_area(polys))
+        inter = _clip_area(polys, boxes)
+        ratios[ii, jj] = np.where(denom > 0, inter / np.where(denom > 0, denom, 1.0), 0.0)
+        return ratios
+
+    @staticmethod
+    def match_items_to_slots(boxes, polys, threshold=0.45):
+        """
+        Item đầu tiên (theo thứ tự detect) nằm trong từng slot, giống vòng lặp is_item_in_slot cũ.
+        -> (S,) index item, -1 nếu slot trống
+        """
+        hit = GeometryUtils.overlap_matrix(boxes, polys) >= threshold
+        if hit.shape[0] == 0: return np.full(hit.shape[1], -1)
+        return np.where(hit.any(axis=0), hit.argmax(axis=0), -1)
+
+def linear_assignment(cost):
+    """
+    Bài toán gán tối ưu (Hungarian, O(n^2 m)) cho ma trận chi phí nhỏ (n x m, không cần vuông).
+    -> (rows, cols): mỗi hàng/cột được ghép tối đa 1 lần, tổng chi phí nhỏ nhất
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed: cost = cost.T
+    n, m = cost.shape
+    if n == 0: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Thế vị hàng u, cột v; p[j] = hàng (đánh số từ 1) đang ghép với cột j; cột 0 là cột giả
+    u, v = np.zeros(n + 1), np.zeros(m + 1)
+    p, way = np.zeros(m + 1, dtype=np.int64), np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            # Mở rộng cây đường tăng từ cột j0 (đường đi ngắn nhất theo chi phí rút gọn)
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            cur = np.full(m + 1, np.inf)
+            cur[1:] = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv)
+            minv[better] = cur[better]
+            way[better] = j0
+            j1 = int(np.argmin(np.where(free, minv, np.inf)))
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0: break
+        # Lật đường tăng
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    rows, cols = rows[order], cols[order]
+    return (cols, rows) if transposed else (rows, cols)
+
+def _polygon_area(polys):
+    """Diện tích (công thức shoelace) của nhiều đa giác 4 đỉnh (M, 4, 2)"""
+    x, y = polys[..., 0], polys[..., 1]
+    return 0.5 * np.abs((x * y[:, _NEXT] - x[:, _NEXT] * y).sum(axis=1))
+
+# Đỉnh kế tiếp của đa giác 4 đỉnh
+_NEXT = [1, 2, 3, 0]
+
+def _clipped_edge_sum(ax, ay, qx, qy, exclusive):
+    """
+    Tổng tích chéo cross(c0, c1) của các cạnh đa giác (ax, ay) sau khi cắt bởi đa giác lồi (qx, qy),
+    cả 2 cùng chiều dương (phần trong nằm bên trái mỗi cạnh) - thuật toán Cyrus-Beck cho mọi cặp cạnh.
+    Toạ độ dạng (4 đỉnh, M cặp): trục M nằm trong cùng để numpy chạy trên mảng liên tục.
+    exclusive (M,): cạnh nằm đúng trên biên và cùng hướng với cạnh đa giác thì không tính (tránh tính 2 lần).
+    """
+    dx, dy = ax[_NEXT] - ax, ay[_NEXT] - ay                       # Hướng cạnh bị cắt (E, M)
+    ex, ey = qx[_NEXT] - qx, qy[_NEXT] - qy                       # Hướng cạnh đa giác cắt (F, M)
+    # Pháp tuyến hướng vào trong của cạnh đa giác là (-ey, ex); mọi cặp (cạnh, nửa mặt phẳng): (E, F, M)
+    num = ex * (ay[:, None] - qy) - ey * (ax[:, None] - qx)
+    den = ex * dy[:, None] - ey * dx[:, None]
+
+    parallel = den == 0
+    same_dir = (dx[:, None] * ex + dy[:, None] * ey) > 0
+    outside = parallel & ((num < 0) | ((num == 0) & same_dir & exclusive))
+    t = -num / np.where(parallel, 1.0, den)
+    t_lo = np.maximum(np.where(den > 0, t, 0.0).max(axis=1), 0.0)  # (E, M)
+    t_hi = np.minimum(np.where(den < 0, t, 1.0).min(axis=1), 1.0)
+    valid = (t_hi > t_lo) & ~outside.any(axis=1)
+
+    c0x, c0y = ax + dx * t_lo, ay + dy * t_lo
+    c1x, c1y = ax + dx * t_hi, ay + dy * t_hi
+    return np.where(valid, c0x * c1y - c0y * c1x, 0.0).sum(axis=0)
+
+def _clip_area(polys, boxes):
+    """
+    Diện tích phần giao giữa đa giác lồi 4 đỉnh polys[m] và box trục boxes[m] (xyxy), cho M cặp cùng lúc.
+    Định lý Green: biên phần giao = (cạnh slot nằm trong box) + (cạnh box nằm trong slot),
+    nên diện tích = 1/2 tổng tích chéo của các đoạn cạnh đã cắt. Mảng cố định (4, 4, M), không vòng lặp.
+    """
+    m = len(polys)
+    # Dời gốc toạ độ về tâm box để tích chéo không bị mất chính xác
+    cx, cy = (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+    hw, hh = (boxes[:, 2] - boxes[:, 0]) / 2, (boxes[:, 3] - boxes[:, 1]) / 2
+    px = np.ascontiguousarray(polys[..., 0].T) - cx
+    py = np.ascontiguousarray(polys[..., 1].T) - cy
+    rx, ry = np.stack([-hw, hw, hw, -hw]), np.stack([-hh, -hh, hh, hh])
+    # Đưa slot về cùng chiều dương với box (đảo thứ tự đỉnh nếu cần)
+    ccw = (px * py[_NEXT] - px[_NEXT] * py).sum(axis=0) > 0
+    px, py = np.where(ccw, px, px[::-1]), np.where(ccw, py, py[::-1])
+
+    # Gộp 2 lượt cắt thành 1 lần gọi: [cạnh slot cắt bởi box] + [cạnh box cắt bởi slot]
+    exclusive = np.arange(2 * m) >= m
+    total = _clipped_edge_sum(np.concatenate([px, rx], axis=1), np.concatenate([py, ry], axis=1),
+                              np.concatenate([rx, px], axis=1), np.concatenate([ry, py], axis=1), exclusive)
+    return 0.5 * np.abs(total[:m] + total[m:])
@@ -1,10 +1,25 @@
 import cv2
 import numpy as np
 import time
+from clock import WALL_CLOCK
+from config import SLOT_STATES
+
+# --- CACHE LỚP VẼ ---
+# Phần ít đổi được vẽ sẵn 1 lần rồi chỉ copy ra canvas:
+#   thanh thông tin camera                -> theo (cam, trạng thái, thông báo, chiều rộng)
+#   dashboard checklist                   -> theo version của mọi CameraConfig + màu nền
+# Nhãn slot vẫn vẽ trực tiếp bằng putText (đổi mỗi 0.1s khi đếm ngược, dán sprite không nhanh hơn).
+INFO_BAR_HEIGHT = 60
+INFO_CACHE_SIZE = 64
 
 class Visualizer:
-    def __init__(self):
+    def __init__(self, clock=None):
         self.prev_time = 0
+        # Nguồn thời gian cho đếm ngược SAVED trên slot (phải cùng clock với CameraConfig); FPS luôn theo giờ thật
+        self.clock = clock if clock is not None else WALL_CLOCK
+        self.info_cache = {}  # (cam, trạng thái, thông báo, rộng) -> thanh thông tin đã vẽ
+        self.dashboard_key = None
+        self.dashboard_layer = None
         # Bảng màu (BGR)
         self.colors = {
             "empty": (180, 180, 180), # Xám nhạt
@@ -29,24 +44,71 @@ class Visualizer:
         cv2.putText(frame, f"FPS: {int(fps)}", (20, 40), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
 
+    def draw_metrics(self, frame, rows):
+        """Bảng độ trễ p50/p95/p99 (ms) dưới ô FPS (rows: Metrics.overlay_rows())"""
+        if not rows: return
+        line_h, x0, y0 = 16, 15, 55
+        cols = (x0 + 205, x0 + 260, x0 + 315) # Cột số căn phải tại các mốc này
+        cv2.rectangle(frame, (10, y0), (x0 + 325, y0 + (len(rows) + 1) * line_h + 8), (40, 40, 40), -1)
+        font = cv2.FONT_HERSHEY_PLAIN
+        header = [("ms", x0, None), ("p50", cols[0], True), ("p95", cols[1], True), ("p99", cols[2], True)]
+        for k, row in enumerate([header] + [[(name, x0, None)] + [(f"{v:.1f}", x, True) for v, x in zip(qs, cols)]
+                                            for name, qs in rows]):
+            y = y0 + (k + 1) * line_h
+            color = self.colors["highlight"] if k == 0 else self.colors["text"]
+            for text, x, right in row:
+                if right: x -= cv2.getTextSize(text, font, 0.9, 1)[0][0]
+                cv2.putText(frame, text, (x, y), font, 0.9, color, 1)
+
     def draw_slot_obb(self, frame, slot):
         if slot.obb_points is None: return
+        color, thickness, label = self._slot_style(slot.id, slot.state, slot.is_saved, slot.first_oke_time)
+
+        # Vẽ
+        pts = slot.obb_points.reshape((-1, 1, 2))
+        cv2.polylines(frame, [pts], True, color, thickness)
+        
+        c = slot.center
+        self._draw_label(frame, label, color, (int(c[0]) - 40, int(c[1]) + 5))
+
+    def draw_slots(self, frame, cam):
+        """
+        Vẽ mọi slot của 1 camera từ CameraSnapshot (mảng của SlotTable, không cần object Slot).
+        Khung gom theo (màu, độ dày) -> 1 lần cv2.polylines mỗi nhóm; nhãn vẽ sau mọi khung nên nằm trên cả
+        khung slot bên cạnh (trước đây khung slot sau đè lên nhãn slot trước nếu 2 slot chồng nhau).
+        """
+        oke_times = cam.first_oke_time.tolist()
+        groups, labels = {}, []
+        for k, (slot_id, placed, code, saved) in enumerate(zip(cam.slot_ids, cam.placed.tolist(),
+                                                                cam.state.tolist(), cam.is_saved.tolist())):
+            if not placed: continue
+            t = oke_times[k]
+            color, thickness, label = self._slot_style(slot_id, SLOT_STATES[code], saved, None if t != t else t)
+            groups.setdefault((color, thickness), []).append(cam.obb_points[k].reshape((-1, 1, 2)))
+            cx, cy = cam.center[k].tolist()
+            labels.append((label, color, (cx - 40, cy + 5)))
+        for (color, thickness), pts in groups.items():
+            cv2.polylines(frame, pts, True, color, thickness)
+        for label, color, org in labels:
+            self._draw_label(frame, label, color, org)
 
+    def _slot_style(self, slot_id, state, is_saved, first_oke_time):
+        """-> (màu, độ dày khung, nhãn) của 1 slot"""
         # Mặc định theo state hiện tại (thực tế)
-        color = self.colors.get(slot.state, (255, 255, 255))
-        label = f"S{slot.id}"
+        color = self.colors.get(state, (255, 255, 255))
+        label = f"S{slot_id}"
         thickness = 2
 
         # 1. NẾU ĐANG CÓ VẬT (OKE)
-        if slot.state == "oke":
-            if slot.is_saved:
+        if state == "oke":
+            if is_saved:
                 # Đã Save và vật vẫn đang ở đó -> Xanh đậm, hiện SAVED
                 color = self.colors["locked"] 
                 label += " SAVED"
                 thickness = 3
-            elif slot.first_oke_time is not None:
+            elif first_oke_time is not None:
                 # Đang đếm ngược
-                elapsed = time.time() - slot.first_oke_time
+                elapsed = self.clock.now() - first_oke_time
                 remaining = max(0.0, 3.0 - elapsed)
                 label += f" {remaining:.1f}s"
                 if int(elapsed * 10) % 2 == 0: color = (150, 255, 150)
@@ -54,7 +116,7 @@ class Visualizer:
                 label += " OK"
 
         # 2. NẾU TRỐNG (EMPTY)
-        elif slot.state == "empty":
+        elif state == "empty":
             # Dù đã save hay chưa, nếu trống thì báo trống (để công nhân biết mà bỏ lại)
             color = self.colors["empty"]
             # Không hiện chữ SAVED ở đây để tránh hiểu nhầm
@@ -62,17 +124,14 @@ class Visualizer:
             pass 
 
         # 3. NẾU SAI
-        elif slot.state == "wrong":
+        elif state == "wrong":
             label += " X"
+        return color, thickness, label
 
-        # Vẽ
-        pts = slot.obb_points.reshape((-1, 1, 2))
-        cv2.polylines(frame, [pts], True, color, thickness)
-        
-        c = slot.center
-        text_pos = (c[0] - 40, c[1] + 5)
-        cv2.putText(frame, label, text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 3)
-        cv2.putText(frame, label, text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    def _draw_label(self, frame, label, color, org):
+        """Nhãn viền đen (dày 3) + chữ màu (dày 2)"""
+        cv2.putText(frame, label, org, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 3)
+        cv2.putText(frame, label, org, cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
     def draw_item_box(self, frame, box, label, conf):
         """Vẽ box vật thể item detect được"""
@@ -87,22 +146,52 @@ class Visualizer:
         cv2.putText(frame, caption, (x1, y1 - 5), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
+    def draw_item_boxes(self, frame, det):
+        """Vẽ toàn bộ item của 1 camera từ CameraDetections (tên class đã tra sẵn)"""
+        for box, label, conf in zip(det.item_boxes, det.item_names, det.item_confs):
+            self.draw_item_box(frame, box, label, conf)
+
     def draw_camera_info(self, frame, cam_config):
-        """Vẽ thông tin cam ở góc dưới"""
+        """Vẽ thông tin cam ở góc dưới (thanh vẽ sẵn, chỉ vẽ lại khi trạng thái / thông báo đổi)"""
         h, w = frame.shape[:2]
+        key = (cam_config.cam_name, cam_config.cam_state, cam_config.status_message, w)
+        bar = self.info_cache.get(key)
+        if bar is None:
+            bar = self._render_info_bar(cam_config, w)
+            if len(self.info_cache) >= INFO_CACHE_SIZE: self.info_cache.clear()
+            self.info_cache[key] = bar
+        top = max(0, h - INFO_BAR_HEIGHT)
+        frame[top:h] = bar[INFO_BAR_HEIGHT - (h - top):]
+
+    def _render_info_bar(self, cam_config, w):
+        h = INFO_BAR_HEIGHT
         # Nền đen đơn giản (nhanh hơn addWeighted)
-        cv2.rectangle(frame, (0, h-60), (w, h), (0, 0, 0), -1)
+        bar = np.zeros((h, w, 3), dtype=np.uint8)
         
         st_color = self.colors.get(cam_config.cam_state, (255, 255, 255))
         if cam_config.cam_state == "done": st_color = (0, 255, 0)
         if cam_config.cam_state == "false": st_color = (0, 0, 255)
 
         text_info = f"{cam_config.cam_name.upper()} | {cam_config.cam_state.upper()}"
-        cv2.putText(frame, text_info, (10, h-35), 
+        cv2.putText(bar, text_info, (10, h-35), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, st_color, 2)
         
-        cv2.putText(frame, cam_config.status_message, (10, h-10), 
+        cv2.putText(bar, cam_config.status_message, (10, h-10), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        return bar
+
+    def dashboard(self, all_configs, shape, bg):
+        """
+        Dashboard vẽ sẵn (nền bg + checklist) -> (key, ảnh). Chỉ vẽ lại khi version của 1 camera đổi
+        (checklist, trạng thái cam đều tăng version) hoặc đổi nền / kích thước.
+        """
+        key = (tuple(shape), bg) + tuple((cfg.cam_name, cfg.version) for cfg in all_configs)
+        if key != self.dashboard_key:
+            layer = np.empty(shape, dtype=np.uint8)
+            layer[:] = bg
+            self.draw_dashboard_on_roi(layer, all_configs)
+            self.dashboard_key, self.dashboard_layer = key, layer
+        return key, self.dashboard_layer
 
     def draw_dashboard_on_roi(self, roi, all_configs):
         """